@@ -0,0 +1,70 @@
+#=========#
+# BUILDER #
+#=========#
+
+# Nimmt die Figuren aus Bildern von Shadows in die Bibliothek auf (Name der
+# Figur ist der Dateiname). Aus dem Hauptverzeichnis des Repositorys:
+#
+#   python src/build_library.py img/shadow/ente.png ...
+#
+# Es werden nur die Erkennung der Shadows und die Suche genutzt, Fenster werden
+# keine geöffnet und der Roboter wird nicht angesprochen.
+
+import logging
+import os
+import sys
+from typing import List
+import main
+
+
+main.set_headless()
+
+import cv
+from pyniryo import cv2
+from solver.anytime import Anytime
+from solver.lattice import snap_shadows
+from solver.library import LIBRARY_DIR, TANGRAM, FigureLibrary, LibraryBuilder
+from solver.pruning import PruneStats
+from solver import geometric, split
+
+
+L = logging.getLogger('Library-Builder')
+
+
+def build(images: List[str], path: str = LIBRARY_DIR) -> None:
+    counts = dict(TANGRAM)
+    builder = LibraryBuilder(FigureLibrary(path))
+
+    for image in images:
+        name = os.path.splitext(os.path.basename(image))[0]
+        img = cv2.imread(image)
+
+        if img is None:
+            L.warning('%s lässt sich nicht lesen' % image)
+            continue
+
+        lattice_shadows = snap_shadows(cv.find_shadows(img))
+
+        if lattice_shadows is None:
+            L.warning('%s lässt sich nicht auf das Tangram-Gitter legen' % name)
+            continue
+
+        anytime = Anytime(None, None, sum(shadow.area for shadow in lattice_shadows))
+
+        if len(lattice_shadows) > 1:
+            solution = split.search(lattice_shadows, counts, anytime, PruneStats())
+        else:
+            solution = geometric.search(lattice_shadows, counts, anytime, PruneStats())
+
+        if solution is None:
+            L.warning('%s hat keine Lösung' % name)
+            continue
+
+        if builder.add(name, lattice_shadows, counts, solution):
+            L.info('%s aufgenommen' % name)
+
+    builder.save(path)
+
+
+if __name__ == '__main__':
+    build(sys.argv[1:])
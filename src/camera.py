@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import os
+import pickle
+import numpy as np
+from math import atan2, cos, degrees, radians, sin
+from typing import Dict, List, Tuple
+from pyniryo import cv2
+from pyniryo.vision import markers_detection
+from model import Block, Point, Shadow
+
+
+L = logging.getLogger('Camera')
+
+CALIBRATION_FILE = "resources/camera_calib.p"
+
+# The undistortion maps are stored next to the calibration
+MAPS_FILE = "resources/undistort_maps.npz"
+
+# Half size of the window in which a known marker is checked (markers have a radius < 35 px)
+MARKER_WINDOW = 48
+
+# How far (px) a marker may have moved to still use the cached homography
+MARKER_SHIFT = 3
+
+
+class Undistorter:
+    """
+    Undistorts camera frames with precomputed maps instead of recomputing the distortion
+    model for every frame (like cv2.undistort does). The maps are built once per frame
+    size with initUndistortRectifyMap in the fixed-point format (CV_16SC2), which remap
+    handles fastest, and stored on disk. They are rebuilt when the calibration changes.
+    """
+    mtx: np.ndarray
+    dist: np.ndarray
+    calibration_hash: str
+    maps_path: str
+    size: tuple | None
+    map1: np.ndarray | None
+    map2: np.ndarray | None
+
+    def __init__(self, calibration_path: str = CALIBRATION_FILE, maps_path: str = MAPS_FILE) -> None:
+        with open(calibration_path, "rb") as f:
+            content = f.read()
+
+        calibration = pickle.loads(content)
+        self.mtx = calibration["mtx"]
+        self.dist = calibration["dist"]
+        self.calibration_hash = hashlib.sha1(content).hexdigest()
+
+        self.maps_path = maps_path
+        self.size = None
+        self.map1 = None
+        self.map2 = None
+
+        self.__load()
+
+    # Makes sure the maps for frames of this size (width, height) exist
+    def prepare(self, size: tuple) -> None:
+        if size != self.size:
+            self.__build(size)
+
+    def undistort(self, img) -> np.ndarray:
+        self.prepare((img.shape[1], img.shape[0]))
+
+        return cv2.remap(img, self.map1, self.map2, cv2.INTER_LINEAR)
+
+    def __build(self, size: tuple) -> None:
+        L.info(f"Building undistortion maps for {size[0]}x{size[1]}")
+
+        # same camera matrix before & after, like cv2.undistort
+        self.map1, self.map2 = cv2.initUndistortRectifyMap(self.mtx, self.dist, None, self.mtx, size, cv2.CV_16SC2)
+        self.size = size
+
+        self.__save()
+
+    def __load(self) -> None:
+        if not os.path.exists(self.maps_path):
+            return
+
+        try:
+            with np.load(self.maps_path) as maps:
+                if str(maps["calibration"]) != self.calibration_hash:
+                    L.info("Calibration changed, undistortion maps will be rebuilt")
+                    return
+
+                self.size = tuple(int(v) for v in maps["size"])
+                self.map1 = maps["map1"]
+                self.map2 = maps["map2"]
+        except (OSError, KeyError, ValueError) as e:
+            L.warning(f"Undistortion maps {self.maps_path} could not be read: {e}")
+
+    def __save(self) -> None:
+        tmp_path = self.maps_path + ".tmp.npz"
+
+        try:
+            np.savez(tmp_path, map1=self.map1, map2=self.map2, size=np.array(self.size), calibration=np.array(self.calibration_hash))
+            os.replace(tmp_path, self.maps_path)
+        except OSError as e:
+            L.warning(f"Undistortion maps {self.maps_path} could not be written: {e}")
+
+    def __str__(self) -> str:
+        return 'Undistorter(size=%s, calibration=%s)' % (self.size, self.calibration_hash[:8])
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+
+#===================#
+# POINT UNDISTORTION #
+#===================#
+
+# Instead of undistorting the whole frame, the workspace can be extracted from the
+# distorted frame and only the detected vertices are undistorted afterwards. A
+# position in the distorted workspace image is mapped back into the distorted frame,
+# undistorted with undistortPoints and mapped into the workspace image it would have
+# had in the undistorted frame (homography of the undistorted marker centers).
+
+class PointMapper:
+    mtx: np.ndarray
+    dist: np.ndarray
+    # distorted workspace image -> distorted frame
+    to_frame: np.ndarray
+    # undistorted frame -> undistorted workspace image
+    to_workspace: np.ndarray
+
+    def __init__(self, mtx: np.ndarray, dist: np.ndarray, markers: np.ndarray, size: tuple) -> None:
+        self.mtx = mtx
+        self.dist = dist
+
+        target = workspace_corners(size)
+        markers_undistorted = cv2.undistortPoints(markers.reshape(-1, 1, 2), mtx, dist, P=mtx).reshape(4, 2)
+
+        self.to_frame = np.linalg.inv(cv2.getPerspectiveTransform(markers, target))
+        self.to_workspace = cv2.getPerspectiveTransform(markers_undistorted.astype(np.float32), target)
+
+    def map(self, points) -> np.ndarray:
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+
+        if len(points) == 0:
+            return points.reshape(0, 2)
+
+        in_frame = cv2.perspectiveTransform(points, self.to_frame)
+        undistorted = cv2.undistortPoints(in_frame, self.mtx, self.dist, P=self.mtx)
+
+        return cv2.perspectiveTransform(undistorted, self.to_workspace).reshape(-1, 2)
+
+    # Moves the blocks' centers; the rotation is mapped via a point next to the center
+    def correct_blocks(self, blocks: List[Block]) -> None:
+        for block in blocks:
+            x, y = block.position
+            angle = radians(block.rotation)
+
+            center, ahead = self.map([(x, y), (x + 10 * cos(angle), y + 10 * sin(angle))])
+
+            # only the (small) change is applied, so the range of the rotation stays the same
+            change = degrees(atan2(ahead[1] - center[1], ahead[0] - center[0])) - block.rotation
+
+            block.position = (int(round(center[0])), int(round(center[1])))
+            block.rotation += (change + 180) % 360 - 180
+
+    def correct_shadows(self, shadows: List[Shadow]) -> None:
+        for shadow in shadows:
+            mapped = self.map([(p.x, p.y) for p in shadow.vertices])
+            shadow.vertices = [Point(float(x), float(y)) for x, y in mapped]
+
+    def __str__(self) -> str:
+        return 'PointMapper(to_workspace=%s)' % self.to_workspace.round(3).tolist()
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+# Size (width, height) of the extracted workspace image, like pyniryo's extract_sub_img
+def workspace_size(ratio: float) -> tuple:
+    small_side = markers_detection.IM_EXTRACT_SMALL_SIDE_PIXELS
+
+    if ratio >= 1.0:
+        return (int(round(ratio * small_side)), small_side)
+
+    return (small_side, int(round(small_side / ratio)))
+
+
+def workspace_corners(size: tuple) -> np.ndarray:
+    width, height = size
+
+    return np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+
+
+# Centers of the four workspace markers (clockwise from the origin), like pyniryo's
+# extract_img_markers, or None if they can't be found
+def find_markers(img, ratio: float) -> np.ndarray | None:
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    img_thresh = cv2.adaptiveThreshold(gray, maxValue=255, adaptiveMethod=cv2.ADAPTIVE_THRESH_MEAN_C,
+                                       thresholdType=cv2.THRESH_BINARY, blockSize=15, C=25)
+
+    candidates = markers_detection.find_markers_from_img_thresh(img_thresh)
+    if not candidates or len(candidates) > 6:
+        return None
+
+    if len(candidates) == 4:
+        markers = markers_detection.sort_markers_detection(candidates)
+    else:
+        markers = markers_detection.complicated_sort_markers(candidates, workspace_ratio=ratio)
+
+    if markers is None:
+        return None
+
+    return np.array([marker.get_center() for marker in markers], dtype=np.float32)
+
+
+# Position of the markers in the picture of each workspace. The arm always takes the
+# picture of a workspace from the same scan pose, so the markers are found once and
+# their homography is reused. For the next pictures it's only checked that a marker is
+# still visible in a small window around each expected center, which is much cheaper
+# than searching the whole frame. If a check fails, the markers are searched again.
+class WorkspaceLocator:
+    ratio: float
+    size: tuple
+    # workspace name -> (marker centers (4, 2), homography to the workspace image)
+    cached: Dict[str, Tuple[np.ndarray, np.ndarray]]
+
+    def __init__(self, ratio: float) -> None:
+        self.ratio = ratio
+        self.size = workspace_size(ratio)
+        self.cached = {}
+
+    # Workspace image cut out of the frame, None if the markers can't be found
+    def extract(self, name: str, frame) -> np.ndarray | None:
+        if name in self.cached and markers_in_place(frame, self.cached[name][0]):
+            L.debug(f"Markers of workspace {name} in place, using cached homography")
+        else:
+            markers = find_markers(frame, self.ratio)
+
+            if markers is None:
+                self.cached.pop(name, None)
+                return None
+
+            L.info(f"Found markers of workspace {name}")
+            self.cached[name] = (markers, cv2.getPerspectiveTransform(markers, workspace_corners(self.size)))
+
+        return cv2.warpPerspective(frame, self.cached[name][1], self.size)
+
+    def markers(self, name: str) -> np.ndarray:
+        return self.cached[name][0]
+
+    def __str__(self) -> str:
+        return 'WorkspaceLocator(size=%s, cached=%s)' % (self.size, list(self.cached))
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+# Checks that a marker is found within MARKER_SHIFT pixels of every expected center,
+# only looking at a window around each center
+def markers_in_place(frame, markers: np.ndarray) -> bool:
+    height, width = frame.shape[:2]
+
+    for cx, cy in markers:
+        x0, y0 = max(0, int(cx) - MARKER_WINDOW), max(0, int(cy) - MARKER_WINDOW)
+        x1, y1 = min(width, int(cx) + MARKER_WINDOW + 1), min(height, int(cy) + MARKER_WINDOW + 1)
+
+        gray = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        img_thresh = cv2.adaptiveThreshold(gray, maxValue=255, adaptiveMethod=cv2.ADAPTIVE_THRESH_MEAN_C,
+                                           thresholdType=cv2.THRESH_BINARY, blockSize=15, C=25)
+
+        candidates = markers_detection.find_markers_from_img_thresh(img_thresh)
+        shifts = [np.hypot(x0 + m.cx - cx, y0 + m.cy - cy) for m in candidates]
+
+        if len(shifts) == 0 or min(shifts) > MARKER_SHIFT:
+            return False
+
+    return True
@@ -1,76 +1,84 @@
 import logging
-import math
 import numpy as np
 import cv.trackbar as tb
 from typing import List, Tuple
-from pyniryo import cv2, show_img_and_check_close
-from helper import rotate_around_center, vector_angle
+from pyniryo import cv2
+from cv.moments import classify, is_mirrored
+from cv.overlay import Overlay, draw_line
+from helper import rotate_around_center
+from main import get_block_classifier
 from model import LENGTH_FACTOR, Block, AREA_FACTOR, SHAPES
 
 
 L = logging.getLogger('CV-Blocks')
 
+# Steps per color channel of the color table (32 or 64), 0 to threshold in HSV instead.
+# cvtColor & inRange are vectorized in OpenCV, looking up the table from Python is not:
+# on a 905x640 picture the table needs ~2.9 ms, the HSV mask ~1.2 ms.
+COLOR_LUT_LEVELS = 0
+
+# built on first use
+color_lut = None
+
 
 def find_blocks(img) -> List[Block]:
-    features = __find_block_features(img)
+    overlay = Overlay('Blocks')
 
-    L.debug('Found Features:')
-    L.debug(features)
+    if get_block_classifier() == 'moments':
+        blocks = __find_blocks_by_moments(img, overlay)
 
-    blocks = __process_block_features(features, img)
+    else:
+        features = __find_block_features(img, overlay)
 
-    # show_img_and_check_close('After Processing', img)
+        L.debug('Found Features:')
+        L.debug(features)
+
+        blocks = __process_block_features(features, overlay)
 
     for block in blocks:
-        x = block.vertices.copy()
-
-        # Skalieren
-        for i in range(len(x)):
-            x[i] = (x[i][0] * LENGTH_FACTOR, x[i][1] * LENGTH_FACTOR)
-
-        # Center
-        x_sum = 0
-        y_sum = 0
-        for xx in x:
-            x_sum += xx[0]
-            y_sum += xx[1]
-        x_sum //= len(x)
-        y_sum //= len(x)
-        
-        # Verschieben
-        for i in range(len(x)):
-            x[i] = (x[i][0] + block.position[0] - x_sum, x[i][1] + block.position[1] - y_sum)
-
-        # Rotate shape
-        x = rotate_around_center(x, block.position, block.rotation)
-
-        # Convert vertices' coordinates to integers
-        for i in range(len(x)):
-            x[i] = (round(x[i][0]), round(x[i][1]))
-        
-        # Draw shape after rotating
-        cv2.polylines(img, pts=np.array([x]), color=(0, 255, 0), thickness=3, isClosed=True)
-        # Draw shape's center
-        cv2.circle(img, block.position, 5, (100, 100, 100), -1)
-
-
-    show_img_and_check_close('Blocks', img)
+        overlay.draw(__draw_block, block)
+
+    overlay.show(img)
 
     return blocks
 
 
 
 
+# Toleranzen beim Einrasten der Innenwinkel (°) und der Flächen (Einheitsflächen)
+ANGLE_TOLERANCE = 20.0
+AREA_TOLERANCE = 0.2
+
+SNAP_ANGLES = np.array([45.0, 90.0, 135.0])
+SNAP_AREAS = np.array([0.5, 1.0, 2.0])
+
+# Richtung vom Mittelpunkt zur Referenzecke, wenn der Stein nicht gedreht ist
+REFERENCE_DIRECTIONS = {'PA': (-1, -2), 'SQ': (-1, -1), 'ST': (-1, -1), 'MT': (0, 1), 'LT': (-1, -1)}
+
+SHAPE_NAMES = {'PA': 'PARALLELOGRAM', 'SQ': 'SQUARE', 'ST': 'SMALL TRIANGLE', 'MT': 'MEDIUM TRIANGLE', 'LT': 'LARGE TRIANGLE'}
+
+
 class BlockFeature:
     vertices: List[Tuple[float, float]]
     center: Tuple[float, float]
     area: float
+    # Geometrie, von measure_features für alle Features auf einmal berechnet
+    interior_angles: List[float] | None
+    scaled_area: float | None
+    shape: str | None
+    ref_vertex: int | None
+    rotation: float | None
 
 
     def __init__(self, vertices: List[Tuple[float, float]], center: Tuple[float, float], area: float) -> None:
         self.vertices = vertices
         self.center = center
         self.area = area
+        self.interior_angles = None
+        self.scaled_area = None
+        self.shape = None
+        self.ref_vertex = None
+        self.rotation = None
 
 
     def get_vertex_count(self) -> int:
@@ -78,77 +86,153 @@ class BlockFeature:
 
 
     def get_scaled_area(self) -> float:
-        TOLERANCE = 0.2
+        if self.scaled_area is None:
+            measure_features([self])
 
-        area = self.area / AREA_FACTOR
-        area = round(area, 1)
+        return self.scaled_area
 
-        if abs(0.5 - area) <= TOLERANCE:
-            area = 0.5
 
-        elif abs(1.0 - area) <= TOLERANCE:
-            area = 1.0
+    def get_interior_angles(self) -> list[float]:
+        if self.interior_angles is None:
+            measure_features([self])
 
-        elif abs(2.0 - area) <= TOLERANCE:
-            area = 2.0
+        return self.interior_angles
 
-        return area
 
+    def __str__(self) -> str:
+        return 'BlockFeature(vertices=%s, center=%s, area=%f)' % (self.vertices, self.center, self.area)
 
-    def get_interior_angles(self) -> list[float]:
-        TOLERANCE = 20.0
 
-        angles: List[float] = []
+    def __repr__(self) -> str:
+        return self.__str__()
 
-        for i in range(len(self.vertices)):
-            v = self.vertices[i].ravel()
-            a = self.vertices[(i+1)%len(self.vertices)].ravel()
-            b = self.vertices[(i-1)%len(self.vertices)].ravel()
 
-            a = a - v
-            b = b - v
+# Berechnet Innenwinkel, Fläche, Form, Referenzecke und Rotation aller Features in
+# einem Durchlauf. Die Ecken werden dafür in ein Array (Features x Ecken x 2)
+# gepackt, kürzere Features mit Nullen aufgefüllt und die Lücken maskiert. Die
+# Ergebnisse werden an den Features gespeichert.
+def measure_features(features: List[BlockFeature]) -> None:
+    if len(features) == 0:
+        return
 
-            angle = math.acos( np.dot(a, b) / ( abs(np.linalg.norm(a)) * abs(np.linalg.norm(b)) ) )
-            angle = math.degrees(angle)
+    counts = np.array([max(feature.get_vertex_count(), 1) for feature in features])
+    rows = np.arange(len(features))[:, None]
+    index = np.arange(counts.max())
+    valid = index < counts[:, None]
 
-            if abs(45.0 - angle) <= TOLERANCE:
-                angle = 45.0
-            elif abs(90.0 - angle) <= TOLERANCE:
-                angle = 90.0
-            elif abs(135.0 - angle) <= TOLERANCE:
-                angle = 135.0
+    vertices = np.zeros((len(features), counts.max(), 2))
+    for i, feature in enumerate(features):
+        vertices[i, :len(feature.vertices)] = np.reshape(feature.vertices, (-1, 2))
 
-            angles.append(angle)
+    centers = np.array([feature.center for feature in features], dtype=float)
+    areas = np.array([feature.area for feature in features], dtype=float)
 
-        return angles
+    # Innenwinkel zwischen den Kanten zur nächsten und zur vorherigen Ecke
+    following = vertices[rows, (index + 1) % counts[:, None]] - vertices
+    previous = vertices[rows, (index - 1) % counts[:, None]] - vertices
 
+    angles = snap(angle_between(following, previous), SNAP_ANGLES, ANGLE_TOLERANCE)
+    angles[~valid] = np.nan
 
-    def __str__(self) -> str:
-        return 'BlockFeature(vertices=%s, center=%s, area=%f)' % (self.vertices, self.center, self.area)
+    scaled_areas = snap(np.round(areas / AREA_FACTOR, 1), SNAP_AREAS, AREA_TOLERANCE)
 
+    # Form
+    largest = np.where(valid, angles, 0.0).max(axis=1)
+    square = (counts == 4) & (scaled_areas == 1.0)
+    triangle = counts == 3
 
-    def __repr__(self) -> str:
-        return self.__str__()
+    shapes = np.select(
+        [square & (largest == 135.0), square, triangle & (scaled_areas == 0.5), triangle & (scaled_areas == 1.0), triangle & (scaled_areas == 2.0)],
+        ['PA', 'SQ', 'ST', 'MT', 'LT'],
+        default='')
+
+    # Referenzecke: beim Parallelogramm die erste 45°-Ecke, beim Quadrat die oberste,
+    # bei den Dreiecken die 90°-Ecke
+    is_45 = angles == 45.0
+    is_90 = angles == 90.0
+    heights = np.where(valid, vertices[..., 1], np.inf)
+
+    refs = np.select([shapes == 'PA', shapes == 'SQ'], [is_45.argmax(axis=1), heights.argmin(axis=1)], default=is_90.argmax(axis=1))
+    found = np.select([shapes == 'PA', shapes == 'SQ'], [is_45.any(axis=1), True], default=is_90.any(axis=1))
+    shapes[~found] = ''
+
+    # Rotation: Winkel zwischen Referenzecke und ihrer Richtung ohne Drehung
+    directions = np.array([REFERENCE_DIRECTIONS.get(shape, (0, 1)) for shape in shapes], dtype=float)
+    periods = np.array([SHAPES[shape].period if shape else 360 for shape in shapes])
+    ref_vectors = vertices[rows[:, 0], refs] - centers
+
+    rotations = angle_between(ref_vectors, directions)
+
+    # Dreiecke: Rotation > 180° korrigieren, Quadrat & Parallelogramm: Symmetrie
+    cross = ref_vectors[:, 0] * directions[:, 1] - ref_vectors[:, 1] * directions[:, 0]
+    triangles = np.isin(shapes, ('ST', 'MT', 'LT'))
+
+    rotations = np.where(triangles & (cross > 0), 360 - rotations, rotations)
+    rotations = np.where(triangles, rotations, rotations % periods)
+
+    for i, feature in enumerate(features):
+        feature.interior_angles = angles[i, :feature.get_vertex_count()].tolist()
+        feature.scaled_area = float(scaled_areas[i])
+        feature.shape = str(shapes[i]) or None
+        feature.ref_vertex = int(refs[i]) if feature.shape else None
+        feature.rotation = float(rotations[i]) if feature.shape else None
 
 
-def __find_block_features(img) -> List[BlockFeature]:
+# Winkel (°) zwischen den Vektoren a und b entlang der letzten Achse
+def angle_between(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cosine = np.sum(a * b, axis=-1) / (np.linalg.norm(a, axis=-1) * np.linalg.norm(b, axis=-1))
+
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+# Rastet Werte auf den ersten Zielwert ein, der höchstens tolerance entfernt ist
+def snap(values: np.ndarray, targets: np.ndarray, tolerance: float) -> np.ndarray:
+    close = np.abs(values[..., None] - targets) <= tolerance
+
+    return np.where(close.any(axis=-1), targets[close.argmax(axis=-1)], values)
+
+
+def __find_block_contours(img) -> list:
     # Blur image to reduce noise
     img_blur = blur(img)
     
     # Apply color mask to find colored areas
     img_mask = color_mask(img_blur)
     
-    # Apply edge detection
-    img_edge = find_edges(img_mask)
+    # Remove noise & holes, the contours are taken directly from the mask
+    img_clean = clean_mask(img_mask)
 
-    features: List[BlockFeature] = []
+    # Skip contours that are too small
+    return [contour for contour in find_contours(img_clean) if not contour_too_small(contour)]
 
-    for contour in find_contours(img_edge):
 
-        # Skip if contour is too small
-        if contour_too_small(contour):
+# Form & Rotation direkt aus den Momenten der Kontur (siehe cv.moments)
+def __find_blocks_by_moments(img, overlay: Overlay) -> List[Block]:
+    blocks: List[Block] = []
+
+    for contour in __find_block_contours(img):
+        overlay.draw(__draw_contour, contour)
+
+        match = classify(contour)
+
+        if match is None:
+            L.debug('Invalid Contour: area=%f' % cv2.contourArea(contour))
             continue
 
+        overlay.draw(__draw_center, match.center)
+        L.debug('%s: center=%s angle=%f° (Hu-Abstand %.4f)%s' % (SHAPE_NAMES[match.shape], match.center, match.rotation, match.distance, ' umgedreht' if match.mirrored else ''))
+
+        blocks.append(Block(SHAPES[match.shape], match.center, match.rotation, match.mirrored))
+
+    return blocks
+
+
+def __find_block_features(img, overlay: Overlay) -> List[BlockFeature]:
+    features: List[BlockFeature] = []
+
+    for contour in __find_block_contours(img):
+
         # Find corners of the contour
         corners = find_corners(contour)
 
@@ -158,10 +242,10 @@ def __find_block_features(img) -> List[BlockFeature]:
         features.append(BlockFeature(corners, center, cv2.contourArea(contour)))
 
 
-        __draw_contour(img, contour)
-        __draw_corners(img, corners)
-        __draw_center(img, center)
-        __draw_contour_info(img, contour, corners)
+        overlay.draw(__draw_contour, contour)
+        overlay.draw(__draw_corners, corners)
+        overlay.draw(__draw_center, center)
+        overlay.draw(__draw_contour_info, contour, corners)
 
 
     # show_img_and_check_close('Blocks: Color Mask', img_mask)
@@ -169,167 +253,152 @@ def __find_block_features(img) -> List[BlockFeature]:
     return features
 
 
-def __process_block_features(features: List[BlockFeature], img) -> List[Block]:
+def __process_block_features(features: List[BlockFeature], overlay: Overlay) -> List[Block]:
     blocks: List[Block] = []
 
+    measure_features(features)
+
     for feature in features:
-        vertex_count = feature.get_vertex_count()
-        area = feature.get_scaled_area()
-        int_angles = feature.get_interior_angles()
+        if feature.shape is None:
+            L.debug('Invalid Feature: %s' % feature)
+            continue
 
-        if vertex_count == 4 and area == 1.0:
+        ref_vertex = feature.vertices[feature.ref_vertex]
 
-            if max(int_angles) == 135.0:
-                block = __process_parallelogram(feature, img)
-                blocks.append(block)
+        overlay.draw(draw_line, feature.center, ref_vertex[0], (255, 0, 0), 3)
+        mirrored = is_mirrored(feature.shape, feature.vertices)
+        L.debug('%s: center=%s angle=%f°%s' % (SHAPE_NAMES[feature.shape], feature.center, feature.rotation, ' umgedreht' if mirrored else ''))
 
-            else:
-                block = __process_square(feature, img)
-                blocks.append(block)
+        blocks.append(Block(SHAPES[feature.shape], feature.center, feature.rotation, mirrored))
 
-        elif vertex_count == 3:
+    return blocks
 
-            if area == 0.5:
-                block = __process_small_triangle(feature, img)
-                blocks.append(block)
 
-            elif area == 1.0:
-                block = __process_medium_triangle(feature, img)
-                blocks.append(block)
 
-            elif area == 2.0:
-                block = __process_large_triangle(feature, img)
-                blocks.append(block)
 
-        else:
-            print('Invalid Feature:', feature)
-        
-    return blocks
 
 
-def __process_parallelogram(feature: BlockFeature, img) -> Block:
-    interior_angles = feature.get_interior_angles()
-    ref_vertex = feature.vertices[interior_angles.index(45)]
-                
-    angle = vector_angle(ref_vertex - feature.center, (-1, -2)) % 180
+#=====================#
+# CV HELPER FUNCTIONS #
+#=====================#
 
-    cv2.line(img, feature.center, ref_vertex[0], (255, 0, 0), 3)
-    L.debug('PARALLELOGRAM: center=%s angle=%f°' % (feature.center, angle))
+def blur(img):
+    # the mask is cleaned afterwards anyway, blurring is optional
+    if tb.VALUES.B_BLUR_KERNEL == 0:
+        return img
 
-    return Block(SHAPES['PA'], feature.center, angle)
+    kernel_size = tb.VALUES.B_BLUR_KERNEL * 2 + 1
+    
+    blur_kernel = (kernel_size, kernel_size)
 
+    img_blurred = cv2.GaussianBlur(img, blur_kernel, 1)
 
-def __process_square(feature: BlockFeature, img) -> Block:
-    ref_vertex = feature.vertices[0]
+    return img_blurred
 
-    for v in feature.vertices:
-        if v[0][1] < ref_vertex[0][1]:
-            ref_vertex = v
-    
-    angle = vector_angle(ref_vertex - feature.center, (-1, -1)) % 90
-    
-    cv2.line(img, feature.center, ref_vertex[0], (255, 0, 0), 3)
-    L.debug('SQUARE: center=%s angle=%f°' % (feature.center, angle))
 
-    return Block(SHAPES['SQ'], feature.center, angle)
+def color_mask(img):
+    global color_lut
 
+    if COLOR_LUT_LEVELS > 0:
+        if color_lut is None or color_lut.levels != COLOR_LUT_LEVELS:
+            color_lut = ColorLut(COLOR_LUT_LEVELS)
 
-def __process_small_triangle(feature: BlockFeature, img) -> Block:
-    interior_angles = feature.get_interior_angles()
-    ref_vertex = feature.vertices[interior_angles.index(90)]
-                
-    angle = vector_angle(ref_vertex - feature.center, (-1, -1))
+        return color_lut.lookup(img)
 
-    # Fix rotation > 180°
-    cross = np.cross((ref_vertex-feature.center), (-1, -1))
-    if cross > 0:
-        angle = 360 - angle
-    
-    cv2.line(img, feature.center, ref_vertex[0], (255, 0, 0), 3)
-    L.debug('SMALL TRIANGLE: center=%s angle=%f°' % (feature.center, angle))
+    return hsv_mask(img, mask_bounds())
 
-    return Block(SHAPES['ST'], feature.center, angle)
 
+# (lower, upper) HSV bounds of the blocks
+def mask_bounds() -> Tuple[tuple, tuple]:
+    lower = (tb.VALUES.B_MASK_LOWER_H, tb.VALUES.B_MASK_LOWER_S, tb.VALUES.B_MASK_LOWER_V)
+    upper = (tb.VALUES.B_MASK_UPPER_H, tb.VALUES.B_MASK_UPPER_S, tb.VALUES.B_MASK_UPPER_V)
 
-def __process_medium_triangle(feature: BlockFeature, img) -> Block:
-    interior_angles = feature.get_interior_angles()
-    ref_vertex = feature.vertices[interior_angles.index(90)]
-    
-    angle = vector_angle(ref_vertex - feature.center, (0, 1))
+    return lower, upper
 
-    # Fix rotation > 180°
-    cross = np.cross((ref_vertex-feature.center), (0, 1))
-    if cross > 0:
-        angle = 360 - angle
-    
-    cv2.line(img, feature.center, ref_vertex[0], (255, 0, 0), 3)
-    L.debug('MEDIUM TRIANGLE: center=%s angle=%f°' % (feature.center, angle))
-    
-    return Block(SHAPES['MT'], feature.center, angle)
 
+def hsv_mask(img, bounds: Tuple[tuple, tuple]):
+    (lower_h, lower_s, lower_v), (upper_h, upper_s, upper_v) = bounds
 
-def __process_large_triangle(feature: BlockFeature, img) -> Block:
-    interior_angles = feature.get_interior_angles()
-    ref_vertex = feature.vertices[interior_angles.index(90)]
-                
-    angle = vector_angle(ref_vertex - feature.center, (-1, -1))
-    
-    # Fix rotation > 180°
-    cross = np.cross((ref_vertex-feature.center), (-1, -1))
-    if cross > 0:
-        angle = 360 - angle
+    # Hue is circular (0-179), with lower > upper the range wraps around 179 -> 0 (red).
+    # Converting the BGR image as if it was RGB mirrors the hue (h -> 120 - h), which
+    # turns such a range into a normal one, so the mask is still a single inRange.
+    if lower_h <= upper_h:
+        img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
 
-    cv2.line(img, feature.center, ref_vertex[0], (255, 0, 0), 3)
-    L.debug('LARGE TRIANGLE: center=%s angle=%f°' % (feature.center, angle))
-    
-    return Block(SHAPES['LT'], feature.center, angle)
+    elif upper_h < 120 < lower_h:
+        img_hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV)
+        lower_h, upper_h = 120 - upper_h, 300 - lower_h
 
+    else:
+        img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        img_masked = cv2.inRange(img_hsv, (lower_h, lower_s, lower_v), (179, upper_s, upper_v))
 
+        return img_masked | cv2.inRange(img_hsv, (0, lower_s, lower_v), (upper_h, upper_s, upper_v))
 
+    lower = (lower_h, lower_s, lower_v)
+    upper = (upper_h, upper_s, upper_v)
 
+    img_masked = cv2.inRange(img_hsv, lower, upper)
 
+    return img_masked
 
-#=====================#
-# CV HELPER FUNCTIONS #
-#=====================#
 
-def blur(img):
-    kernel_size = tb.VALUES.B_BLUR_KERNEL * 2 + 1
-    
-    blur_kernel = (kernel_size, kernel_size)
+# Mask value for every color, quantized to `levels` steps per channel. Each color is
+# classified once (like hsv_mask would), afterwards a mask is one table lookup per
+# pixel: the quantized B, G & R of a pixel are read as one number (B + G<<8 + R<<16)
+# which indexes the table. The table is built again when the bounds change.
+class ColorLut:
+    levels: int
+    bounds: Tuple[tuple, tuple] | None
+    quantize: np.ndarray
+    table: np.ndarray | None
 
-    img_blurred = cv2.GaussianBlur(img, blur_kernel, 1)
+    def __init__(self, levels: int) -> None:
+        self.levels = levels
+        self.bounds = None
+        self.quantize = (np.arange(256) // (256 // levels)).astype(np.uint8)
+        self.table = None
 
-    return img_blurred
+    def lookup(self, img):
+        bounds = mask_bounds()
 
+        if bounds != self.bounds:
+            self.build(bounds)
 
-def color_mask(img):
-    lower_h = tb.VALUES.B_MASK_LOWER_H
-    lower_s = tb.VALUES.B_MASK_LOWER_S
-    lower_v = tb.VALUES.B_MASK_LOWER_V
-    upper_h = tb.VALUES.B_MASK_UPPER_H
-    upper_s = tb.VALUES.B_MASK_UPPER_S
-    upper_v = tb.VALUES.B_MASK_UPPER_V
+        img_quantized = cv2.cvtColor(cv2.LUT(img, self.quantize), cv2.COLOR_BGR2BGRA)
+        img_quantized[..., 3] = 0
 
-    lower = (lower_h, lower_s, lower_v)
-    upper = (upper_h, upper_s, upper_v)
+        return self.table.take(img_quantized.view(np.uint32)[..., 0])
 
-    img_masked = cv2.inRange(img, lower, upper)
+    def build(self, bounds: Tuple[tuple, tuple]) -> None:
+        L.debug('Building color table with %d levels for %s' % (self.levels, bounds))
 
-    return img_masked
+        step = 256 // self.levels
+        b, g, r = np.meshgrid(*[np.arange(self.levels)] * 3, indexing='ij')
 
+        # classify the center of every quantization step
+        colors = np.stack([b, g, r], axis=-1).reshape(-1, 1, 3) * step + step // 2
 
-def find_edges(img):
-    threshold_1 = tb.VALUES.B_CANNY_1
-    threshold_2 = tb.VALUES.B_CANNY_2
+        self.table = np.zeros(self.levels << 16, dtype=np.uint8)
+        self.table[(b + (g << 8) + (r << 16)).ravel()] = hsv_mask(colors.astype(np.uint8), bounds).ravel()
+        self.bounds = bounds
+
+    def __str__(self) -> str:
+        return 'ColorLut(levels=%d, bounds=%s)' % (self.levels, self.bounds)
+
+    def __repr__(self) -> str:
+        return self.__str__()
 
-    img_canny = cv2.Canny(img, threshold_1, threshold_2)
-    
-    kernel_size = tb.VALUES.B_DILATE_K_SIZE
-    kernel = np.ones((kernel_size, kernel_size))
-    img_edges = cv2.dilate(img_canny, kernel, iterations=1)
 
-    return img_edges
+# Opening removes single pixels, closing fills small holes (e.g. reflections)
+def clean_mask(img):
+    kernel_size = max(tb.VALUES.B_MORPH_K_SIZE, 1)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
+
+    img_opened = cv2.morphologyEx(img, cv2.MORPH_OPEN, kernel)
+    img_cleaned = cv2.morphologyEx(img_opened, cv2.MORPH_CLOSE, kernel)
+
+    return img_cleaned
 
 
 def find_contours(img):
@@ -397,3 +466,37 @@ def __draw_contour_info(img, contour, corners) -> None:
     x, y, _, _ = cv2.boundingRect(corners)
 
     cv2.putText(img, str(num_corners) + ' ' + str(round(cv2.contourArea(contour), 2)), (x, y-10), cv2.FONT_HERSHEY_COMPLEX, 0.6, (0, 0, 0), 1)
+
+
+# Umriss des erkannten Steins in seiner Lage
+def __draw_block(img, block: Block) -> None:
+    x = block.vertices.copy()
+
+    # Skalieren
+    for i in range(len(x)):
+        x[i] = (x[i][0] * LENGTH_FACTOR, x[i][1] * LENGTH_FACTOR)
+
+    # Center
+    x_sum = 0
+    y_sum = 0
+    for xx in x:
+        x_sum += xx[0]
+        y_sum += xx[1]
+    x_sum //= len(x)
+    y_sum //= len(x)
+    
+    # Verschieben
+    for i in range(len(x)):
+        x[i] = (x[i][0] + block.position[0] - x_sum, x[i][1] + block.position[1] - y_sum)
+
+    # Rotate shape
+    x = rotate_around_center(x, block.position, block.rotation)
+
+    # Convert vertices' coordinates to integers
+    for i in range(len(x)):
+        x[i] = (round(x[i][0]), round(x[i][1]))
+    
+    # Draw shape after rotating
+    cv2.polylines(img, pts=np.array([x]), color=(0, 255, 0), thickness=3, isClosed=True)
+    # Draw shape's center
+    cv2.circle(img, block.position, 5, (100, 100, 100), -1)
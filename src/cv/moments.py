@@ -0,0 +1,191 @@
+import logging
+import math
+import numpy as np
+from typing import Dict, Tuple
+from pyniryo import cv2
+from model import AREA_FACTOR, LENGTH_FACTOR, SHAPES
+
+
+L = logging.getLogger('CV-Moments')
+
+
+# Erkennung der Steine direkt über die Momente ihrer Kontur, ohne Ecken und
+# Innenwinkel. Die Hu-Momente sind unabhängig von Lage, Drehung und Größe: das
+# zweite misst, wie gestreckt eine Form ist, das dritte, wie unsymmetrisch sie ist
+# (Quadrat und Parallelogramm sind punktsymmetrisch, die Dreiecke nicht). Beides
+# bleibt auch bei abgerundeten Ecken erhalten und trennt Quadrat, Dreieck und
+# Parallelogramm; die drei Dreiecke unterscheiden sich nur in der Fläche.
+#
+# Die Rotation kommt aus der Hauptachse der zentralen Momente 2. Ordnung, bei den
+# Dreiecken zeigen die Momente 3. Ordnung in welche Richtung. Beim Quadrat sind die
+# Momente 2. Ordnung in jeder Richtung gleich, dort liefert das kleinste
+# umschließende Rechteck die Lage der Kanten.
+#
+# Die Referenzwerte werden aus den Formen in model.SHAPES berechnet, so wie sie
+# beim Zeichnen der erkannten Steine gedreht werden (siehe __draw_block). Die
+# Rotation hat also dieselbe Bedeutung wie bisher.
+#
+# Das Parallelogramm ist chiral (Shape.chiral): umgedreht ist es sein
+# Spiegelbild, das sich durch keine Drehung herstellen lässt. Punktsymmetrisch
+# wie es ist, sind alle ungeraden Momente (und damit Hu 7) null, die Hu-Momente
+# unterscheiden die beiden Seiten also nicht. Stattdessen entscheidet das
+# Vorzeichen des Moments u³·v im Hauptachsensystem (get_handedness): es ändert
+# sich mit der Lage nicht, beim Spiegeln aber schon.
+
+# Größter Abstand der Signatur zur Referenz (zwischen den Formen liegen mindestens 0.1)
+MAX_SIGNATURE_DISTANCE = 0.06
+
+# Größte relative Abweichung der Fläche
+AREA_TOLERANCE = 0.3
+
+
+class ShapeSignature:
+    name: str
+    signature: np.ndarray
+    area: float
+    # Ausrichtung (°) der Form bei Rotation 0
+    orientation: float
+    # Vorzeichen von get_handedness (0 bei nicht chiralen Formen)
+    handedness: float
+
+    def __init__(self, name: str) -> None:
+        shape = SHAPES[name]
+        polygon = (np.array(shape.vertices, dtype=np.float32) * LENGTH_FACTOR).reshape(-1, 1, 2)
+        moments = cv2.moments(polygon)
+        hu = cv2.HuMoments(moments).ravel()
+
+        self.name = name
+        self.signature = get_signature(hu)
+        self.area = shape.area
+        self.orientation = get_orientation(moments, polygon, shape.period)
+        self.handedness = float(np.sign(get_handedness(polygon))) if shape.chiral else 0.0
+
+    def __str__(self) -> str:
+        return 'ShapeSignature(name=%s, signature=%s, area=%.1f, orientation=%.1f, handedness=%+.0f)' % (self.name, self.signature.round(3).tolist(), self.area, self.orientation, self.handedness)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class MomentMatch:
+    shape: str
+    center: Tuple[int, int]
+    rotation: float
+    distance: float
+    # Umgedrehter chiraler Stein (Spiegelbild der Form)
+    mirrored: bool
+
+    def __init__(self, shape: str, center: Tuple[int, int], rotation: float, distance: float, mirrored: bool) -> None:
+        self.shape = shape
+        self.center = center
+        self.rotation = rotation
+        self.distance = distance
+        self.mirrored = mirrored
+
+    def __str__(self) -> str:
+        return 'MomentMatch(shape=%s, center=%s, rotation=%f, distance=%.4f, mirrored=%s)' % (self.shape, self.center, self.rotation, self.distance, self.mirrored)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+# Form, Mittelpunkt & Rotation eines Steins, None wenn die Kontur zu keiner Form passt
+def classify(contour) -> MomentMatch | None:
+    moments = cv2.moments(contour)
+
+    if moments['m00'] == 0:
+        return None
+
+    hu = cv2.HuMoments(moments).ravel()
+    area = moments['m00'] / AREA_FACTOR
+
+    # Die Signatur bestimmt die Art der Form, die Fläche die Größe (Dreiecke)
+    distances = {name: float(np.linalg.norm(get_signature(hu) - signature.signature)) for name, signature in SIGNATURES.items()}
+    distance = min(distances.values())
+
+    candidates = [SIGNATURES[name] for name in SIGNATURES if distances[name] <= distance + 1e-9]
+    signature = min(candidates, key=lambda signature: abs(math.log(area / signature.area)))
+
+    if distance > MAX_SIGNATURE_DISTANCE or abs(math.log(area / signature.area)) > math.log(1 + AREA_TOLERANCE):
+        L.debug('Keine Form passt: Signatur=%s, Fläche=%.2f' % (get_signature(hu).round(3).tolist(), area))
+        return None
+
+    period = SHAPES[signature.name].period
+    rotation = (get_orientation(moments, contour, period) - signature.orientation) % period
+
+    center = (int(moments['m10'] // moments['m00']), int(moments['m01'] // moments['m00']))
+
+    return MomentMatch(signature.name, center, rotation, distance, is_mirrored(signature.name, contour))
+
+
+# Streckung & Unsymmetrie (Wurzel, damit kleine Werte nicht verschwinden)
+def get_signature(hu: np.ndarray) -> np.ndarray:
+    return np.sqrt(np.abs(hu[1:3]))
+
+
+# Ausrichtung (°) einer Form mit der gegebenen Periode
+def get_orientation(moments: Dict[str, float], contour, period: int) -> float:
+    # Quadrat: Richtung einer Kante
+    if period == 90:
+        box = cv2.boxPoints(cv2.minAreaRect(contour))
+        dx, dy = box[1] - box[0]
+
+        return math.degrees(math.atan2(dy, dx)) % 90
+
+    # Hauptachse der Momente 2. Ordnung
+    major = 0.5 * math.atan2(2 * moments['mu11'], moments['mu20'] - moments['mu02'])
+
+    if period == 180:
+        return math.degrees(major) % 180
+
+    # Ohne Symmetrie: die Achse, entlang der die Form am schiefsten ist, und die
+    # Richtung, in die sie ausläuft
+    axis = max((major, major + math.pi / 2), key=lambda angle: abs(get_skewness(moments, angle)))
+
+    if get_skewness(moments, axis) < 0:
+        axis += math.pi
+
+    return math.degrees(axis) % 360
+
+
+# Zentrales Moment 3. Ordnung entlang der Richtung angle
+def get_skewness(moments: Dict[str, float], angle: float) -> float:
+    c = math.cos(angle)
+    s = math.sin(angle)
+
+    return c**3 * moments['mu30'] + 3 * c**2 * s * moments['mu21'] + 3 * c * s**2 * moments['mu12'] + s**3 * moments['mu03']
+
+
+# Liegt die Kontur (oder die Ecken) eines Steins der Form name gespiegelt, also umgedreht?
+def is_mirrored(name: str, points) -> bool:
+    reference = SIGNATURES[name].handedness
+
+    return reference != 0 and np.sign(get_handedness(points)) == -reference
+
+
+# Mittelwert von u³·v über die Fläche der Kontur, mit u entlang der Hauptachse
+# und v senkrecht dazu. Die Richtung der Hauptachse (u oder -u) ist egal, da
+# dann auch v das Vorzeichen wechselt
+def get_handedness(points) -> float:
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    moments = cv2.moments(points.reshape(-1, 1, 2))
+
+    if moments['m00'] == 0:
+        return 0.0
+
+    x, y, width, height = cv2.boundingRect(points.reshape(-1, 1, 2))
+    mask = np.zeros((height + 2, width + 2), np.uint8)
+    cv2.fillPoly(mask, [np.round(points - (x - 1, y - 1)).astype(np.int32)], 1)
+
+    ys, xs = np.nonzero(mask)
+    dx = xs + (x - 1) - moments['m10'] / moments['m00']
+    dy = ys + (y - 1) - moments['m01'] / moments['m00']
+
+    major = 0.5 * math.atan2(2 * moments['mu11'], moments['mu20'] - moments['mu02'])
+    u = dx * math.cos(major) + dy * math.sin(major)
+    v = dy * math.cos(major) - dx * math.sin(major)
+
+    return float(np.mean(u**3 * v))
+
+
+SIGNATURES: Dict[str, ShapeSignature] = {name: ShapeSignature(name) for name in SHAPES}
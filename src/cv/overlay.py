@@ -0,0 +1,70 @@
+import logging
+import threading
+from queue import SimpleQueue
+from typing import Callable, List, Tuple
+from pyniryo import cv2, show_img_and_check_close
+from main import is_headless
+
+
+L = logging.getLogger('CV-Overlay')
+
+# HighGUI ist nicht threadsicher und muss im Hauptthread bleiben. Overlays aus
+# anderen Threads (z.B. der Erkennung in der Pipeline) werden dort nur gezeichnet
+# und hier vorgemerkt, show_pending zeigt sie dann im Hauptthread an.
+pending: SimpleQueue = SimpleQueue()
+
+
+# Debug-Ebene über einem Bild: Die Zeichenbefehle werden nur gesammelt und erst
+# beim Anzeigen auf eine Kopie des Bildes gezeichnet, das Arbeitsbild bleibt also
+# unverändert. Im Headless-Modus wird nichts gesammelt, gezeichnet oder angezeigt.
+class Overlay:
+    title: str
+    enabled: bool
+    # (Zeichenfunktion, Argumente nach dem Bild)
+    commands: List[Tuple[Callable, tuple]]
+
+    def __init__(self, title: str) -> None:
+        self.title = title
+        self.enabled = not is_headless()
+        self.commands = []
+
+    # function(img, *args) wird beim Anzeigen aufgerufen
+    def draw(self, function: Callable, *args) -> None:
+        if self.enabled:
+            self.commands.append((function, args))
+
+    def render(self, img):
+        canvas = img.copy()
+
+        for function, args in self.commands:
+            function(canvas, *args)
+
+        return canvas
+
+    def show(self, img) -> None:
+        if not self.enabled:
+            return
+
+        canvas = self.render(img)
+
+        if threading.current_thread() is threading.main_thread():
+            show_img_and_check_close(self.title, canvas)
+        else:
+            pending.put((self.title, canvas))
+
+    def __str__(self) -> str:
+        return 'Overlay(title=%s, enabled=%s, commands=%d)' % (self.title, self.enabled, len(self.commands))
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+# Zeigt die aus anderen Threads vorgemerkten Overlays an (nur im Hauptthread aufrufen)
+def show_pending() -> None:
+    while not pending.empty():
+        title, img = pending.get()
+        show_img_and_check_close(title, img)
+
+
+def draw_line(img, start, end, color, thickness) -> None:
+    cv2.line(img, start, end, color, thickness)
@@ -2,8 +2,9 @@ import logging
 import math
 import numpy as np
 import cv.trackbar as tb
-from pyniryo import cv2, show_img_and_check_close
-from model import ShadowPoint, Point, Edge, ShadowEdge, Shadow, edges_equal_direction_sensitive
+from pyniryo import cv2
+from cv.overlay import Overlay
+from model import SHADOW_AREA_FACTOR, ShadowPoint, Point, Edge, ShadowEdge, Shadow, edges_equal_direction_sensitive
 from random import random
 
 
@@ -16,9 +17,11 @@ def find_shadows(img) -> list[Shadow]:
     L.debug('Found Features:')
     L.debug(features)
 
-    shadows = __process_shadow_features(features, img)
+    overlay = Overlay('Shadows')
 
-    show_img_and_check_close('Shadows', img)
+    shadows = __process_shadow_features(features, overlay)
+
+    overlay.show(img)
 
     return shadows
 
@@ -46,13 +49,13 @@ def __get_area(points: list[Point]) -> float:
         accumulator += points[i].x * (points[(i+1) % len(points)].y - points[i-1].y)
 
     area = abs(0.5 * accumulator)
-    area_scaled = (area / 14290)
+    area_scaled = (area / SHADOW_AREA_FACTOR)
     area_rounded = round(area_scaled * 2) / 2
 
     return area_rounded
 
 
-def __process_shadow_features(features: list[ShadowPoint], img) -> list[Shadow]:
+def __process_shadow_features(features: list[ShadowPoint], overlay: Overlay) -> list[Shadow]:
     shadows: list[Shadow] = []
 
     for shadow in features:
@@ -65,17 +68,7 @@ def __process_shadow_features(features: list[ShadowPoint], img) -> list[Shadow]:
 
 
         # Ecken markieren
-        points = []
-        for c in shadow.points:
-            center = [int(c.x), int(c.y)]
-            points.append(center)
-        hsv = np.uint8([[[ int(random() * 255), 255, 255 ]]])  
-        bgr = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR).flatten()
-        bgr = (int(bgr[0]), int(bgr[1]), int(bgr[2]))
-        cv2.polylines(img, np.array([points]), True, bgr, 3)
-        for c in points:
-            cv2.circle(img, c, 5, (0, 0, 0), -1)
-            cv2.circle(img, c, 3, (255, 255, 255), -1)
+        overlay.draw(__draw_shadow, list(shadow.points))
 
 
         # Innenwinkelsumme jedes Polygons kann mithilfe dieser Formel berechnet werden
@@ -93,6 +86,20 @@ def __process_shadow_features(features: list[ShadowPoint], img) -> list[Shadow]:
 
 
 
+def __draw_shadow(img, shadow_points: list[Point]) -> None:
+    points = []
+    for c in shadow_points:
+        center = [int(c.x), int(c.y)]
+        points.append(center)
+    hsv = np.uint8([[[ int(random() * 255), 255, 255 ]]])  
+    bgr = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR).flatten()
+    bgr = (int(bgr[0]), int(bgr[1]), int(bgr[2]))
+    cv2.polylines(img, np.array([points]), True, bgr, 3)
+    for c in points:
+        cv2.circle(img, c, 5, (0, 0, 0), -1)
+        cv2.circle(img, c, 3, (255, 255, 255), -1)
+
+
 
 
 
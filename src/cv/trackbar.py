@@ -1,3 +1,4 @@
+import multiprocessing
 from pyniryo import cv2
 from main import show_trackbars
 
@@ -20,16 +21,15 @@ NW_BLOCKS = 'CV: Blocks'
 NW_SHADOW = 'CV: Shadow'
 
 class Values:
-    B_BLUR_KERNEL = 1
-    B_MASK_LOWER_H = 0
-    B_MASK_LOWER_S = 0
+    B_BLUR_KERNEL = 0
+    # HSV (H 0-179, wraps around if lower > upper): red & saturated blocks
+    B_MASK_LOWER_H = 150
+    B_MASK_LOWER_S = 80
     B_MASK_LOWER_V = 30
-    B_MASK_UPPER_H = 115
+    B_MASK_UPPER_H = 30
     B_MASK_UPPER_S = 255
     B_MASK_UPPER_V = 255
-    B_CANNY_1 = 0
-    B_CANNY_2 = 0
-    B_DILATE_K_SIZE = 1
+    B_MORPH_K_SIZE = 3
     B_MIN_CONTOUR_AREA = 200
     B_CORNER_ACCURACY = 5
 
@@ -43,18 +43,17 @@ VALUES = Values()
 
 
 
-if show_trackbars():
+# Nur im Hauptprozess, nicht in den Prozessen der parallelen Suche (die main erneut importieren)
+if show_trackbars() and multiprocessing.parent_process() is None:
     create_window(NW_BLOCKS)
     create_trackbar(NW_BLOCKS, 'Blur Kernel',       'B_BLUR_KERNEL',        10)
-    create_trackbar(NW_BLOCKS, 'Mask Lower H',      'B_MASK_LOWER_H',       255)
+    create_trackbar(NW_BLOCKS, 'Mask Lower H',      'B_MASK_LOWER_H',       179)
     create_trackbar(NW_BLOCKS, 'Mask Lower S',      'B_MASK_LOWER_S',       255)
     create_trackbar(NW_BLOCKS, 'Mask Lower V',      'B_MASK_LOWER_V',       255)
-    create_trackbar(NW_BLOCKS, 'Mask Upper H',      'B_MASK_UPPER_H',       255)
+    create_trackbar(NW_BLOCKS, 'Mask Upper H',      'B_MASK_UPPER_H',       179)
     create_trackbar(NW_BLOCKS, 'Mask Upper S',      'B_MASK_UPPER_S',       255)
     create_trackbar(NW_BLOCKS, 'Mask Upper V',      'B_MASK_UPPER_V',       255)
-    create_trackbar(NW_BLOCKS, 'Canny 1',           'B_CANNY_1',            255)
-    create_trackbar(NW_BLOCKS, 'Canny 2',           'B_CANNY_2',            255)
-    create_trackbar(NW_BLOCKS, 'Dilate Kernel',     'B_DILATE_K_SIZE',      10)
+    create_trackbar(NW_BLOCKS, 'Morph Kernel',      'B_MORPH_K_SIZE',       10)
     create_trackbar(NW_BLOCKS, 'Min Contour Area',  'B_MIN_CONTOUR_AREA',   500)
     create_trackbar(NW_BLOCKS, 'Corner Accuracy',   'B_CORNER_ACCURACY',    1000)
 
@@ -11,8 +11,17 @@ load_dotenv(find_dotenv())
 parser = argparse.ArgumentParser("env")
 parser.add_argument('-e', '--env', default="dev")
 parser.add_argument('-tb', '--trackbars', nargs='?', const='')
+parser.add_argument('-s', '--solver', default='geometric', choices=['geometric', 'dlx', 'parallel'])
+parser.add_argument('-nc', '--no-cache', action='store_true')
+parser.add_argument('-t', '--time-budget', type=float, default=10)
+parser.add_argument('-u', '--undistort', default='frame', choices=['frame', 'points'])
+parser.add_argument('-c', '--classifier', default='moments', choices=['moments', 'vertices'])
 
-args = parser.parse_args()
+# Other entry points (e.g. build_library.py) import these settings too, their own arguments are left to them
+args, _ = parser.parse_known_args()
+
+# Set by entry points that never show windows
+headless = False
 
 def get_run_env():
     return args.env
@@ -20,6 +29,29 @@ def get_run_env():
 def show_trackbars():
     return args.trackbars is not None
 
+def get_solver_method():
+    return args.solver
+
+def use_solution_cache():
+    return not args.no_cache
+
+def get_time_budget():
+    return args.time_budget
+
+def get_undistort_mode():
+    return args.undistort
+
+def get_block_classifier():
+    return args.classifier
+
+# No debug overlays & windows in production, unless the trackbars are wanted
+def is_headless():
+    return headless or (get_run_env() == "prod" and not show_trackbars())
+
+def set_headless():
+    global headless
+    headless = True
+
 logLevels={
     'prod': logging.INFO,
 }
@@ -32,45 +64,40 @@ logging.basicConfig(format='%(asctime)s %(levelname)s\t [%(name)s] %(message)s',
 # MAIN CODE #
 #===========#
 
-import robot
-import cv
-import solver
+import asyncio
+import pipeline
 
 from pyniryo import cv2
 
 
 L = logging.getLogger('Main')
 
+# How often the blocks & shadow are scanned again if no usable plan was found
+MAX_SCANS = 3
+
+# Partial plans covering at least this much of the shadow are placed anyway
+MIN_PARTIAL_COVERAGE = 0.75
+
 
 def main() -> None:
     L.info('HALLO!!')
 
-    # Initialize & calibrate robot
-    robot.init()
-
-    # Take pictures of blocks & shadow
-    img_blocks = robot.scan_blocks()
-    img_shadow = robot.scan_shadow()
+    # Scan, detect, solve & move, overlapping the stages where possible
+    cycle = pipeline.Pipeline(get_solver_method(), use_solution_cache(), get_time_budget(), MAX_SCANS, is_usable, log_progress)
+    asyncio.run(cycle.run())
 
-    # Procecss pictures & extract data
-    blocks = cv.find_blocks(img_blocks)
-    shadows = cv.find_shadows(img_shadow)
+    # Keep the debug windows open, headless runs are done here
+    if not is_headless():
+        while True:
+            cv2.waitKey(1)
 
-    # Find solution
-    solution = solver.solve(blocks, shadows)
-    
-    # TODO: Handling if no solution could be found
-    # if solution is None:
-    # ...
 
-    # TODO: Move blocks to correct positions
-    # robot.move_blocks(solution)
+def is_usable(plan) -> bool:
+    return plan is not None and (plan.complete or plan.coverage >= MIN_PARTIAL_COVERAGE)
 
-    # We're done, the robot can go to sleep
-    robot.shutdown()
 
-    while True:
-        cv2.waitKey(1)
+def log_progress(progress) -> None:
+    L.debug('Best partial plan so far: %d blocks, %.0f%% covered after %.1f s' % (progress.placed, progress.coverage * 100, progress.elapsed))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,241 @@
+import logging
+import os
+import random
+import time
+from math import atan2, pi, sqrt
+from typing import Callable, Dict, List, Tuple
+from pyniryo2 import PoseObject
+from pyniryo import cv2
+
+
+L = logging.getLogger('Mock-Robot')
+
+# (workspace name, x relative, y relative) -> position in meters
+Locate = Callable[[str, float, float], Tuple[float, float]]
+
+# Pose the arm starts in and returns to when going to sleep
+HOME_POSE = [0.14, 0.0, 0.2, 0.0, pi/2, 0.0]
+
+
+class TimingModel:
+    """
+    How long the simulated robot needs for each call. Moves accelerate, travel at
+    constant speed and brake again (trapezoidal profile); translation and rotation
+    of the tool happen at the same time, the slower one decides. Every call to the
+    robot additionally costs one network round trip.
+    """
+    latency: float
+    speed: float
+    linear_speed: float
+    acceleration: float
+    angular_speed: float
+    gripper_time: float
+    capture_time: float
+    calibration_time: float
+
+    def __init__(self, latency: float = 0.03, speed: float = 0.25, linear_speed: float = 0.1, acceleration: float = 0.5,
+                 angular_speed: float = 1.5, gripper_time: float = 0.5, capture_time: float = 0.15, calibration_time: float = 10.0) -> None:
+        self.latency = latency              # s per call
+        self.speed = speed                  # m/s for move_pose & trajectories
+        self.linear_speed = linear_speed    # m/s for move_linear_pose
+        self.acceleration = acceleration    # m/s²
+        self.angular_speed = angular_speed  # rad/s for the tool rotation
+        self.gripper_time = gripper_time
+        self.capture_time = capture_time
+        self.calibration_time = calibration_time
+
+    # Time for a path of `distance` with one acceleration and one braking phase
+    def travel(self, distance: float, speed: float) -> float:
+        # too short to reach full speed
+        if distance < speed * speed / self.acceleration:
+            return 2 * sqrt(distance / self.acceleration)
+
+        return distance / speed + speed / self.acceleration
+
+    def move(self, start: List[float], poses: List[List[float]], speed: float) -> float:
+        distance = 0.0
+        rotation = 0.0
+
+        for pose in poses:
+            distance += sqrt(sum((a - b) ** 2 for a, b in zip(start[:3], pose[:3])))
+            rotation += max(angle_between(a, b) for a, b in zip(start[3:], pose[3:]))
+            start = pose
+
+        return max(self.travel(distance, speed), rotation / self.angular_speed)
+
+    def __str__(self) -> str:
+        return 'TimingModel(latency=%.3f, speed=%.2f, linear_speed=%.2f, acceleration=%.2f)' % (self.latency, self.speed, self.linear_speed, self.acceleration)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class MockRobot:
+    """
+    Stand-in for the NiryoRobot with the calls robot.py uses. Every call is
+    recorded in `commands` (name, args) and advances the simulated `clock` by the
+    time the real robot would need (see TimingModel). With a `time_scale` > 0 the
+    calls also block for that long (scaled), so cycle times and pipelining can be
+    measured offline. The camera serves the pictures in img/, depending on the
+    scan pose the arm is closest to.
+    """
+    commands: List[Tuple[str, tuple]]
+    pose: List[float]
+    gripper_closed: bool
+    timing: TimingModel
+    time_scale: float
+    clock: float
+    # simulated seconds spent per call
+    spent: Dict[str, float]
+
+    def __init__(self, locate: Locate, scans: Dict[str, List[float]], timing: TimingModel | None = None, time_scale: float = 0.0) -> None:
+        self.commands = []
+        self.pose = list(HOME_POSE)
+        self.gripper_closed = False
+        self.timing = timing or TimingModel()
+        self.time_scale = time_scale
+        self.clock = 0.0
+        self.spent = {}
+
+        self.arm = MockArm(self)
+        self.tool = MockTool(self)
+        self.trajectories = MockTrajectories(self)
+        self.vision = MockVision(self, locate, scans)
+
+    def record(self, name: str, *args, duration: float = 0.0) -> None:
+        duration += self.timing.latency
+
+        L.debug('%s%s: %.2f s' % (name, args, duration))
+        self.commands.append((name, args))
+
+        self.clock += duration
+        self.spent[name] = self.spent.get(name, 0.0) + duration
+
+        if self.time_scale > 0:
+            time.sleep(duration * self.time_scale)
+
+    def count(self, name: str) -> int:
+        return sum(1 for command, _ in self.commands if command == name)
+
+    def end(self) -> None:
+        self.record('end')
+
+        L.info('Simulated robot time: %.1f s in %d calls' % (self.clock, len(self.commands)))
+        for name, spent in sorted(self.spent.items(), key=lambda item: -item[1]):
+            L.debug('%s: %.1f s' % (name, spent))
+
+    def __str__(self) -> str:
+        return 'MockRobot(commands=%d, clock=%.1f, pose=%s)' % (len(self.commands), self.clock, self.pose)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class MockArm:
+    def __init__(self, robot: MockRobot) -> None:
+        self.robot = robot
+
+    def calibrate_auto(self) -> None:
+        self.robot.record('calibrate_auto', duration=self.robot.timing.calibration_time)
+
+    def move_pose(self, pose) -> None:
+        self.__move('move_pose', to_list(pose), self.robot.timing.speed)
+
+    def move_linear_pose(self, pose) -> None:
+        self.__move('move_linear_pose', to_list(pose), self.robot.timing.linear_speed)
+
+    def go_to_sleep(self) -> None:
+        self.__move('go_to_sleep', list(HOME_POSE), self.robot.timing.speed)
+
+    def __move(self, name: str, pose: List[float], speed: float) -> None:
+        duration = self.robot.timing.move(self.robot.pose, [pose], speed)
+
+        self.robot.record(name, pose, duration=duration)
+        self.robot.pose = pose
+
+
+class MockTool:
+    def __init__(self, robot: MockRobot) -> None:
+        self.robot = robot
+
+    def update_tool(self) -> None:
+        self.robot.record('update_tool')
+
+    def open_gripper(self) -> None:
+        self.robot.record('open_gripper', duration=self.robot.timing.gripper_time)
+        self.robot.gripper_closed = False
+
+    def close_gripper(self) -> None:
+        self.robot.record('close_gripper', duration=self.robot.timing.gripper_time)
+        self.robot.gripper_closed = True
+
+
+class MockTrajectories:
+    def __init__(self, robot: MockRobot) -> None:
+        self.robot = robot
+
+    # The whole trajectory is one move: it only accelerates and brakes once
+    def execute_trajectory_from_poses(self, list_poses, dist_smoothing=0.0) -> None:
+        poses = [to_list(pose) for pose in list_poses]
+        duration = self.robot.timing.move(self.robot.pose, poses, self.robot.timing.speed)
+
+        self.robot.record('execute_trajectory_from_poses', poses, dist_smoothing, duration=duration)
+        self.robot.pose = poses[-1]
+
+
+class MockVision:
+    def __init__(self, robot: MockRobot, locate: Locate, scans: Dict[str, List[float]]) -> None:
+        self.robot = robot
+        self.locate = locate
+        self.scans = scans
+
+    # A random picture of the workspace whose scan pose is closest to the camera.
+    # The pictures in img/ are already cut to the workspace.
+    def get_img_compressed(self) -> bytes:
+        folder = min(self.scans, key=lambda name: sum((a - b) ** 2 for a, b in zip(self.scans[name][:3], self.robot.pose[:3])))
+        path = f"img/{folder}/"
+        img_file = random.choice(sorted(os.listdir(path)))
+
+        self.robot.record('get_img_compressed', f"{path}{img_file}", duration=self.robot.timing.capture_time)
+
+        _, compressed = cv2.imencode('.png', cv2.imread(f"{path}{img_file}"))
+
+        return compressed.tobytes()
+
+    # Gripper pointing down, turned by yaw_rel relative to the workspace x axis
+    def get_target_pose_from_rel(self, workspace_name, height_offset, x_rel, y_rel, yaw_rel) -> PoseObject:
+        self.robot.record('get_target_pose_from_rel', workspace_name, height_offset, x_rel, y_rel, yaw_rel)
+        x, y = self.locate(workspace_name, x_rel, y_rel)
+        x0, y0 = self.locate(workspace_name, 0, 0)
+        x1, y1 = self.locate(workspace_name, 1, 0)
+        yaw = (atan2(y1 - y0, x1 - x0) + yaw_rel + pi) % (2 * pi) - pi
+
+        return PoseObject(x, y, height_offset, 0.0, pi/2, yaw)
+
+    # Markers at the corners of the workspace, clockwise from the origin
+    def get_workspace_poses(self, workspace_name) -> List[PoseObject]:
+        self.robot.record('get_workspace_poses', workspace_name)
+        corners = [self.locate(workspace_name, x, y) for x, y in ((0, 0), (1, 0), (1, 1), (0, 1))]
+
+        return [PoseObject(x, y, 0.0, 0.0, pi/2, 0.0) for x, y in corners]
+
+    def get_workspace_ratio(self, workspace_name) -> float:
+        self.robot.record('get_workspace_ratio', workspace_name)
+        x0, y0 = self.locate(workspace_name, 0, 0)
+        x1, y1 = self.locate(workspace_name, 1, 0)
+        x2, y2 = self.locate(workspace_name, 1, 1)
+
+        return ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5 / ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5
+
+
+def to_list(pose) -> List[float]:
+    if isinstance(pose, PoseObject):
+        return pose.to_list()
+
+    return list(pose)
+
+
+def angle_between(a: float, b: float) -> float:
+    difference = (b - a) % (2 * pi)
+
+    return min(difference, 2 * pi - difference)
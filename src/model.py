@@ -5,30 +5,80 @@ import numpy as np
 
 AREA_FACTOR = 16000
 LENGTH_FACTOR = 123
+SHADOW_AREA_FACTOR = 14290
 
 
 class Shape:
+    name: str
     vertices: List[Tuple[float, float]]
     interior_angles: List[float]
     area: float
 
-    def __init__(self, vertices: List[Tuple[float, float]], interior_angles: List[float], area: float) -> None:
+    # Symmetry group: all (rotation, mirrored) pairs that map the shape onto itself
+    symmetries: List[Tuple[int, bool]]
+    # Smallest rotation > 0 that maps the shape onto itself (360 if there is none)
+    period: int
+    # A chiral shape can't be mapped onto its mirror image by rotating it. As the
+    # robot can't flip a block, its mirror image is a different shape.
+    chiral: bool
+    # Rotations (multiples of 45°) that give distinct placements
+    orientations: List[int]
+
+    def __init__(self, name: str, vertices: List[Tuple[float, float]], interior_angles: List[float], area: float) -> None:
+        self.name = name
         self.vertices = vertices
         self.interior_angles = interior_angles
         self.area = area
 
+        self.symmetries = get_symmetries(vertices)
+        self.period = min([rotation for rotation, mirrored in self.symmetries if rotation > 0 and not mirrored], default=360)
+        self.chiral = not any(mirrored for _, mirrored in self.symmetries)
+        self.orientations = list(range(0, self.period, 45))
+
+    def __str__(self) -> str:
+        return 'Shape(name=%s, period=%d, chiral=%s)' % (self.name, self.period, self.chiral)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+# The shapes have integer vertices and edges in the eight directions of the
+# tangram grid, so only rotations by multiples of 90° (optionally after
+# mirroring at the x axis) can map a shape onto itself
+def get_symmetries(vertices: List[Tuple[float, float]]) -> List[Tuple[int, bool]]:
+    original = normalize_vertices(vertices)
+    symmetries: List[Tuple[int, bool]] = []
+
+    for mirrored in (False, True):
+        transformed = [(x, -y) if mirrored else (x, y) for x, y in vertices]
+
+        for rotation in (0, 90, 180, 270):
+            if normalize_vertices(transformed) == original:
+                symmetries.append((rotation, mirrored))
+
+            transformed = [(-y, x) for x, y in transformed]
+
+    return symmetries
+
+
+def normalize_vertices(vertices: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    min_x = min(x for x, _ in vertices)
+    min_y = min(y for _, y in vertices)
+
+    return sorted((x - min_x, y - min_y) for x, y in vertices)
+
 
 SHAPES: dict[str, Shape] = {
     # Square
-    'SQ': Shape([(0, 0), (1, 0), (1, 1), (0, 1)], [90, 90, 90, 90], 1),
+    'SQ': Shape('SQ', [(0, 0), (1, 0), (1, 1), (0, 1)], [90, 90, 90, 90], 1),
     # Small Triangle
-    'ST': Shape([(0, 0), (1, 0), (0, 1)], [90, 45, 45], 0.5),
+    'ST': Shape('ST', [(0, 0), (1, 0), (0, 1)], [90, 45, 45], 0.5),
     # Medium Triangle
-    'MT': Shape([(0, 0), (2, 0), (1, 1)], [45, 45, 90], 1),
+    'MT': Shape('MT', [(0, 0), (2, 0), (1, 1)], [45, 45, 90], 1),
     # Large Triangle
-    'LT': Shape([(0, 0), (2, 0), (0, 2)], [90, 45, 45], 2),
+    'LT': Shape('LT', [(0, 0), (2, 0), (0, 2)], [90, 45, 45], 2),
     # Paralleogram
-    'PA': Shape([(0, 0), (1, 1), (1, 2), (0, 1)], [45, 135, 45, 135], 1),
+    'PA': Shape('PA', [(0, 0), (1, 1), (1, 2), (0, 1)], [45, 135, 45, 135], 1),
 }
 
 class Point:
@@ -138,8 +188,14 @@ class Polygon:
 
 
 class Block(Polygon):
-    def __init__(self, shape: Shape, position: Tuple[float, float], rotation: float) -> None:
+    shape: Shape
+    # A chiral block (see Shape.chiral) lying upside down, i.e. the mirror image of its shape
+    mirrored: bool
+
+    def __init__(self, shape: Shape, position: Tuple[float, float], rotation: float, mirrored: bool = False) -> None:
         super().__init__(shape.vertices, shape.interior_angles, shape.area, position, rotation)
+        self.shape = shape
+        self.mirrored = mirrored
 
     def get_rotated_vertices(self):
         pass
@@ -148,3 +204,58 @@ class Block(Polygon):
 class Shadow(Polygon):
     def __init__(self, vertices, interior_angles, area) -> None:
         super().__init__(vertices, interior_angles, area, (0, 0), 0)
+
+
+class Placement:
+    block: Block
+    vertices: List[Tuple[float, float]]
+    position: Tuple[float, float]
+    rotation: float
+
+    def __init__(self, block: Block, vertices: List[Tuple[float, float]], position: Tuple[float, float], rotation: float) -> None:
+        self.block = block
+        self.vertices = vertices
+        self.position = position
+        self.rotation = rotation
+
+    def __str__(self) -> str:
+        return 'Placement(shape=%s, position=%s, rotation=%f)' % (self.block.shape.name, self.position, self.rotation)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class Verification:
+    uncovered: float
+    overflow: float
+    overlap: float
+
+    def __init__(self, uncovered: float, overflow: float, overlap: float) -> None:
+        self.uncovered = uncovered
+        self.overflow = overflow
+        self.overlap = overlap
+
+    def __str__(self) -> str:
+        return 'Verification(uncovered=%f, overflow=%f, overlap=%f)' % (self.uncovered, self.overflow, self.overlap)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class Plan:
+    placements: List[Placement]
+    coverage: float
+    complete: bool
+    verification: Verification | None
+
+    def __init__(self, placements: List[Placement], coverage: float, complete: bool, verification: Verification | None = None) -> None:
+        self.placements = placements
+        self.coverage = coverage
+        self.complete = complete
+        self.verification = verification
+
+    def __str__(self) -> str:
+        return 'Plan(complete=%s, coverage=%f, verification=%s, placements=%s)' % (self.complete, self.coverage, self.verification, self.placements)
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import robot
+import cv
+import solver
+from cv.overlay import show_pending
+from model import Plan
+
+
+L = logging.getLogger('Pipeline')
+
+# Stages of one cycle, connected by queues:
+#
+#   capture -> vision -> solve -> motion
+#
+# The robot handles one command at a time, so all robot calls run in a single worker
+# thread. Vision and solving run in a second pool. This way the blocks are detected
+# while the arm travels to the shadow scan pose and takes the second picture, and
+# the solver starts as soon as both feature sets exist. If no usable plan is found,
+# the solve stage asks the capture stage for another scan. Debug overlays are only
+# drawn in the workers, the vision stage shows them in the main thread.
+
+# Workers for vision & solving (blocks and shadows are detected at the same time)
+VISION_WORKERS = 2
+
+
+class Scan:
+    number: int
+    img_blocks: object
+    img_shadow: object
+    blocks: list
+    shadows: list
+
+    def __init__(self, number: int) -> None:
+        self.number = number
+        self.img_blocks = None
+        self.img_shadow = None
+        self.blocks = []
+        self.shadows = []
+
+    def __str__(self) -> str:
+        return 'Scan(number=%d, blocks=%d, shadows=%d)' % (self.number, len(self.blocks), len(self.shadows))
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class Pipeline:
+    method: str
+    use_cache: bool
+    time_budget: float
+    max_scans: int
+    is_usable: Callable[[Plan | None], bool]
+    progress: Callable | None
+
+    def __init__(self, method: str, use_cache: bool, time_budget: float, max_scans: int, is_usable: Callable[[Plan | None], bool], progress: Callable | None = None) -> None:
+        self.method = method
+        self.use_cache = use_cache
+        self.time_budget = time_budget
+        self.max_scans = max_scans
+        self.is_usable = is_usable
+        self.progress = progress
+
+        self.robot_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='robot')
+        self.vision_pool = ThreadPoolExecutor(max_workers=VISION_WORKERS, thread_name_prefix='vision')
+
+    async def run(self) -> None:
+        start = time.perf_counter()
+
+        # Scan numbers to capture, None stops the stage
+        requests: asyncio.Queue = asyncio.Queue()
+        # (scan, image kind, task) for every picture taken
+        images: asyncio.Queue = asyncio.Queue()
+        # Scans with features of blocks & shadows
+        scans: asyncio.Queue = asyncio.Queue()
+        # (scan, plan) to execute, None if there is none
+        plans: asyncio.Queue = asyncio.Queue()
+
+        stages = [
+            asyncio.ensure_future(self.capture(requests, images)),
+            asyncio.ensure_future(self.vision(images, scans)),
+            asyncio.ensure_future(self.solve(scans, requests, plans)),
+            asyncio.ensure_future(self.motion(plans)),
+        ]
+
+        try:
+            await self.__robot(robot.init)
+            requests.put_nowait(1)
+
+            await asyncio.gather(*stages)
+
+            L.info('Cycle finished after %.1f s' % (time.perf_counter() - start))
+        except BaseException:
+            # One stage failed (or the run was cancelled): stop the others and still
+            # send the arm to sleep, motion won't get there anymore
+            for stage in stages:
+                stage.cancel()
+
+            await asyncio.gather(*stages, return_exceptions=True)
+            await self.__robot(robot.shutdown)
+            raise
+        finally:
+            self.robot_pool.shutdown(cancel_futures=True)
+            self.vision_pool.shutdown(cancel_futures=True)
+
+    async def capture(self, requests: asyncio.Queue, images: asyncio.Queue) -> None:
+        while True:
+            number = await requests.get()
+
+            if number is None:
+                await images.put(None)
+                return
+
+            scan = Scan(number)
+
+            scan.img_blocks = await self.__robot(robot.scan_blocks)
+            await images.put((scan, 'blocks'))
+
+            scan.img_shadow = await self.__robot(robot.scan_shadow)
+            await images.put((scan, 'shadow'))
+
+    async def vision(self, images: asyncio.Queue, scans: asyncio.Queue) -> None:
+        blocks_task: asyncio.Future | None = None
+
+        while True:
+            item = await images.get()
+
+            if item is None:
+                await scans.put(None)
+                return
+
+            scan, kind = item
+
+            # Blocks are detected while the robot takes the shadow picture
+            if kind == 'blocks':
+                blocks_task = self.__vision(detect_blocks, scan.img_blocks)
+                continue
+
+            scan.shadows, scan.blocks = await asyncio.gather(self.__vision(detect_shadows, scan.img_shadow), blocks_task)
+
+            # The overlays of both detections are shown here, in the main thread
+            show_pending()
+
+            await scans.put(scan)
+
+    async def solve(self, scans: asyncio.Queue, requests: asyncio.Queue, plans: asyncio.Queue) -> None:
+        while True:
+            scan = await scans.get()
+
+            if scan is None:
+                await plans.put(None)
+                return
+
+            # Find solution within the time slot of this cycle
+            deadline = time.monotonic() + self.time_budget
+            plan = await self.__vision(solver.solve, scan.blocks, scan.shadows, self.method, self.use_cache, deadline, self.progress)
+
+            if self.is_usable(plan):
+                await plans.put((scan, plan))
+                await requests.put(None)
+                continue
+
+            L.warning('No usable plan after scan %d/%d' % (scan.number, self.max_scans))
+
+            if scan.number < self.max_scans:
+                await requests.put(scan.number + 1)
+            else:
+                await requests.put(None)
+
+    async def motion(self, plans: asyncio.Queue) -> None:
+        item = await plans.get()
+
+        if item is None:
+            L.error('No solution found, the blocks stay where they are')
+        else:
+            scan, plan = item
+
+            if not plan.complete:
+                L.warning('Placing partial plan covering %.0f%% of the shadow' % (plan.coverage * 100))
+
+            # Move blocks to correct positions
+            await self.__robot(robot.move_blocks, plan.placements, scan.img_blocks, scan.img_shadow)
+
+        # We're done, the robot can go to sleep
+        await self.__robot(robot.shutdown)
+
+    def __robot(self, function, *args) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self.robot_pool, function, *args)
+
+    def __vision(self, function, *args) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self.vision_pool, function, *args)
+
+    def __str__(self) -> str:
+        return 'Pipeline(method=%s, time_budget=%.1f, max_scans=%d)' % (self.method, self.time_budget, self.max_scans)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+# Detection, corrected for the camera's distortion if only the vertices are undistorted
+def detect_blocks(img) -> list:
+    return robot.correct_blocks(cv.find_blocks(img))
+
+
+def detect_shadows(img) -> list:
+    return robot.correct_shadows(cv.find_shadows(img))
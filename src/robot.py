@@ -1,16 +1,18 @@
 import atexit
 import logging
-import os
-import random
 import numpy as np
-import pickle
+from typing import Dict, List, Tuple
 from pyniryo2 import NiryoRobot
-from pyniryo import uncompress_image, undistort_image, vision, cv2
-from math import pi
+from pyniryo import uncompress_image, relative_pos_from_pixels
+from math import atan2, ceil, cos, hypot, pi, sin
 from os import getenv
-from PIL import Image
+from camera import PointMapper, Undistorter, WorkspaceLocator
 from exception import TangramException
-from main import get_run_env
+from main import get_run_env, get_undistort_mode
+from mock_robot import MockRobot
+from model import Block, Placement, Shadow
+from solver.sequence import plan_sequence
+from workspace import Workspace, load_workspace
 
 
 L = logging.getLogger('Robot')
@@ -22,6 +24,23 @@ PICK_AND_PLACE_HEIGHT = 0.0015
 MOVEMENT_HEIGHT = 0.2
 GRIPPER_BASE_ROTATION=pi/2
 
+# the gripper is not centered, picks are shifted by this (relative) offset
+PICK_OFFSET_X = 0.05
+PICK_OFFSET_Y = -0.03
+
+# the arm blends past every inner waypoint of a trajectory within this distance (m), so it
+# doesn't stop there. Small against the lift of MOVEMENT_HEIGHT, so the gripper still
+# leaves and approaches the workspace vertically; the last pose is always reached exactly
+TRAJECTORY_SMOOTHING = 0.02
+
+# the workspaces lie on opposite sides of the base, between them the arm circles it on
+# waypoints at least this far from the base axis (m) and at most this far apart (rad)
+MIN_TRANSIT_RADIUS = 0.2
+TRANSIT_STEP = pi/4
+
+# resolution set in video_server_setup.yaml on the robot (see README)
+CAMERA_RESOLUTION = (1920, 1080)
+
 WORKSPACE_WIDTH = 297
 WORKSPACE_HEIGHT = 210
 WORKSPACE_RATIO = WORKSPACE_WIDTH / WORKSPACE_HEIGHT
@@ -29,138 +48,256 @@ WORKSPACE_RATIO = WORKSPACE_WIDTH / WORKSPACE_HEIGHT
 import pyniryo.vision.markers_detection as x
 x.IM_EXTRACT_SMALL_SIDE_PIXELS = 640
 
+# time scale of the simulated robot per runtime: dev doesn't wait, sim takes as long as the real robot
+SIMULATED_ENVS = {"dev": 0.0, "sim": 1.0}
+
 bot: NiryoRobot = None
-mtx = None
-dist = None
+workspaces: Dict[str, Workspace] = {}
+undistorter: Undistorter = None
+# markers & homography of each workspace, found once and then only checked
+locator = WorkspaceLocator(WORKSPACE_RATIO)
+# per workspace, for the last picture taken in the "points" undistort mode
+point_mappers: Dict[str, PointMapper] = {}
 capture = None
 
-camera_calibration = pickle.load(open("resources/camera_calib.p", "rb" ))
-
-
-def get_high_res_camera_intrinsics():
-    return camera_calibration["mtx"], camera_calibration["dist"]
-
 
 def init() -> None:
     global bot
-    global mtx
-    global dist
+    global undistorter
     global capture
 
     ip = getenv('NIRYO_IP')
-    if(get_run_env() == "dev"):
-        L.info("DEV runtime, mocking robot")
-        return
-    
-    L.info('Connecting...')
-    bot = NiryoRobot(ip)
+    if(get_run_env() in SIMULATED_ENVS):
+        L.info("%s runtime, simulating robot" % get_run_env().upper())
+        bot = MockRobot(estimate_workspace_position, {"blocks": SCAN_POSE_BLOCKS, "shadow": SCAN_POSE_SHADOW}, time_scale=SIMULATED_ENVS[get_run_env()])
+    else:
+        L.info('Connecting...')
+        bot = NiryoRobot(ip)
+
+        # the undistortion maps are loaded from disk or built now, not on the first picture
+        undistorter = Undistorter()
+        undistorter.prepare(CAMERA_RESOLUTION)
 
     L.info('Calibrating...')
     bot.arm.calibrate_auto()
 
     bot.tool.update_tool()
 
-    mtx, dist = get_high_res_camera_intrinsics()
-
-
-def mock_image(folder):
-    path = f"img/{folder}/"
-    files = os.listdir(path)
-    img_file = random.choice(files)
+    # the workspaces don't move while running, so their transforms are fetched only once
+    # and all poses are computed locally (see workspace.py)
+    for name in ("blocks", "shadow"):
+        workspaces[name] = load_workspace(bot, name)
 
-    img = Image.open(f"{path}{img_file}")    
-    img = np.asarray(img)
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-    return img
+        if abs(workspaces[name].ratio - WORKSPACE_RATIO) > 0.01:
+            L.warning(f"Workspace {name} has ratio {workspaces[name].ratio:.3f} instead of {WORKSPACE_RATIO:.3f}")
 
 
 def scan_blocks():
-    if(bot == None): 
-        return mock_image("blocks")
-
     # move to scan position
     bot.arm.move_pose(SCAN_POSE_BLOCKS)
-    bot.arm.move_pose(SCAN_POSE_BLOCKS) # maybe this fixes some issues with not recognizing the workspace, maybe not, has to be observed
     
-    ws = take_picture()
+    ws = take_picture("blocks")
 
     return ws
 
 
 def scan_shadow():
-    if(bot == None):
-        return mock_image("shadow")
-
-    bot.arm.move_pose(SCAN_POSE_SHADOW)
     bot.arm.move_pose(SCAN_POSE_SHADOW)
 
-    ws = take_picture()
+    ws = take_picture("shadow")
 
     return ws
 
 
-def take_picture():
+def take_picture(workspace):
     L.info("Taking picture")
 
     img_comp = bot.vision.get_img_compressed() 
     img_dist = uncompress_image(img_comp)
 
-    img = undistort_image(img_dist, mtx, dist)
+    # the simulated camera already serves pictures of the workspace
+    if(isinstance(bot, MockRobot)):
+        return img_dist
+
+    # in the "points" mode only the detected vertices are undistorted later (see correct_blocks & correct_shadows)
+    points = get_undistort_mode() == "points"
+    img = img_dist if points else undistorter.undistort(img_dist)
 
-    ws = vision.extract_img_workspace(img, WORKSPACE_RATIO)
+    ws = locator.extract(workspace, img)
 
     if ws is None:
         raise TangramException('Could not extract workspace from image')
 
+    if points:
+        point_mappers[workspace] = PointMapper(undistorter.mtx, undistorter.dist, locator.markers(workspace), locator.size)
+
     return ws
 
 
-def pick(x, y) -> None:
-    if(bot == None):
-        return
+class MotionStep:
+    # 'trajectory' (through all poses), 'open' or 'close' (gripper)
+    action: str
+    poses: List[List[float]]
+
+    def __init__(self, action: str, poses: List[List[float]] | None = None) -> None:
+        self.action = action
+        self.poses = poses or []
+
+    def __str__(self) -> str:
+        return 'MotionStep(action=%s, poses=%d)' % (self.action, len(self.poses))
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
 
-    L.info(f"picking from {x}, {y}")
+# Maps the positions & rotations of the blocks found in the distorted picture back through
+# the undistortion ("points" mode only, otherwise the blocks are returned unchanged)
+def correct_blocks(blocks: List[Block]) -> List[Block]:
+    if point_mappers.get("blocks") is not None:
+        point_mappers["blocks"].correct_blocks(blocks)
 
+    return blocks
+
+
+# Same for the vertices of the shadows
+def correct_shadows(shadows: List[Shadow]) -> List[Shadow]:
+    if point_mappers.get("shadow") is not None:
+        point_mappers["shadow"].correct_shadows(shadows)
+
+    return shadows
+
+
+# Poses [x, y, z, roll, pitch, yaw] above (up) and at (down) every pick position (N, 2)
+def pick_poses(picks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     # fix hardware with software
     # the gripper is not centered, so the position has to be corrected
-    # this has to be done in place() as well, but there dynamically, as the gripper will rotate to the right orientation
-    x = min(x + 0.05, 1)
-    y = max(y - 0.03, 0)
+    # this has to be done in place_poses() as well, but there dynamically, as the gripper will rotate to the right orientation
+    x = np.minimum(picks[:, 0] + PICK_OFFSET_X, 1)
+    y = np.maximum(picks[:, 1] + PICK_OFFSET_Y, 0)
 
-    pose_up = bot.vision.get_target_pose_from_rel("blocks", MOVEMENT_HEIGHT, x, y, GRIPPER_BASE_ROTATION)
-    pose_down = bot.vision.get_target_pose_from_rel("blocks", PICK_AND_PLACE_HEIGHT, x, y, GRIPPER_BASE_ROTATION)
+    blocks = workspaces["blocks"]
+    poses_up = blocks.poses(x, y, MOVEMENT_HEIGHT, GRIPPER_BASE_ROTATION)
+    poses_down = blocks.poses(x, y, PICK_AND_PLACE_HEIGHT, GRIPPER_BASE_ROTATION)
 
+    return poses_up, poses_down
 
-    # move to position
-    bot.tool.open_gripper()
-    bot.arm.move_pose(pose_up)
-    bot.arm.move_linear_pose(pose_down)
-    # pick object
-    
-    bot.tool.close_gripper()
-    bot.arm.move_linear_pose(pose_up)
 
+def place_poses(places: np.ndarray, rotations: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # rotation of 0 should be the same direction as the source rotation
+    # but because the piece of paper is on the other side of the robot, is has to be corrected here
+    rotations = rotations - GRIPPER_BASE_ROTATION
 
-def place(x, y, rotate) -> None:
+    shadow = workspaces["shadow"]
+    poses_up = shadow.poses(places[:, 0], places[:, 1], MOVEMENT_HEIGHT, rotations)
+    poses_down = shadow.poses(places[:, 0], places[:, 1], PICK_AND_PLACE_HEIGHT, rotations)
+
+    return poses_up, poses_down
+
+
+# Compiles all moves (pick positions, place positions, rotations) into trajectories.
+# The arm only stops where the gripper opens or closes: lifting after placing a block,
+# the transit around the base and the descent to the next block are one trajectory,
+# and so are lifting the picked block, the transit and the descent to its target
+def plan_motion(picks: np.ndarray, places: np.ndarray, rotations: np.ndarray) -> List[MotionStep]:
+    pick_up, pick_down = (poses.tolist() for poses in pick_poses(picks))
+    place_up, place_down = (poses.tolist() for poses in place_poses(places, rotations))
+
+    steps = [MotionStep('open')]
+    # the arm is still at the shadow scan pose when the first block is picked
+    start = SCAN_POSE_SHADOW
+    lift: List[List[float]] = []
+
+    for i in range(len(picks)):
+        steps.append(MotionStep('trajectory', lift + transit_poses(start, pick_up[i]) + [pick_up[i], pick_down[i]]))
+        steps.append(MotionStep('close'))
+        steps.append(MotionStep('trajectory', [pick_up[i]] + transit_poses(pick_up[i], place_up[i]) + [place_up[i], place_down[i]]))
+        steps.append(MotionStep('open'))
+
+        start = place_up[i]
+        lift = [place_up[i]]
+
+    if len(lift) > 0:
+        steps.append(MotionStep('trajectory', lift))
+
+    return steps
+
+
+# Waypoints between the poses start and end (both excluded) on an arc around the base,
+# so the arm doesn't cut across the base from one workspace to the other. The arc
+# passes in front of the robot, never behind it
+def transit_poses(start: List[float], end: List[float]) -> List[List[float]]:
+    angle_start, angle_end = atan2(start[1], start[0]), atan2(end[1], end[0])
+    radius_start, radius_end = hypot(start[0], start[1]), hypot(end[0], end[1])
+    yaw = (end[5] - start[5] + pi) % (2 * pi) - pi
+
+    count = ceil(abs(angle_end - angle_start) / TRANSIT_STEP)
+    poses = []
+
+    for i in range(1, count):
+        t = i / count
+        angle = angle_start + t * (angle_end - angle_start)
+        radius = max(radius_start + t * (radius_end - radius_start), MIN_TRANSIT_RADIUS)
+        z = start[2] + t * (end[2] - start[2])
+
+        poses.append([radius * cos(angle), radius * sin(angle), z, start[3], start[4], start[5] + t * yaw])
+
+    return poses
+
+
+def execute(steps: List[MotionStep]) -> None:
+    for step in steps:
+        L.debug(step)
+
+        if step.action == 'trajectory':
+            bot.trajectories.execute_trajectory_from_poses(step.poses, dist_smoothing=TRAJECTORY_SMOOTHING)
+        elif step.action == 'open':
+            bot.tool.open_gripper()
+        else:
+            bot.tool.close_gripper()
+
+
+def move_blocks(placements: List[Placement], img_blocks, img_shadow) -> None:
     if(bot == None):
         return
 
-    L.info(f"Placing to {x}, {y}")
+    picks = np.array([relative_pos_from_pixels(img_blocks, *placement.block.position) for placement in placements]).reshape(-1, 2)
+    places = np.array([relative_pos_from_pixels(img_shadow, *placement.position) for placement in placements]).reshape(-1, 2)
 
-    # rotation of 0 should be the same direction as the source rotation
-    # but because the piece of paper is on the other side of the robot, is has to be corrected here
-    rotate -= GRIPPER_BASE_ROTATION
-    
-    pose_up = bot.vision.get_target_pose_from_rel("shadow", MOVEMENT_HEIGHT, x, y, rotate)
-    pose_down = bot.vision.get_target_pose_from_rel("shadow", PICK_AND_PLACE_HEIGHT, x, y, rotate)
-
-    # move to position
-    bot.arm.move_pose(pose_up)
-    bot.arm.move_linear_pose(pose_down)
-    # place object
-    bot.tool.open_gripper()
-    bot.arm.move_linear_pose(pose_up)
+    # the arm is still at the shadow scan pose when the first block is picked
+    order = plan_sequence(
+        [tuple(p) for p in workspaces["blocks"].positions(picks[:, 0], picks[:, 1])[:, :2]],
+        [tuple(p) for p in workspaces["shadow"].positions(places[:, 0], places[:, 1])[:, :2]],
+        [placement.block.shape.area for placement in placements],
+        (SCAN_POSE_SHADOW[0], SCAN_POSE_SHADOW[1]))
+
+    # the block has to be rotated by the difference between its current and its target rotation
+    rotations = np.radians([turn(placements[i].rotation - placements[i].block.rotation, placements[i].block.shape.period) for i in order])
+
+    L.info(f"Moving {len(order)} blocks")
+    execute(plan_motion(picks[order], places[order], rotations))
+
+
+# Smallest turn (degrees, in (-period/2, period/2]) equivalent to `rotation` for a shape
+# that maps onto itself every `period` degrees, so the wrist never turns further than needed
+def turn(rotation: float, period: int) -> float:
+    rotation = rotation % period
+
+    return rotation - period if rotation > period / 2 else rotation
+
+
+# Rough position (in meters) of a relative workspace position, used by the mock robot.
+# The workspace lies centered below the scan pose, the image is turned with the camera (yaw)
+def estimate_position(scan_pose, x, y) -> Tuple[float, float]:
+    forward = (0.5 - y) * WORKSPACE_HEIGHT / 1000
+    left = (0.5 - x) * WORKSPACE_WIDTH / 1000
+
+    yaw = scan_pose[5]
+
+    return (scan_pose[0] + forward * cos(yaw) - left * sin(yaw), scan_pose[1] + forward * sin(yaw) + left * cos(yaw))
+
+
+def estimate_workspace_position(workspace, x, y) -> Tuple[float, float]:
+    return estimate_position(SCAN_POSE_BLOCKS if workspace == "blocks" else SCAN_POSE_SHADOW, x, y)
 
 
 def shutdown() -> None:
@@ -1,11 +0,0 @@
-import logging
-from typing import List
-from model import Block, Shadow
-
-
-L = logging.getLogger('Solver')
-
-
-def solve(blocks: List[Block], shadow: list[Shadow]):
-    print('solve()', blocks, shadow)
-    return None
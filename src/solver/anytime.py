@@ -0,0 +1,87 @@
+import logging
+import time
+from multiprocessing.synchronize import Event
+from typing import Callable, List, Tuple
+from solver.placements import LatticePlacement
+
+
+L = logging.getLogger('Solver-Anytime')
+
+
+class Progress:
+    placed: int
+    coverage: float
+    elapsed: float
+
+    def __init__(self, placed: int, coverage: float, elapsed: float) -> None:
+        self.placed = placed
+        self.coverage = coverage
+        self.elapsed = elapsed
+
+    def __str__(self) -> str:
+        return 'Progress(placed=%d, coverage=%f, elapsed=%f)' % (self.placed, self.coverage, self.elapsed)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+# Gibt der Callback False zurück, wird die Suche mit dem besten Zwischenstand beendet
+ProgressCallback = Callable[[Progress], bool | None]
+
+
+class Anytime:
+    """
+    Frist und bester Zwischenstand einer Suche. Die Suche meldet jede Teil-
+    belegung über offer(), läuft die Frist ab, bricht der Callback die Suche
+    ab oder wird `stop` gesetzt, liefert expired() True und die Suche wird
+    beendet.
+    """
+    deadline: float | None
+    callback: ProgressCallback | None
+    total_area: float
+    start: float
+    # Gemeinsames Event der Prozesse im Pool (siehe geometric.get_pool)
+    stop: Event | None
+
+    best: List[Tuple[int, LatticePlacement]]
+    best_area: float
+    stopped: bool
+
+    def __init__(self, deadline: float | None, callback: ProgressCallback | None, total_area: float) -> None:
+        self.deadline = deadline
+        self.callback = callback
+        self.total_area = total_area
+        self.start = time.monotonic()
+        self.best = []
+        self.best_area = 0
+        self.stopped = False
+        self.stop = None
+
+    def expired(self) -> bool:
+        if not self.stopped and self.deadline is not None and time.monotonic() >= self.deadline:
+            L.debug('Zeit abgelaufen, beste Teilbelegung deckt %.0f%% ab' % (self.coverage() * 100))
+            self.stopped = True
+
+        if not self.stopped and self.stop is not None and self.stop.is_set():
+            L.debug('Suche von außen abgebrochen')
+            self.stopped = True
+
+        return self.stopped
+
+    # Merkt sich die Belegung, falls sie mehr Fläche abdeckt als die bisher beste
+    def offer(self, area: float, solution: Callable[[], List[Tuple[int, LatticePlacement]]]) -> None:
+        if area <= self.best_area + 0.01:
+            return
+
+        self.best = solution()
+        self.best_area = area
+
+        if self.callback is not None and self.callback(self.progress()) is False:
+            L.info('Suche durch Callback beendet')
+            self.stopped = True
+
+    def coverage(self) -> float:
+        return self.best_area / self.total_area if self.total_area > 0 else 0
+
+    def progress(self) -> Progress:
+        return Progress(len(self.best), self.coverage(), time.monotonic() - self.start)
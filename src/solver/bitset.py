@@ -0,0 +1,240 @@
+import logging
+from typing import Dict, List, Tuple
+from model import SHAPES
+from solver.exact import ExactPoint, rotate_exact
+from solver.lattice import LatticeShadow, point_in_polygon
+from solver.placements import LatticePlacement, get_orientations
+
+
+L = logging.getLogger('Solver-Bitset')
+
+
+# Liegen alle Eckpunkte eines Shadows im selben Gitter, lässt er sich in
+# Zellen zerlegen: Einheitsquadrate, die durch ihre beiden Diagonalen in je
+# vier rechtwinklige Dreiecke geteilt werden. Jede Zelle bekommt ein Bit in
+# einem Python-int, Überlappung, Enthaltensein und freie Fläche werden so zu
+# einzelnen Bit-Operationen.
+#
+# Zelle (x, y, q): Dreieck im Quadrat [x, x+1] x [y, y+1]
+#   q = 0: Dreieck an der Kante y
+#   q = 1: Dreieck an der Kante x+1
+#   q = 2: Dreieck an der Kante y+1
+#   q = 3: Dreieck an der Kante x
+#
+# Bit einer Zelle: ((y - min_y) * STRIDE + (x - min_x)) * 4 + q
+STRIDE = 32
+
+CELL_CENTROIDS = [(1/2, 1/6), (5/6, 1/2), (1/2, 5/6), (1/6, 1/2)]
+
+# Die acht 45°-Sektoren um einen Gitterpunkt (x, y) werden von genau einer
+# Zelle ausgefüllt. Sektor k reicht von Richtung k*45° bis (k+1)*45°.
+SECTOR_CELLS = [
+    (0, 0, 0),
+    (0, 0, 3),
+    (-1, 0, 1),
+    (-1, 0, 0),
+    (-1, -1, 2),
+    (-1, -1, 1),
+    (0, -1, 3),
+    (0, -1, 2),
+]
+
+
+class Grid:
+    rotation: int
+    min_x: int
+    min_y: int
+    width: int
+    height: int
+    region: int
+
+    def __init__(self, rotation: int, min_x: int, min_y: int, width: int, height: int, region: int) -> None:
+        self.rotation = rotation
+        self.min_x = min_x
+        self.min_y = min_y
+        self.width = width
+        self.height = height
+        self.region = region
+
+    def __str__(self) -> str:
+        return 'Grid(rotation=%d, min=(%d, %d), cells=%d)' % (self.rotation, self.min_x, self.min_y, self.region.bit_count())
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class OrientationMask:
+    vertices: List[Tuple[int, int]]
+    mask: int
+    width: int
+    height: int
+
+    def __init__(self, vertices: List[Tuple[int, int]], mask: int) -> None:
+        self.vertices = vertices
+        self.mask = mask
+        self.width = max(v[0] for v in vertices)
+        self.height = max(v[1] for v in vertices)
+
+
+
+#=================#
+# GRID GEOMETRY #
+#=================#
+
+def get_grid(shadow: LatticeShadow) -> Grid | None:
+    # Drehung suchen (0° oder 45°), in der alle Eckpunkte ganzzahlig sind
+    for rotation in (0, 45):
+        vertices = [to_grid_vertex(rotation, p) for p in shadow.points]
+
+        if None in vertices:
+            continue
+
+        min_x = min(v[0] for v in vertices)
+        min_y = min(v[1] for v in vertices)
+        width = max(v[0] for v in vertices) - min_x
+        height = max(v[1] for v in vertices) - min_y
+
+        if width > STRIDE:
+            L.debug('Shadow ist breiter als %d Einheiten, keine Bitmaske' % STRIDE)
+            return None
+
+        region = 0
+        for x, y, q in polygon_cells(vertices):
+            region |= 1 << cell_bit(x - min_x, y - min_y, q)
+
+        return Grid(rotation, min_x, min_y, width, height, region)
+
+    return None
+
+
+def rasterizable(shadows: List[LatticeShadow]) -> bool:
+    return all(get_grid(shadow) is not None for shadow in shadows)
+
+
+def to_grid_vertex(rotation: int, point: ExactPoint) -> Tuple[int, int] | None:
+    rotated = rotate_exact(point, -rotation)
+
+    if rotated is None or not rotated[0].is_integer() or not rotated[1].is_integer():
+        return None
+
+    return (rotated[0].a, rotated[1].a)
+
+
+def cell_bit(x: int, y: int, q: int) -> int:
+    return (y * STRIDE + x) * 4 + q
+
+
+def polygon_cells(vertices: List[Tuple[int, int]]) -> List[Tuple[int, int, int]]:
+    min_x = min(v[0] for v in vertices)
+    max_x = max(v[0] for v in vertices)
+    min_y = min(v[1] for v in vertices)
+    max_y = max(v[1] for v in vertices)
+
+    cells: List[Tuple[int, int, int]] = []
+
+    # Kanten liegen immer auf Gitterlinien, der Schwerpunkt einer Zelle
+    # liegt also entweder vollständig innerhalb oder außerhalb des Polygons
+    for x in range(min_x, max_x):
+        for y in range(min_y, max_y):
+            for q, (cx, cy) in enumerate(CELL_CENTROIDS):
+                if point_in_polygon((x + cx, y + cy), vertices):
+                    cells.append((x, y, q))
+
+    return cells
+
+
+def mask_bits(mask: int) -> List[int]:
+    bits: List[int] = []
+
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+
+    return bits
+
+
+def remaining_area(region: int, occupied: int) -> float:
+    return (region & ~occupied).bit_count() / 4
+
+
+
+#=================#
+# PLACEMENT MASKS #
+#=================#
+
+# Bitmasken aller Formen in allen verschiedenen Drehungen um Vielfache von
+# 90°, mit der linken oberen Ecke am Ursprung. Werden einmal pro Prozess
+# berechnet und für jede Lage nur noch verschoben.
+ORIENTATION_MASKS: Dict[Tuple[str, int], OrientationMask] = {}
+
+for shape in SHAPES.values():
+    for orientation in get_orientations(shape):
+        if orientation.rotation % 90 != 0:
+            continue
+
+        vertices = [(x.a, y.a) for x, y in orientation.points]
+        offset_x = min(v[0] for v in vertices)
+        offset_y = min(v[1] for v in vertices)
+        vertices = [(x - offset_x, y - offset_y) for x, y in vertices]
+
+        mask = 0
+        for x, y, q in polygon_cells(vertices):
+            mask |= 1 << cell_bit(x, y, q)
+
+        ORIENTATION_MASKS[(shape.name, orientation.rotation)] = OrientationMask(vertices, mask)
+
+
+# Verschiebt die Maske der Form an die Stelle (x, y) im Gitter
+def shifted_mask(grid: Grid, orientation: OrientationMask, x: int, y: int) -> int | None:
+    dx = x - grid.min_x
+    dy = y - grid.min_y
+
+    if dx < 0 or dy < 0 or dx + orientation.width > STRIDE:
+        return None
+
+    return orientation.mask << cell_bit(dx, dy, 0)
+
+
+# Liefert die Bitmaske einer Lage oder None, falls sie nicht im Gitter liegt
+def placement_mask(grid: Grid, placement: LatticePlacement) -> int | None:
+    rotation = (placement.rotation - grid.rotation) % placement.shape.period
+
+    if rotation % 90 != 0:
+        return None
+
+    vertices = [to_grid_vertex(grid.rotation, p) for p in placement.points]
+
+    if None in vertices:
+        return None
+
+    x = min(v[0] for v in vertices)
+    y = min(v[1] for v in vertices)
+
+    return shifted_mask(grid, ORIENTATION_MASKS[(placement.shape.name, rotation)], x, y)
+
+
+# Liefert für jeden der acht Sektoren um einen Eckpunkt (in Richtungen des
+# Shadows) das Bit der Zelle, die ihn ausfüllt, oder None, falls der
+# Eckpunkt nicht auf dem Gitter liegt
+def sector_bits(grid: Grid, point: ExactPoint) -> List[int] | None:
+    grid_vertex = to_grid_vertex(grid.rotation, point)
+
+    if grid_vertex is None:
+        return None
+
+    x = grid_vertex[0] - grid.min_x
+    y = grid_vertex[1] - grid.min_y
+    offset = grid.rotation // 45
+
+    bits: List[int] = []
+
+    for k in range(8):
+        dx, dy, q = SECTOR_CELLS[(k - offset) % 8]
+
+        if x + dx < 0 or y + dy < 0 or x + dx >= STRIDE:
+            bits.append(-1)
+        else:
+            bits.append(cell_bit(x + dx, y + dy, q))
+
+    return bits
@@ -0,0 +1,262 @@
+import hashlib
+import logging
+import os
+import pickle
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from model import SHAPES
+from solver.exact import ExactPoint, edge_length, rotate_exact, to_vertex, translate
+from solver.lattice import LatticeShadow, direction, polygon_area
+from solver.placements import LatticePlacement, get_orientations
+
+
+L = logging.getLogger('Solver-Cache')
+
+
+# Bereits gelöste Figuren werden mit ihrer Lösung auf der Festplatte
+# gespeichert. Der Schlüssel ist eine kanonische Signatur der Shadows, die sich
+# beim Verschieben, Drehen und Spiegeln der Figur nicht ändert. Die Lösung
+# wird in den kanonischen Koordinaten jedes Shadows abgelegt und bei einem
+# Treffer in die Koordinaten der aktuellen Shadows zurückgerechnet. Alle
+# Koordinaten sind exakt (siehe exact), die Abbildungen runden also nie.
+CACHE_FILE = 'resources/solution_cache.p'
+CACHE_SIZE = 64
+
+# Wird bei einer Änderung des Formats der Signatur erhöht, ältere Einträge
+# werden dann nie mehr getroffen
+SIGNATURE_VERSION = 2
+
+# Gespeicherte Lage: (Form, Eckpunkte in kanonischen Koordinaten)
+CachedPlacement = Tuple[str, List[ExactPoint]]
+
+
+class Canonical:
+    """
+    Kanonische Form eines Shadows: die Signatur und die Abbildung von den
+    Koordinaten des Shadows in das kanonische Koordinatensystem (Eckpunkt
+    `origin` im Ursprung, erste Kante in Richtung 0, ggf. an der x-Achse
+    gespiegelt). Liegt ein Punkt nach der Drehung nicht im Gitter, liefern die
+    Abbildungen None.
+    """
+    signature: str
+    origin: ExactPoint
+    rotation: int
+    mirrored: bool
+
+    def __init__(self, signature: str, origin: ExactPoint, rotation: int, mirrored: bool) -> None:
+        self.signature = signature
+        self.origin = origin
+        self.rotation = rotation
+        self.mirrored = mirrored
+
+    def to_canonical(self, point: ExactPoint) -> ExactPoint | None:
+        x, y = mirror(point, self.mirrored)
+
+        return rotate_exact((x - self.origin[0], y - self.origin[1]), -self.rotation)
+
+    def to_shadow(self, point: ExactPoint) -> ExactPoint | None:
+        rotated = rotate_exact(point, self.rotation)
+
+        if rotated is None:
+            return None
+
+        return mirror((rotated[0] + self.origin[0], rotated[1] + self.origin[1]), self.mirrored)
+
+    def __str__(self) -> str:
+        return 'Canonical(signature=%s, rotation=%d, mirrored=%s)' % (self.signature, self.rotation, self.mirrored)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class SolutionCache:
+    path: str
+    size: int
+    entries: 'OrderedDict[str, List[List[CachedPlacement]]]'
+
+    def __init__(self, path: str = CACHE_FILE, size: int = CACHE_SIZE) -> None:
+        self.path = path
+        self.size = size
+        self.entries = OrderedDict()
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    self.entries = pickle.load(f)
+            except Exception as e:
+                L.warning('Cache %s konnte nicht gelesen werden: %s' % (path, e))
+
+    def lookup(self, shadows: List[LatticeShadow], counts: Dict[str, int]) -> List[Tuple[int, LatticePlacement]] | None:
+        key, canonicals, order = get_key(shadows, counts)
+
+        if key not in self.entries:
+            return None
+
+        solution = from_plans(canonicals, order, self.entries[key])
+
+        if solution is None:
+            return None
+
+        self.entries.move_to_end(key)
+        self.__save()
+
+        return solution
+
+    def store(self, shadows: List[LatticeShadow], counts: Dict[str, int], solution: List[Tuple[int, LatticePlacement]]) -> None:
+        key, canonicals, order = get_key(shadows, counts)
+
+        plans = to_plans(canonicals, order, solution)
+
+        if plans is None:
+            return
+
+        self.entries[key] = plans
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+        self.__save()
+
+    def __save(self) -> None:
+        tmp_path = self.path + '.tmp'
+
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            L.warning('Cache %s konnte nicht geschrieben werden: %s' % (self.path, e))
+
+
+
+#=====================#
+# CANONICAL SIGNATURE #
+#=====================#
+
+# Liefert den Schlüssel für eine Figur, die kanonischen Formen der Shadows und
+# die Reihenfolge, in der die Shadows im Schlüssel stehen
+def get_key(shadows: List[LatticeShadow], counts: Dict[str, int]) -> Tuple[str, List[Canonical], List[int]]:
+    canonicals = [get_canonical(shadow) for shadow in shadows]
+    order = sorted(range(len(shadows)), key=lambda i: canonicals[i].signature)
+
+    signature = 'v%d|' % SIGNATURE_VERSION + '|'.join(canonicals[i].signature for i in order)
+    signature += '#' + ','.join('%s=%d' % (name, counts[name]) for name in sorted(counts))
+
+    return hashlib.sha1(signature.encode()).hexdigest(), [canonicals[i] for i in order], order
+
+
+# Beschreibt den Umriss als Folge von (Drehung an der Ecke, Länge der Kante)
+# und wählt unter allen Startecken und beiden Spiegelungen die kleinste Folge
+def get_canonical(shadow: LatticeShadow) -> Canonical:
+    best: Tuple[List[Tuple[int, int, int]], int, bool] | None = None
+    best_points: List[ExactPoint] = []
+
+    for mirrored in (False, True):
+        points = [mirror(p, mirrored) for p in shadow.points]
+        vertices = [to_vertex(p) for p in points]
+
+        # Eckpunkte in positiver Drehrichtung sortieren
+        if polygon_area(vertices) < 0:
+            points = points[::-1]
+            vertices = vertices[::-1]
+
+        n = len(points)
+        directions = [direction(vertices[i], vertices[(i+1) % n]) for i in range(n)]
+        lengths = [edge_length(points[i], points[(i+1) % n]) for i in range(n)]
+        steps = [((directions[i] - directions[i-1]) % 8, lengths[i].a, lengths[i].b) for i in range(n)]
+
+        for start in range(n):
+            sequence = steps[start:] + steps[:start]
+
+            if best is None or sequence < best[0]:
+                best = (sequence, start, mirrored)
+                best_points = points
+
+    sequence, start, mirrored = best
+    origin = best_points[start]
+    rotation = direction(to_vertex(origin), to_vertex(best_points[(start+1) % len(best_points)])) * 45
+
+    signature = ';'.join('%d:%d,%d' % step for step in sequence) + ';A=%.2f' % shadow.area
+
+    return Canonical(signature, origin, rotation, mirrored)
+
+
+
+#=======#
+# PLANS #
+#=======#
+
+# Rechnet eine Lösung in die kanonischen Koordinaten der Shadows um (ein Plan
+# je Shadow, in der Reihenfolge des Schlüssels)
+def to_plans(canonicals: List[Canonical], order: List[int], solution: List[Tuple[int, LatticePlacement]]) -> List[List[CachedPlacement]] | None:
+    plans: List[List[CachedPlacement]] = []
+
+    for canonical, shadow_idx in zip(canonicals, order):
+        plan: List[CachedPlacement] = []
+
+        for idx, p in solution:
+            if idx != shadow_idx:
+                continue
+
+            points = [canonical.to_canonical(point) for point in p.points]
+
+            if None in points:
+                L.debug('Lösung liegt in kanonischer Lage nicht im Gitter, wird nicht gespeichert')
+                return None
+
+            plan.append((p.shape.name, points))
+
+        plans.append(plan)
+
+    return plans
+
+
+# Rechnet gespeicherte Pläne zurück in die Koordinaten der aktuellen Shadows
+def from_plans(canonicals: List[Canonical], order: List[int], plans: List[List[CachedPlacement]]) -> List[Tuple[int, LatticePlacement]] | None:
+    solution: List[Tuple[int, LatticePlacement]] = []
+
+    for canonical, shadow_idx, plan in zip(canonicals, order, plans):
+        for name, points in plan:
+            moved = [canonical.to_shadow(p) for p in points]
+
+            if None in moved:
+                L.debug('Gespeicherte Lösung liegt in dieser Drehung nicht im Gitter')
+                return None
+
+            placement = match_placement(name, moved)
+
+            # Gespiegelte Figur: ein chiraler Stein (Shape.chiral, das
+            # Parallelogramm) lässt sich nicht spiegeln, die Lösung passt dann nicht
+            if placement is None:
+                L.debug('Gespeicherte Lösung passt nur zur gespiegelten Figur')
+                return None
+
+            solution.append((shadow_idx, placement))
+
+    return solution
+
+
+
+#=========#
+# HELPERS #
+#=========#
+
+def mirror(point: ExactPoint, mirrored: bool) -> ExactPoint:
+    return (point[0], -point[1]) if mirrored else point
+
+
+# Sucht die Drehung der Form, deren Eckpunkte nach einer Verschiebung genau
+# auf den gegebenen Eckpunkten liegen
+def match_placement(name: str, points: List[ExactPoint]) -> LatticePlacement | None:
+    target = set(points)
+    anchor = min(points)
+
+    for orientation in get_orientations(SHAPES[name]):
+        origin = min(orientation.points)
+        moved = translate(orientation.points, anchor[0] - origin[0], anchor[1] - origin[1])
+
+        if set(moved) == target:
+            return LatticePlacement(orientation.shape, orientation.rotation, moved)
+
+    return None
@@ -0,0 +1,247 @@
+import logging
+from typing import List, Sequence, Tuple
+import numpy as np
+
+
+L = logging.getLogger('Solver-Clipping')
+
+
+# Boolesche Operationen auf Polygonen (Differenz, Schnitt, Vereinigung), die
+# mit NumPy auf vielen Polygonen gleichzeitig rechnen.
+#
+# Jeder Stein ist konvex. Alle Operationen lassen sich daher auf das Clippen
+# eines beliebigen Polygons an einer Menge von Halbebenen zurückführen
+# (Sutherland-Hodgman), das auch für konkave Polygone wie die Shadows die
+# richtige Fläche liefert:
+#
+# - Schnitt mit einem konvexen Polygon: Clippen an den Halbebenen seiner Kanten
+# - Differenz mit einem konvexen Polygon P (Kanten 0..k-1): die disjunkten
+#   Teile "außerhalb von Kante i, innerhalb der Kanten 0..i-1"
+# - Vereinigung konvexer Polygone: P_1 + (P_2 - P_1) + (P_3 - P_1 - P_2) + ...
+#
+# Ein Stapel (Batch) von Polygonen wird als Array (B, V, 2) mit der Anzahl der
+# Eckpunkte je Polygon (B,) gehalten, kürzere Polygone werden mit ihrem letzten
+# Eckpunkt aufgefüllt. Eine Halbebene (a, b, c) enthält alle Punkte mit
+# a·x + b·y + c >= 0, die Halbebene (0, 0, 1) enthält alle Punkte.
+
+# Teile mit kleinerer Fläche entstehen nur durch Rundung und werden verworfen
+MIN_AREA = 1e-9
+
+ALL_PLANE = (0.0, 0.0, 1.0)
+
+# Region: disjunkte Polygone, jeweils als Array (V, 2)
+Region = List[np.ndarray]
+
+
+#=========#
+# BATCHES #
+#=========#
+
+def pack(polygons: Sequence[Sequence[Tuple[float, float]]]) -> Tuple[np.ndarray, np.ndarray]:
+    counts = np.array([len(p) for p in polygons], dtype=np.int64)
+    width = max(1, counts.max(initial=1))
+
+    padded = [list(p) + [p[-1]] * (width - len(p)) if len(p) > 0 else [(0.0, 0.0)] * width for p in polygons]
+
+    return np.array(padded, dtype=float).reshape(len(polygons), width, 2), counts
+
+
+# Stapel aus `n` Kopien eines Polygons
+def repeat(polygon: Sequence[Tuple[float, float]], n: int) -> Tuple[np.ndarray, np.ndarray]:
+    points = np.asarray(polygon, dtype=float).reshape(1, -1, 2)
+
+    return np.repeat(points, n, axis=0), np.full(n, len(polygon), dtype=np.int64)
+
+
+def unpack(points: np.ndarray, counts: np.ndarray) -> Region:
+    return [points[i, :counts[i]].copy() for i in range(len(counts))]
+
+
+# Flächen aller Polygone eines Stapels (Gaußsche Trapezformel)
+def areas(points: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    return np.abs(areas_signed(points, counts))
+
+
+# Wie areas, positiv für Polygone gegen den Uhrzeigersinn
+def areas_signed(points: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    if len(counts) == 0:
+        return np.zeros(0)
+
+    following = __following(points, counts)
+    cross = points[..., 0] * following[..., 1] - points[..., 1] * following[..., 0]
+    cross[~__valid(points, counts)] = 0
+
+    return cross.sum(axis=1) / 2
+
+
+# Schneidet jedes Polygon des Stapels mit seinen Halbebenen (B, K, 3)
+def clip(points: np.ndarray, counts: np.ndarray, planes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    for k in range(planes.shape[1]):
+        if len(counts) == 0:
+            break
+
+        a = planes[:, k, 0:1]
+        b = planes[:, k, 1:2]
+        c = planes[:, k, 2:3]
+
+        following = __following(points, counts)
+        valid = __valid(points, counts)
+
+        d = a * points[..., 0] + b * points[..., 1] + c
+        d_next = a * following[..., 0] + b * following[..., 1] + c
+
+        inside = d >= 0
+        crossing = inside != (d_next >= 0)
+
+        # Schnittpunkt der Kante i -> i+1 mit der Geraden der Halbebene
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(crossing, d / (d - d_next), 0)
+        cut = points + t[..., None] * (following - points)
+
+        # Pro Kante höchstens zwei Punkte: der Eckpunkt (falls innen) und der Schnittpunkt
+        candidates = np.stack((points, cut), axis=2).reshape(len(counts), -1, 2)
+        keep = np.stack((inside & valid, crossing & valid), axis=2).reshape(len(counts), -1)
+
+        points, counts = __compact(candidates, keep)
+
+    return points, counts
+
+
+# Prüft für jeden Punkt (N, 2), ob er im Polygon liegt (Strahlverfahren wie
+# lattice.point_in_polygon, für alle Punkte und Kanten gleichzeitig)
+def points_in_polygon(points: np.ndarray, polygon: Sequence[Tuple[float, float]]) -> np.ndarray:
+    vertices = np.asarray(polygon, dtype=float)
+    x1, y1 = np.roll(vertices, 1, axis=0).T
+    x2, y2 = vertices.T
+
+    px = points[:, 0:1]
+    py = points[:, 1:2]
+
+    crossing = (y1 > py) != (y2 > py)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_intersect = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+
+    return ((crossing & (px < x_intersect)).sum(axis=1) % 2) == 1
+
+
+# Halbebenen der Kanten eines konvexen Polygons, innen liegt das Polygon
+def convex_planes(polygon: Sequence[Tuple[float, float]]) -> np.ndarray:
+    return convex_planes_batch(*pack([polygon]))[0]
+
+
+# Halbebenen der Kanten aller konvexen Polygone eines Stapels (B, V, 3). Für
+# die aufgefüllten Eckpunkte wird die Halbebene (0, 0, 0) geliefert, die alle
+# Punkte enthält.
+def convex_planes_batch(points: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    following = __following(points, counts)
+
+    a = points[..., 1] - following[..., 1]
+    b = following[..., 0] - points[..., 0]
+    c = -(a * points[..., 0] + b * points[..., 1])
+    planes = np.stack((a, b, c), axis=2)
+    planes[~__valid(points, counts)] = 0
+
+    # Im Uhrzeigersinn liegt das Innere rechts der Kanten
+    clockwise = areas_signed(points, counts) < 0
+    planes[clockwise] *= -1
+
+    return planes
+
+
+def __following(points: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    index = (np.arange(points.shape[1])[None, :] + 1) % np.maximum(counts, 1)[:, None]
+
+    return np.take_along_axis(points, index[..., None], axis=1)
+
+
+def __valid(points: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    return np.arange(points.shape[1])[None, :] < counts[:, None]
+
+
+# Schiebt die behaltenen Punkte nach vorne und füllt mit dem letzten auf
+def __compact(candidates: np.ndarray, keep: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(~keep, axis=1, kind='stable')
+    counts = keep.sum(axis=1)
+    width = max(1, counts.max())
+
+    index = np.minimum(np.arange(width)[None, :], np.maximum(counts, 1)[:, None] - 1)
+    index = np.take_along_axis(order, index, axis=1)
+
+    return np.take_along_axis(candidates, index[..., None], axis=1), counts
+
+
+
+#============#
+# OPERATIONS #
+#============#
+
+# Fläche des Schnitts eines (beliebigen) Polygons mit jedem der konvexen
+# Polygone, die als Liste oder als Stapel (siehe pack) übergeben werden
+def intersection_areas(polygon: Sequence[Tuple[float, float]], convexes: Sequence[Sequence[Tuple[float, float]]] | Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    batch = convexes if isinstance(convexes, tuple) else pack(convexes)
+
+    if len(batch[1]) == 0:
+        return np.zeros(0)
+
+    points, counts = repeat(polygon, len(batch[1]))
+    planes = convex_planes_batch(*batch)
+
+    return areas(*clip(points, counts, planes))
+
+
+def intersection(region: Region, convex: Sequence[Tuple[float, float]]) -> Region:
+    if len(region) == 0:
+        return []
+
+    edges = convex_planes(convex)
+    points, counts = pack(region)
+    planes = np.broadcast_to(edges, (len(region),) + edges.shape)
+
+    return __nonempty(*clip(points, counts, planes))
+
+
+def difference(region: Region, convex: Sequence[Tuple[float, float]]) -> Region:
+    if len(region) == 0:
+        return []
+
+    edges = convex_planes(convex)
+    k = len(edges)
+
+    # Teil i: außerhalb von Kante i, innerhalb der Kanten 0..i-1
+    parts = np.tile(np.array(ALL_PLANE), (k, k, 1))
+    for i in range(k):
+        parts[i, :i] = edges[:i]
+        parts[i, i] = -edges[i]
+
+    points, counts = pack([polygon for polygon in region for _ in range(k)])
+    planes = np.tile(parts, (len(region), 1, 1))
+
+    return __nonempty(*clip(points, counts, planes))
+
+
+# Vereinigung konvexer Polygone als disjunkte konvexe Teile
+def union(convexes: Sequence[Sequence[Tuple[float, float]]]) -> Region:
+    region: Region = []
+
+    for i, convex in enumerate(convexes):
+        parts: Region = [np.asarray(convex, dtype=float)]
+
+        for previous in convexes[:i]:
+            parts = difference(parts, previous)
+
+        region.extend(parts)
+
+    return region
+
+
+def region_area(region: Region) -> float:
+    if len(region) == 0:
+        return 0.0
+
+    return float(areas(*pack(region)).sum())
+
+
+def __nonempty(points: np.ndarray, counts: np.ndarray) -> Region:
+    keep = areas(points, counts) > MIN_AREA
+
+    return unpack(points[keep], counts[keep])
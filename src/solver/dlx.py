@@ -0,0 +1,246 @@
+import logging
+from typing import Dict, List, Set, Tuple
+from model import SHAPES, Shape
+from solver.anytime import Anytime
+from solver.bitset import ORIENTATION_MASKS, cell_bit, get_grid, mask_bits
+from solver.exact import from_ints, rotate_exact
+from solver.lattice import LatticeShadow
+from solver.placements import LatticePlacement
+
+
+L = logging.getLogger('Solver-DLX')
+
+
+# Liegen alle Steine einer Figur im selben Gitter, lässt sich die Figur in
+# Zellen zerlegen (siehe bitset). Jede Lage eines Steins deckt dann eine feste
+# Menge von Zellen ab und die Suche wird zu einem Exact-Cover-Problem, das mit
+# Algorithm X (Dancing Links) gelöst wird.
+#
+# Spalte (Shadow, Bit der Zelle)
+Cell = Tuple[int, int]
+
+
+class Node:
+    left: 'Node'
+    right: 'Node'
+    up: 'Node'
+    down: 'Node'
+    column: 'Column'
+    row: int
+
+    def __init__(self, column: 'Column' = None, row: int = -1) -> None:
+        self.left = self
+        self.right = self
+        self.up = self
+        self.down = self
+        self.column = column
+        self.row = row
+
+
+class Column(Node):
+    size: int
+    name: Cell | None
+
+    def __init__(self, name: Cell | None = None) -> None:
+        super().__init__(self)
+        self.size = 0
+        self.name = name
+
+
+class Matrix:
+    root: Column
+    columns: Dict[Cell, Column]
+    rows: List[LatticePlacement]
+    row_shadows: List[int]
+
+    def __init__(self, cells: Set[Cell]) -> None:
+        self.root = Column()
+        self.columns = {}
+        self.rows = []
+        self.row_shadows = []
+
+        for cell in sorted(cells):
+            column = Column(cell)
+            column.right = self.root
+            column.left = self.root.left
+            self.root.left.right = column
+            self.root.left = column
+            self.columns[cell] = column
+
+    def add_row(self, shadow_idx: int, placement: LatticePlacement, cells: List[Cell]) -> None:
+        row = len(self.rows)
+        self.rows.append(placement)
+        self.row_shadows.append(shadow_idx)
+
+        first = None
+
+        for cell in cells:
+            column = self.columns[cell]
+            node = Node(column, row)
+
+            node.down = column
+            node.up = column.up
+            column.up.down = node
+            column.up = node
+            column.size += 1
+
+            if first is None:
+                first = node
+            else:
+                node.right = first
+                node.left = first.left
+                first.left.right = node
+                first.left = node
+
+
+
+#====================#
+# CELL DECOMPOSITION #
+#====================#
+
+def build_matrix(shadows: List[LatticeShadow], shapes: List[Shape]) -> Matrix:
+    grids = [get_grid(shadow) for shadow in shadows]
+
+    matrix = Matrix({(shadow_idx, bit) for shadow_idx, grid in enumerate(grids) for bit in mask_bits(grid.region)})
+
+    for shadow_idx, grid in enumerate(grids):
+        for shape in shapes:
+            # Im Gitter liegen nur Drehungen um Vielfache von 90°, symmetrische
+            # Drehungen ergeben dieselben Lagen
+            for rotation in range(0, shape.period, 90):
+                orientation = ORIENTATION_MASKS[(shape.name, rotation)]
+
+                for dx in range(grid.width - orientation.width + 1):
+                    for dy in range(grid.height - orientation.height + 1):
+                        mask = orientation.mask << cell_bit(dx, dy, 0)
+
+                        if mask & ~grid.region:
+                            continue
+
+                        # Lage zurück in die Koordinaten des Shadows drehen
+                        x = grid.min_x + dx
+                        y = grid.min_y + dy
+                        points = [rotate_exact(from_ints(vx + x, vy + y), grid.rotation) for vx, vy in orientation.vertices]
+                        placement = LatticePlacement(shape, (rotation + grid.rotation) % 360, points, mask)
+
+                        matrix.add_row(shadow_idx, placement, [(shadow_idx, bit) for bit in mask_bits(mask)])
+
+    L.debug('Exact-Cover-Matrix: %d Zellen, %d Lagen' % (len(matrix.columns), len(matrix.rows)))
+
+    return matrix
+
+
+
+#=============#
+# ALGORITHM X #
+#=============#
+
+# Durchsucht alle Lagen im Gitter vollständig. Gibt es keine Lösung, ist damit
+# bewiesen, dass sich die Figur mit den Steinen nicht im Gitter legen lässt.
+# Setzt voraus, dass bitset.rasterizable(shadows) gilt.
+def search(shadows: List[LatticeShadow], counts: Dict[str, int], anytime: Anytime | None = None) -> List[Tuple[int, LatticePlacement]] | None:
+    matrix = build_matrix(shadows, [SHAPES[name] for name in counts])
+
+    if anytime is None:
+        anytime = Anytime(None, None, sum(shadow.area for shadow in shadows))
+
+    solution: List[int] = []
+
+    if __algorithm_x(matrix, counts.copy(), solution, anytime):
+        return __to_solution(matrix, solution)
+
+    return None
+
+
+def __to_solution(matrix: Matrix, solution: List[int]) -> List[Tuple[int, LatticePlacement]]:
+    return [(matrix.row_shadows[row], matrix.rows[row]) for row in solution]
+
+
+def __algorithm_x(matrix: Matrix, counts: Dict[str, int], solution: List[int], anytime: Anytime) -> bool:
+    root = matrix.root
+
+    # Alle Zellen abgedeckt -> Lösung gefunden
+    if root.right is root:
+        return True
+
+    if anytime.expired():
+        return False
+
+    # Spalte mit den wenigsten Zeilen wählen
+    column = root.right
+    node = column.right
+    while node is not root:
+        if node.size < column.size:
+            column = node
+        node = node.right
+
+    if column.size == 0:
+        return False
+
+    __cover(column)
+
+    row_node = column.down
+    while row_node is not column:
+        name = matrix.rows[row_node.row].shape.name
+
+        if counts[name] > 0:
+            counts[name] -= 1
+            solution.append(row_node.row)
+
+            area = sum(matrix.rows[row].shape.area for row in solution)
+            anytime.offer(area, lambda: __to_solution(matrix, solution))
+
+            node = row_node.right
+            while node is not row_node:
+                __cover(node.column)
+                node = node.right
+
+            if __algorithm_x(matrix, counts, solution, anytime):
+                return True
+
+            node = row_node.left
+            while node is not row_node:
+                __uncover(node.column)
+                node = node.left
+
+            solution.pop()
+            counts[name] += 1
+
+            if anytime.stopped:
+                break
+
+        row_node = row_node.down
+
+    __uncover(column)
+
+    return False
+
+
+def __cover(column: Column) -> None:
+    column.right.left = column.left
+    column.left.right = column.right
+
+    row_node = column.down
+    while row_node is not column:
+        node = row_node.right
+        while node is not row_node:
+            node.down.up = node.up
+            node.up.down = node.down
+            node.column.size -= 1
+            node = node.right
+        row_node = row_node.down
+
+
+def __uncover(column: Column) -> None:
+    row_node = column.up
+    while row_node is not column:
+        node = row_node.left
+        while node is not row_node:
+            node.column.size += 1
+            node.down.up = node
+            node.up.down = node
+            node = node.left
+        row_node = row_node.up
+
+    column.right.left = column
+    column.left.right = column
@@ -0,0 +1,166 @@
+import logging
+import time
+from typing import Dict, List, Tuple
+from model import Block, Placement, Plan, Shadow
+from solver.anytime import Anytime, ProgressCallback
+from solver.lattice import LatticeShadow, snap_shadows
+from solver.placements import LatticePlacement
+from solver.cache import SolutionCache
+from solver.library import FigureLibrary
+from solver.pruning import PruneStats, check_figure
+from solver.clipping import region_area
+from solver.verify import remaining_region, verify_plan
+from solver import bitset, dlx, geometric, split
+
+
+L = logging.getLogger('Solver')
+
+# Anteil der Shadow-Fläche, den ein vollständiger Plan in Bildkoordinaten
+# unbedeckt lassen oder überstehen darf (Messfehler der Konturen)
+VERIFY_TOLERANCE = 0.05
+
+# Werden beim ersten Aufruf von solve() geladen
+__cache: SolutionCache | None = None
+__library: FigureLibrary | None = None
+
+
+# Sucht eine Belegung der Shadows mit den Steinen. Ist `deadline` (Zeitpunkt
+# nach time.monotonic()) erreicht oder bricht `progress` die Suche ab, wird
+# die beste bis dahin gefundene Teilbelegung als unvollständiger Plan geliefert.
+def solve(blocks: List[Block], shadows: List[Shadow], method: str = 'geometric', use_cache: bool = True, deadline: float | None = None, progress: ProgressCallback | None = None) -> Plan | None:
+    start = time.perf_counter()
+
+    if len(blocks) == 0 or len(shadows) == 0:
+        L.warning('Keine Steine oder Shadows gefunden')
+        return None
+
+    # Ein umgedrehtes Parallelogramm kann der Roboter nicht wenden, die Suche
+    # kennt nur seine Lagen ohne Spiegelung. Es bleibt liegen, bis es beim
+    # nächsten Scan richtig herum liegt
+    for block in blocks:
+        if block.mirrored:
+            L.warning('%s bei %s liegt umgedreht und wird nicht eingeplant, bitte wenden' % (block.shape.name, block.position))
+
+    blocks = [block for block in blocks if not block.mirrored]
+
+    lattice_shadows = snap_shadows(shadows)
+    if lattice_shadows is None:
+        L.warning('Shadow lässt sich nicht auf das Tangram-Gitter legen')
+        return None
+
+    counts: Dict[str, int] = {}
+    for block in blocks:
+        counts[block.shape.name] = counts.get(block.shape.name, 0) + 1
+
+    known = __get_library().lookup(lattice_shadows, counts)
+
+    if known is not None:
+        name, lattice_solution = known
+        L.info('Figur %s aus der Bibliothek nach %.1f ms' % (name, (time.perf_counter() - start) * 1000))
+        return verified(Plan(to_placements(lattice_solution, lattice_shadows, blocks), 1, True), shadows)
+
+    if use_cache:
+        lattice_solution = __get_cache().lookup(lattice_shadows, counts)
+
+        if lattice_solution is not None:
+            L.info('Lösung aus dem Cache nach %.1f ms' % ((time.perf_counter() - start) * 1000))
+            return verified(Plan(to_placements(lattice_solution, lattice_shadows, blocks), 1, True), shadows)
+
+    if method == 'dlx' and not bitset.rasterizable(lattice_shadows):
+        L.warning('Shadow lässt sich nicht in Zellen zerlegen, nutze geometrische Suche')
+        method = 'geometric'
+
+    stats = PruneStats()
+
+    reason = check_figure(lattice_shadows, counts, stats)
+    if reason is not None:
+        L.warning('Figur hat keine Lösung: %s' % reason)
+        return Plan([], 0, False)
+
+    anytime = Anytime(deadline, progress, sum(shadow.area for shadow in lattice_shadows))
+
+    if len(lattice_shadows) > 1:
+        lattice_solution = split.search(lattice_shadows, counts, anytime, stats, method)
+    elif method == 'dlx':
+        lattice_solution = dlx.search(lattice_shadows, counts, anytime)
+    elif method == 'parallel':
+        lattice_solution = geometric.parallel_search(lattice_shadows, counts, anytime, stats)
+    else:
+        lattice_solution = geometric.search(lattice_shadows, counts, anytime, stats)
+
+    L.info('Suche (%s) beendet nach %.1f ms' % (method, (time.perf_counter() - start) * 1000))
+    L.debug('Beschnittene Zweige: %s' % stats)
+
+    if lattice_solution is None:
+        if method == 'dlx' and not anytime.stopped:
+            L.info('Alle Lagen im Gitter durchsucht, die Figur hat keine Lösung')
+
+        L.info('Beste Teilbelegung: %d Steine, %.0f%% abgedeckt' % (len(anytime.best), anytime.coverage() * 100))
+        log_remaining(lattice_shadows, anytime.best)
+        return verified(Plan(to_placements(anytime.best, lattice_shadows, blocks), anytime.coverage(), False), shadows)
+
+    if use_cache:
+        __get_cache().store(lattice_shadows, counts, lattice_solution)
+
+    return verified(Plan(to_placements(lattice_solution, lattice_shadows, blocks), 1, True), shadows)
+
+
+# Prüft den Plan in Bildkoordinaten gegen die erkannten Shadows (siehe verify)
+def verified(plan: Plan, shadows: List[Shadow]) -> Plan:
+    plan.verification = verify_plan(shadows, plan.placements)
+    L.debug('Prüfung: %s' % plan.verification)
+
+    if plan.complete and max(plan.verification.uncovered, plan.verification.overflow) > VERIFY_TOLERANCE:
+        L.warning('Plan weicht von den Shadows ab: %.1f%% nicht abgedeckt, %.1f%% überstehend' % (plan.verification.uncovered * 100, plan.verification.overflow * 100))
+
+    return plan
+
+
+# Gibt die freie Fläche jedes Shadows nach einer Teilbelegung aus
+def log_remaining(lattice_shadows: List[LatticeShadow], lattice_solution: List[Tuple[int, LatticePlacement]]) -> None:
+    for shadow_idx, shadow in enumerate(lattice_shadows):
+        region = remaining_region(shadow.vertices, [p.vertices for idx, p in lattice_solution if idx == shadow_idx])
+        L.debug('Shadow %d: %d freie Teile mit %.2f Einheiten Fläche' % (shadow_idx, len(region), region_area(region)))
+
+
+# Ordnet jeder Lage im Gitter einen erkannten Stein der passenden Form zu
+# und rechnet die Lage zurück in Bildkoordinaten des Shadow-Bilds
+def to_placements(lattice_solution: List[Tuple[int, LatticePlacement]], lattice_shadows: List[LatticeShadow], blocks: List[Block]) -> List[Placement]:
+    available = blocks.copy()
+    placements: List[Placement] = []
+
+    for shadow_idx, lattice_placement in lattice_solution:
+        frame = lattice_shadows[shadow_idx].frame
+
+        block = next(b for b in available if b.shape is lattice_placement.shape)
+        available.remove(block)
+
+        vertices = [frame.to_image(v) for v in lattice_placement.vertices]
+
+        x = sum(v[0] for v in vertices) / len(vertices)
+        y = sum(v[1] for v in vertices) / len(vertices)
+
+        rotation = (frame.rotation + lattice_placement.rotation) % 360
+
+        placements.append(Placement(block, vertices, (x, y), rotation))
+
+    return placements
+
+
+def __get_cache() -> SolutionCache:
+    global __cache
+
+    if __cache is None:
+        __cache = SolutionCache()
+
+    return __cache
+
+
+def __get_library() -> FigureLibrary:
+    global __library
+
+    if __library is None:
+        __library = FigureLibrary()
+        L.debug('Bibliothek: %s' % __library)
+
+    return __library
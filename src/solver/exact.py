@@ -0,0 +1,159 @@
+import math
+from typing import List, Tuple
+
+
+# Alle Koordinaten einer Tangram-Figur haben die Form a + b·√2/2 mit
+# ganzzahligen a und b (siehe lattice). Mit Exact lassen sie sich ohne
+# Rundungsfehler addieren, vergleichen, hashen und um Vielfache von 45°
+# drehen. Gleitkommazahlen werden nur noch aus exakten Werten abgeleitet,
+# gerundet wird nur einmal beim Einrasten der Pixel (siehe lattice.snap_polygon).
+HALF_SQRT2 = math.sqrt(2) / 2
+
+
+class Exact:
+    __slots__ = ('a', 'b')
+
+    a: int
+    b: int
+
+    def __init__(self, a: int, b: int = 0) -> None:
+        self.a = a
+        self.b = b
+
+    def __add__(self, other: 'Exact') -> 'Exact':
+        return Exact(self.a + other.a, self.b + other.b)
+
+    def __sub__(self, other: 'Exact') -> 'Exact':
+        return Exact(self.a - other.a, self.b - other.b)
+
+    def __neg__(self) -> 'Exact':
+        return Exact(-self.a, -self.b)
+
+    def __mul__(self, factor: int) -> 'Exact':
+        return Exact(self.a * factor, self.b * factor)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Exact) and self.a == other.a and self.b == other.b
+
+    def __hash__(self) -> int:
+        return hash((self.a, self.b))
+
+    def __lt__(self, other: 'Exact') -> bool:
+        return (self - other).sign() < 0
+
+    def __le__(self, other: 'Exact') -> bool:
+        return (self - other).sign() <= 0
+
+    def __gt__(self, other: 'Exact') -> bool:
+        return (self - other).sign() > 0
+
+    def __ge__(self, other: 'Exact') -> bool:
+        return (self - other).sign() >= 0
+
+    def __float__(self) -> float:
+        return self.a + self.b * HALF_SQRT2
+
+    def __abs__(self) -> 'Exact':
+        return -self if self.sign() < 0 else self
+
+    def __getstate__(self) -> Tuple[int, int]:
+        return (self.a, self.b)
+
+    def __setstate__(self, state: Tuple[int, int]) -> None:
+        self.a, self.b = state
+
+    # Vorzeichen von a + b·√2/2 ohne Gleitkommarechnung: bei
+    # unterschiedlichen Vorzeichen entscheidet a² gegen b²/2
+    def sign(self) -> int:
+        a, b = self.a, self.b
+
+        if a >= 0 and b >= 0:
+            return 0 if a == 0 and b == 0 else 1
+        if a <= 0 and b <= 0:
+            return -1
+        if a > 0:
+            return 1 if 2 * a * a > b * b else -1
+
+        return 1 if b * b > 2 * a * a else -1
+
+    # (a + b·√2/2)·√2/2 = b/2 + a·√2/2, liegt nur für gerade b im Gitter
+    def times_half_sqrt2(self) -> 'Exact | None':
+        if self.b % 2 != 0:
+            return None
+
+        return Exact(self.b // 2, self.a)
+
+    # (a + b·√2/2)·√2 = b + 2a·√2/2
+    def times_sqrt2(self) -> 'Exact':
+        return Exact(self.b, 2 * self.a)
+
+    def is_integer(self) -> bool:
+        return self.b == 0
+
+    def __str__(self) -> str:
+        return '%d%+d·√2/2' % (self.a, self.b) if self.b != 0 else '%d' % self.a
+
+    def __repr__(self) -> str:
+        return 'Exact(%d, %d)' % (self.a, self.b)
+
+
+ExactPoint = Tuple[Exact, Exact]
+
+ZERO = Exact(0)
+
+
+
+#============#
+# CONVERSION #
+#============#
+
+def to_vertex(point: ExactPoint) -> Tuple[float, float]:
+    return (float(point[0]), float(point[1]))
+
+
+def from_ints(x: int, y: int) -> ExactPoint:
+    return (Exact(x), Exact(y))
+
+
+
+#==========#
+# GEOMETRY #
+#==========#
+
+# Dreht einen Punkt um ein Vielfaches von 45° um den Ursprung. Ist das
+# Ergebnis kein Gitterpunkt, wird None geliefert.
+def rotate_exact(point: ExactPoint, angle: int) -> ExactPoint | None:
+    x, y = point
+    steps = (angle // 45) % 8
+
+    for _ in range(steps // 2):
+        x, y = -y, x
+
+    if steps % 2 == 1:
+        # (x - y)·√2/2, (x + y)·√2/2
+        rx = (x - y).times_half_sqrt2()
+        ry = (x + y).times_half_sqrt2()
+
+        if rx is None or ry is None:
+            return None
+
+        x, y = rx, ry
+
+    return (x, y)
+
+
+def translate(points: List[ExactPoint], dx: Exact, dy: Exact) -> List[ExactPoint]:
+    return [(x + dx, y + dy) for x, y in points]
+
+
+# Länge einer Kante in einer der acht Gitterrichtungen
+def edge_length(a: ExactPoint, b: ExactPoint) -> Exact:
+    dx = abs(b[0] - a[0])
+    dy = abs(b[1] - a[1])
+
+    if dx.sign() == 0:
+        return dy
+    if dy.sign() == 0:
+        return dx
+
+    return dx.times_sqrt2()
@@ -0,0 +1,456 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from multiprocessing.synchronize import Event
+from typing import Dict, List, Tuple
+from model import SHAPES
+from solver.anytime import Anytime
+from solver.bitset import Grid, get_grid, placement_mask, sector_bits
+from solver.exact import ExactPoint, to_vertex
+from solver.lattice import LatticeShadow, point_in_polygon, sector_probe
+from solver.pruning import PruneStats, corners_fillable, free_regions, regions_fillable
+from solver.placements import CORNER_INDEX, LatticePlacement, contains_point, inside_shadow, overlaps, place
+
+
+L = logging.getLogger('Solver-Geometric')
+
+
+class SearchState:
+    shadows: List[LatticeShadow]
+    counts: Dict[str, int]
+    placed: List[List[LatticePlacement]]
+    remaining_area: float
+
+    # Liegt ein Shadow im Gitter, werden die Zellen der Steine mit Maske als
+    # Bits gehalten und nur Steine außerhalb des Gitters geometrisch geprüft
+    grids: List[Grid | None]
+    occupied: List[int]
+    unmasked: List[List[LatticePlacement]]
+
+    # (Shadow, Eckpunkt, Richtung, Winkel) -> alle Lagen, die an dieser Ecke im Shadow liegen
+    # Eckpunkte sind exakt (siehe exact) und damit ohne Rundung als Schlüssel geeignet
+    index: Dict[Tuple[int, ExactPoint, int, int], List[LatticePlacement]]
+    # (Shadow, Eckpunkt) -> Sektoren um den Eckpunkt, die im Shadow liegen
+    sectors: Dict[Tuple[int, ExactPoint], List[bool]]
+    # (Shadow, Eckpunkt) -> Bits der Zellen in den Sektoren um den Eckpunkt
+    sector_bits: Dict[Tuple[int, ExactPoint], List[int] | None]
+
+    anytime: Anytime
+    stats: PruneStats
+    # Wird gesetzt, sobald ein anderer Prozess eine Lösung gefunden hat
+    stop: Event | None
+
+    def __init__(self, shadows: List[LatticeShadow], counts: Dict[str, int], anytime: Anytime | None = None) -> None:
+        self.shadows = shadows
+        self.counts = counts
+        self.placed = [[] for _ in shadows]
+        self.remaining_area = sum(shadow.area for shadow in shadows)
+        self.grids = [get_grid(shadow) for shadow in shadows]
+        self.occupied = [0 for _ in shadows]
+        self.unmasked = [[] for _ in shadows]
+        self.index = {}
+        self.sectors = {}
+        self.sector_bits = {}
+        self.anytime = anytime if anytime is not None else Anytime(None, None, self.remaining_area)
+        self.stats = PruneStats()
+        self.stop = None
+
+    def push(self, shadow_idx: int, placement: LatticePlacement) -> None:
+        self.counts[placement.shape.name] -= 1
+        self.placed[shadow_idx].append(placement)
+        self.remaining_area -= placement.shape.area
+
+        if placement.mask is not None:
+            self.occupied[shadow_idx] |= placement.mask
+        else:
+            self.unmasked[shadow_idx].append(placement)
+
+    def pop(self, shadow_idx: int) -> None:
+        placement = self.placed[shadow_idx].pop()
+
+        if placement.mask is not None:
+            self.occupied[shadow_idx] &= ~placement.mask
+        else:
+            self.unmasked[shadow_idx].pop()
+
+        self.remaining_area += placement.shape.area
+        self.counts[placement.shape.name] += 1
+
+    def solution(self) -> List[Tuple[int, LatticePlacement]]:
+        return [(shadow_idx, p) for shadow_idx, placed in enumerate(self.placed) for p in placed]
+
+
+def search(shadows: List[LatticeShadow], counts: Dict[str, int], anytime: Anytime | None = None, stats: PruneStats | None = None) -> List[Tuple[int, LatticePlacement]] | None:
+    state = SearchState(shadows, counts.copy(), anytime)
+
+    found = __backtrack(state)
+
+    if stats is not None:
+        stats.add(state.stats)
+
+    return state.solution() if found else None
+
+
+def __backtrack(state: SearchState) -> bool:
+    # Alles ausgefüllt -> Lösung gefunden
+    if state.remaining_area < 0.01:
+        return True
+
+    if state.anytime.expired() or (state.stop is not None and state.stop.is_set()):
+        return False
+
+    corners = __free_corners(state)
+
+    if not __feasible(state, corners):
+        return False
+
+    shadow_idx, candidates = __most_constrained_corner(state, corners)
+    total_area = state.anytime.total_area
+
+    if len(candidates) == 0:
+        state.stats.dead_corners += 1
+
+    for placement in candidates:
+        state.push(shadow_idx, placement)
+        state.anytime.offer(total_area - state.remaining_area, state.solution)
+
+        if __backtrack(state):
+            return True
+
+        state.pop(shadow_idx)
+
+        if state.anytime.stopped:
+            break
+
+    return False
+
+
+# Jede konvexe Ecke der noch freien Fläche muss von einem Stein ausgefüllt
+# werden, dessen Ecke genau dort liegt und dessen Kante an der Kante der Ecke
+# anliegt. Die Ecke mit den wenigsten passenden Steinen wird zuerst gefüllt,
+# so wird der Suchbaum möglichst früh beschnitten.
+def __most_constrained_corner(state: SearchState, corners: List[Tuple[int, ExactPoint, int, int]]) -> Tuple[int, List[LatticePlacement]]:
+    best: List[LatticePlacement] | None = None
+    best_shadow = 0
+    best_angle = 360
+
+    for shadow_idx, point, direction, angle in corners:
+        if angle >= 180:
+            continue
+
+        candidates = [
+            p for p in __corner_placements(state, shadow_idx, point, direction, angle)
+            if state.counts.get(p.shape.name, 0) > 0 and __fits(state, shadow_idx, p)
+        ]
+
+        if best is None or len(candidates) < len(best) or (len(candidates) == len(best) and angle < best_angle):
+            best = candidates
+            best_shadow = shadow_idx
+            best_angle = angle
+
+            if len(best) == 0:
+                break
+
+    return best_shadow, best if best is not None else []
+
+
+# Verwirft den Zwischenstand, wenn sich die freien Ecken oder Regionen
+# nicht mehr mit den verbleibenden Steinen füllen lassen (siehe pruning)
+def __feasible(state: SearchState, corners: List[Tuple[int, ExactPoint, int, int]]) -> bool:
+    if not corners_fillable([angle for _, _, _, angle in corners if angle < 180], state.counts):
+        state.stats.corners += 1
+        return False
+
+    regions: List[int] = []
+
+    for shadow_idx, shadow in enumerate(state.shadows):
+        grid = state.grids[shadow_idx]
+
+        # Regionen lassen sich nur im Gitter bestimmen, sonst zählt der ganze Shadow als eine
+        if grid is not None and len(state.unmasked[shadow_idx]) == 0:
+            regions.extend(free_regions(grid.region & ~state.occupied[shadow_idx]))
+        else:
+            free_area = shadow.area - sum(p.shape.area for p in state.placed[shadow_idx])
+
+            if free_area > 0.01:
+                regions.append(round(free_area * 2))
+
+    if not regions_fillable(regions, state.counts):
+        state.stats.regions += 1
+        return False
+
+    return True
+
+
+def __fits(state: SearchState, shadow_idx: int, placement: LatticePlacement) -> bool:
+    if placement.mask is None:
+        return not any(overlaps(placement.bounds, q.bounds) for q in state.placed[shadow_idx])
+
+    if placement.mask & state.occupied[shadow_idx]:
+        return False
+
+    return not any(overlaps(placement.bounds, q.bounds) for q in state.unmasked[shadow_idx])
+
+
+# Liefert alle Ecken der noch freien Fläche als (Shadow, Eckpunkt, Richtung, Innenwinkel).
+# Ecken können nur an Eckpunkten des Shadows oder der gelegten Steine liegen.
+def __free_corners(state: SearchState) -> List[Tuple[int, ExactPoint, int, int]]:
+    corners: List[Tuple[int, ExactPoint, int, int]] = []
+
+    for shadow_idx, shadow in enumerate(state.shadows):
+        placed = state.placed[shadow_idx]
+        unmasked = state.unmasked[shadow_idx]
+        grid = state.grids[shadow_idx]
+        free_cells = grid.region & ~state.occupied[shadow_idx] if grid is not None else 0
+
+        points = dict.fromkeys(shadow.points)
+        for p in placed:
+            points.update(dict.fromkeys(p.points))
+
+        for point in points:
+            bits = __sector_bits(state, shadow_idx, point) if grid is not None else None
+
+            if bits is not None:
+                # Eckpunkt im Gitter: jeder Sektor ist genau eine Zelle
+                free = [bits[k] >= 0 and (free_cells >> bits[k]) & 1 == 1 for k in range(8)]
+                __clear_covered(free, point, unmasked)
+            else:
+                free = __shadow_sectors(state, shadow_idx, point).copy()
+                __clear_covered(free, point, placed)
+
+            if all(free):
+                continue
+
+            for k in range(8):
+                if not free[k] or free[k-1]:
+                    continue
+
+                length = 1
+                while free[(k + length) % 8]:
+                    length += 1
+
+                corners.append((shadow_idx, point, k, length * 45))
+
+    return corners
+
+
+# Markiert alle Sektoren als belegt, in denen einer der Steine liegt
+def __clear_covered(free: List[bool], point: ExactPoint, placements: List[LatticePlacement]) -> None:
+    if len(placements) == 0:
+        return
+
+    vertex = to_vertex(point)
+
+    for k in range(8):
+        if free[k]:
+            probe = sector_probe(vertex, k)
+            free[k] = not any(contains_point(p.bounds, probe) for p in placements)
+
+
+def __shadow_sectors(state: SearchState, shadow_idx: int, point: ExactPoint) -> List[bool]:
+    cache_key = (shadow_idx, point)
+
+    if cache_key not in state.sectors:
+        shadow = state.shadows[shadow_idx]
+        vertex = to_vertex(point)
+        state.sectors[cache_key] = [point_in_polygon(sector_probe(vertex, k), shadow.vertices) for k in range(8)]
+
+    return state.sectors[cache_key]
+
+
+def __sector_bits(state: SearchState, shadow_idx: int, point: ExactPoint) -> List[int] | None:
+    cache_key = (shadow_idx, point)
+
+    if cache_key not in state.sector_bits:
+        state.sector_bits[cache_key] = sector_bits(state.grids[shadow_idx], point)
+
+    return state.sector_bits[cache_key]
+
+
+def __corner_placements(state: SearchState, shadow_idx: int, point: ExactPoint, direction: int, angle: int) -> List[LatticePlacement]:
+    key = (shadow_idx, point, direction, angle)
+
+    if key not in state.index:
+        placements: List[LatticePlacement] = []
+        grid = state.grids[shadow_idx]
+
+        # Ein Stein kann eine Ecke nur ausfüllen, wenn sein Innenwinkel
+        # an dieser Stelle nicht größer ist als der der Ecke
+        for piece_angle in (45, 90, 135):
+            if piece_angle > angle:
+                continue
+
+            for orientation, vertex_idx in CORNER_INDEX.get((direction, piece_angle), []):
+                if orientation.shape.name not in state.counts:
+                    continue
+
+                placement = place(orientation, vertex_idx, point)
+
+                if grid is not None:
+                    placement.mask = placement_mask(grid, placement)
+
+                if placement.mask is not None:
+                    if placement.mask & ~grid.region == 0:
+                        placements.append(placement)
+                elif inside_shadow(placement, state.shadows[shadow_idx]):
+                    placements.append(placement)
+
+        state.index[key] = placements
+
+    return state.index[key]
+
+
+
+#==========#
+# PARALLEL #
+#==========#
+
+# Der Suchbaum wird im Hauptprozess so weit aufgefächert, bis es mindestens
+# TASKS_PER_WORKER Teilbäume pro Prozess gibt. Die Teilbäume sind disjunkt und
+# werden auf einen ProcessPoolExecutor verteilt. Der erste Prozess, der eine
+# Lösung findet, setzt ein gemeinsames Event, worauf alle anderen abbrechen.
+#
+# CORNER_INDEX und ORIENTATION_MASKS werden beim Import berechnet und vom
+# Pool beim Starten der Prozesse übernommen. Der Pool bleibt zwischen zwei
+# Aufrufen bestehen, pro Teilbaum werden nur Shadows und vorab gelegte Lagen
+# übertragen.
+#
+# Die Prozesse kommen aus einem Forkserver und nicht per fork aus diesem
+# Prozess: der Pool entsteht bei der ersten Suche, wenn in der Pipeline schon
+# andere Threads laufen, und ein fork mit laufenden Threads kann die Prozesse
+# an Locks (Logging, Import) hängen lassen, die gerade ein anderer Thread hielt.
+MP_CONTEXT = multiprocessing.get_context('forkserver')
+TASKS_PER_WORKER = 2
+
+# Vorab gelegte Lagen eines Teilbaums: [(Shadow, Lage)]
+Prefix = List[Tuple[int, LatticePlacement]]
+
+__pool: ProcessPoolExecutor | None = None
+__pool_workers = 0
+__stop: Event | None = None
+
+
+def parallel_search(shadows: List[LatticeShadow], counts: Dict[str, int], anytime: Anytime | None = None, stats: PruneStats | None = None, workers: int | None = None) -> List[Tuple[int, LatticePlacement]] | None:
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        return search(shadows, counts, anytime, stats)
+
+    state = SearchState(shadows, counts.copy(), anytime)
+    anytime = state.anytime
+    stats = stats if stats is not None else PruneStats()
+    solution, prefixes = __split(state, workers * TASKS_PER_WORKER)
+    stats.add(state.stats)
+
+    if solution is not None:
+        return solution
+
+    if len(prefixes) == 0:
+        return None
+
+    L.debug('Suchbaum in %d Teilbäume für %d Prozesse aufgeteilt' % (len(prefixes), workers))
+
+    pool, stop = get_pool(workers)
+    stop.clear()
+
+    futures = [pool.submit(__search_subtree, shadows, counts, prefix, anytime.deadline) for prefix in prefixes]
+
+    for future in as_completed(futures):
+        solution, best, best_area, subtree_stats = future.result()
+        stats.add(subtree_stats)
+
+        # Formen kommen als Kopien aus den Prozessen zurück
+        for _, placement in (solution or []) + best:
+            placement.shape = SHAPES[placement.shape.name]
+
+        if solution is not None:
+            break
+
+        anytime.offer(best_area, lambda: best)
+
+        if anytime.stopped:
+            break
+
+    stop.set()
+    for future in futures:
+        future.cancel()
+    wait(futures)
+
+    return solution
+
+
+# Fächert den Suchbaum Ebene für Ebene auf, bis es genug Teilbäume gibt.
+# Wird dabei schon eine Lösung gefunden, wird diese zurückgegeben.
+def __split(state: SearchState, target: int) -> Tuple[List[Tuple[int, LatticePlacement]] | None, List[Prefix]]:
+    frontier: List[Prefix] = [[]]
+
+    while 0 < len(frontier) < target:
+        next_frontier: List[Prefix] = []
+
+        for prefix in frontier:
+            for shadow_idx, placement in prefix:
+                state.push(shadow_idx, placement)
+
+            solution = None
+            if state.remaining_area < 0.01:
+                solution = state.solution()
+            else:
+                corners = __free_corners(state)
+
+                if __feasible(state, corners):
+                    shadow_idx, candidates = __most_constrained_corner(state, corners)
+                    next_frontier.extend(prefix + [(shadow_idx, c)] for c in candidates)
+
+            for shadow_idx, _ in reversed(prefix):
+                state.pop(shadow_idx)
+
+            if solution is not None:
+                return solution, []
+
+        frontier = next_frontier
+
+    return None, frontier
+
+
+# Wird auch für die Teilprobleme getrennter Shadows genutzt (siehe split)
+def get_pool(workers: int) -> Tuple[ProcessPoolExecutor, Event]:
+    global __pool, __pool_workers, __stop
+
+    if __pool is None or __pool_workers != workers:
+        if __pool is not None:
+            __pool.shutdown()
+
+        __stop = MP_CONTEXT.Event()
+        __pool = ProcessPoolExecutor(workers, mp_context=MP_CONTEXT, initializer=__init_worker, initargs=(__stop,))
+        __pool_workers = workers
+
+    return __pool, __stop
+
+
+# Das Event des Pools, in dessen Prozessen aufgerufen (z.B. für die Teilprobleme von split)
+def get_worker_stop() -> Event | None:
+    return __stop
+
+
+def __init_worker(stop: Event) -> None:
+    global __stop
+    __stop = stop
+
+
+# Liefert die Lösung des Teilbaums (oder None), die beste Teilbelegung mit
+# ihrer Fläche und die Zahl der beschnittenen Zweige
+def __search_subtree(shadows: List[LatticeShadow], counts: Dict[str, int], prefix: Prefix, deadline: float | None) -> Tuple[List[Tuple[int, LatticePlacement]] | None, List[Tuple[int, LatticePlacement]], float, PruneStats]:
+    state = SearchState(shadows, counts.copy())
+    state.anytime.deadline = deadline
+    state.stop = __stop
+
+    for shadow_idx, placement in prefix:
+        state.push(shadow_idx, placement)
+
+    state.anytime.offer(state.anytime.total_area - state.remaining_area, state.solution)
+
+    if __backtrack(state):
+        return state.solution(), [], 0, state.stats
+
+    return None, state.anytime.best, state.anytime.best_area, state.stats
@@ -0,0 +1,256 @@
+import logging
+import math
+from typing import List, Tuple
+from model import Shadow
+from solver.exact import HALF_SQRT2, ZERO, Exact, ExactPoint, to_vertex
+
+
+L = logging.getLogger('Solver-Lattice')
+
+
+# Alle Kanten einer Tangram-Figur verlaufen in Vielfachen von 45°. Die Seiten
+# der Steine sind 1, 2, √2 oder 2√2 Einheiten lang, jede Koordinate einer
+# Figur lässt sich daher als a + b·√2/2 mit ganzzahligen a und b schreiben
+# und wird exakt als Exact gespeichert (siehe exact).
+
+# Vorzeichen der x- und y-Komponente für die acht möglichen Kantenrichtungen
+DIRECTION_SIGNS = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+
+# Maximale Abweichung (in Einheiten) einer gemessenen Kantenlänge
+LENGTH_TOLERANCE = 0.12
+
+# Maximale Summe |a| + |b| einer Kantenlänge a + b·√2/2
+MAX_LENGTH_COMPLEXITY = 8
+
+# Entfernung (in Einheiten), in der um einen Eckpunkt herum geprüft wird, ob ein Sektor frei ist
+PROBE_DISTANCE = 0.02
+
+EPSILON = 1e-6
+
+
+Vertex = Tuple[float, float]
+
+
+class Frame:
+    """
+    Abbildung zwischen Bildkoordinaten (Pixel) des Shadow-Bilds und den
+    Koordinaten der Figur. Koordinaten der Figur werden um `rotation` Grad
+    gedreht, mit `unit` skaliert und um `origin` verschoben.
+    """
+    origin: Tuple[float, float]
+    rotation: float
+    unit: float
+
+    def __init__(self, origin: Tuple[float, float], rotation: float, unit: float) -> None:
+        self.origin = origin
+        self.rotation = rotation
+        self.unit = unit
+
+    def to_lattice(self, point: Tuple[float, float]) -> Tuple[float, float]:
+        x = (point[0] - self.origin[0]) / self.unit
+        y = (point[1] - self.origin[1]) / self.unit
+
+        return rotate((x, y), -self.rotation)
+
+    def to_image(self, point: Tuple[float, float]) -> Tuple[float, float]:
+        x, y = rotate(point, self.rotation)
+
+        return (x * self.unit + self.origin[0], y * self.unit + self.origin[1])
+
+    def __str__(self) -> str:
+        return 'Frame(origin=%s, rotation=%f, unit=%f)' % (self.origin, self.rotation, self.unit)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class LatticeShadow:
+    frame: Frame
+    points: List[ExactPoint]
+    vertices: List[Vertex]
+    area: float
+
+    def __init__(self, frame: Frame, points: List[ExactPoint]) -> None:
+        self.frame = frame
+        self.points = points
+        self.vertices = [to_vertex(p) for p in points]
+        self.area = abs(polygon_area(self.vertices))
+
+    def __str__(self) -> str:
+        return 'LatticeShadow(frame=%s, vertices=%s, area=%f)' % (self.frame, self.vertices, self.area)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+
+#=================#
+# SHADOW SNAPPING #
+#=================#
+
+def snap_shadows(shadows: List[Shadow]) -> List[LatticeShadow] | None:
+    points = [[(float(p.x), float(p.y)) for p in shadow.vertices] for shadow in shadows]
+    unit = estimate_unit(shadows, points)
+
+    lattice_shadows: List[LatticeShadow] = []
+
+    for polygon in points:
+        lattice_shadow = snap_polygon(polygon, unit)
+
+        if lattice_shadow is None:
+            return None
+
+        lattice_shadows.append(lattice_shadow)
+
+    return lattice_shadows
+
+
+# Jede Kante wird auf die nächste der acht Richtungen und auf die nächste
+# mögliche Länge a + b·√2/2 gerundet. Die Eckpunkte ergeben sich dann exakt
+# als Summe der Kanten; schließt sich das Polygon dabei nicht, passt die
+# Figur nicht auf das Tangram-Gitter.
+def snap_polygon(polygon: List[Tuple[float, float]], unit: float) -> LatticeShadow | None:
+    frame = Frame(polygon[0], estimate_rotation(polygon), unit)
+
+    x = ZERO
+    y = ZERO
+    points = [(x, y)]
+
+    for i in range(1, len(polygon) + 1):
+        a = frame.to_lattice(polygon[i-1])
+        b = frame.to_lattice(polygon[i % len(polygon)])
+
+        direction = round(math.degrees(math.atan2(b[1] - a[1], b[0] - a[0])) / 45) % 8
+        length = snap_length(math.hypot(b[0] - a[0], b[1] - a[1]), diagonal=(direction % 2 == 1))
+
+        if length is None:
+            L.debug('Kante %d passt nicht auf das Gitter' % i)
+            return None
+
+        dx, dy = edge_vector(direction, length)
+        x = x + dx
+        y = y + dy
+        points.append((x, y))
+
+    # Letzter Eckpunkt muss wieder der Startpunkt sein
+    if points.pop() != points[0]:
+        L.debug('Polygon schließt sich nach dem Runden nicht')
+        return None
+
+    return LatticeShadow(frame, points)
+
+
+def snap_length(length: float, diagonal: bool) -> Exact | None:
+    best = None
+    best_error = LENGTH_TOLERANCE
+
+    for a in range(-MAX_LENGTH_COMPLEXITY, MAX_LENGTH_COMPLEXITY + 1):
+        for b in range(-MAX_LENGTH_COMPLEXITY, MAX_LENGTH_COMPLEXITY + 1):
+            # Diagonale Kanten haben immer Längen der Form a + b·√2
+            if diagonal and b % 2 != 0:
+                continue
+
+            if abs(a) + abs(b) > MAX_LENGTH_COMPLEXITY:
+                continue
+
+            value = a + b * HALF_SQRT2
+            if value <= 0:
+                continue
+
+            # Einfache Längen werden bevorzugt, damit Messfehler nicht zu
+            # unnötig verschachtelten Längen führen
+            error = abs(length - value) + 0.01 * (abs(a) + abs(b))
+
+            if error < best_error:
+                best = Exact(a, b)
+                best_error = error
+
+    return best
+
+
+# Liefert die x- und y-Komponente einer Kante als exakte Koordinaten
+def edge_vector(direction: int, length: Exact) -> Tuple[Exact, Exact]:
+    # Diagonale Kanten haben gerade b, die Komponenten liegen also im Gitter
+    component = length if direction % 2 == 0 else length.times_half_sqrt2()
+
+    sx, sy = DIRECTION_SIGNS[direction]
+
+    return (component * sx, component * sy)
+
+
+# Die Drehung der Figur auf dem Papier ergibt sich aus dem (nach
+# Kantenlänge gewichteten) Mittel der Kantenrichtungen modulo 45°
+def estimate_rotation(polygon: List[Tuple[float, float]]) -> float:
+    sum_x = 0.0
+    sum_y = 0.0
+
+    for i in range(len(polygon)):
+        dx = polygon[i][0] - polygon[i-1][0]
+        dy = polygon[i][1] - polygon[i-1][1]
+
+        length = math.hypot(dx, dy)
+        angle = math.atan2(dy, dx) * 8
+
+        sum_x += length * math.cos(angle)
+        sum_y += length * math.sin(angle)
+
+    return math.degrees(math.atan2(sum_y, sum_x) / 8)
+
+
+# Die Flächen der Shadows sind bereits auf halbe Einheiten gerundet,
+# daraus lässt sich die Kantenlänge einer Einheit bestimmen
+def estimate_unit(shadows: List[Shadow], points: List[List[Tuple[float, float]]]) -> float:
+    pixel_area = sum(abs(polygon_area(polygon)) for polygon in points)
+    snapped_area = sum(shadow.area for shadow in shadows)
+
+    return math.sqrt(pixel_area / snapped_area)
+
+
+
+#==================#
+# GENERAL GEOMETRY #
+#==================#
+
+def rotate(point: Tuple[float, float], angle: float) -> Tuple[float, float]:
+    rads = math.radians(angle)
+    cos = math.cos(rads)
+    sin = math.sin(rads)
+
+    return (point[0] * cos - point[1] * sin, point[0] * sin + point[1] * cos)
+
+
+def polygon_area(vertices) -> float:
+    accumulator = 0.0
+    for i in range(len(vertices)):
+        accumulator += vertices[i-1][0] * vertices[i][1] - vertices[i][0] * vertices[i-1][1]
+
+    return accumulator / 2
+
+
+def point_in_polygon(point: Tuple[float, float], vertices: List[Vertex]) -> bool:
+    px, py = point
+    inside = False
+
+    for i in range(len(vertices)):
+        x1, y1 = vertices[i-1]
+        x2, y2 = vertices[i]
+
+        if (y1 > py) != (y2 > py):
+            x_intersect = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            if px < x_intersect:
+                inside = not inside
+
+    return inside
+
+
+def direction(a: Vertex, b: Vertex) -> int:
+    angle = math.degrees(math.atan2(b[1] - a[1], b[0] - a[0]))
+
+    return round(angle / 45) % 8
+
+
+# Punkt in der Mitte des Sektors k (zwischen Richtung k*45° und (k+1)*45°) nahe am Eckpunkt
+def sector_probe(vertex: Vertex, sector: int) -> Tuple[float, float]:
+    angle = math.radians(sector * 45 + 22.5)
+
+    return (vertex[0] + PROBE_DISTANCE * math.cos(angle), vertex[1] + PROBE_DISTANCE * math.sin(angle))
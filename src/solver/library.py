@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import os
+from typing import Dict, List, Tuple
+import numpy as np
+from solver.cache import CachedPlacement, from_plans, get_key, to_plans
+from solver.exact import Exact, edge_length
+from solver.lattice import LatticeShadow
+from solver.placements import LatticePlacement
+from solver.pruning import polygon_angles
+
+
+L = logging.getLogger('Solver-Library')
+
+
+# Mitgelieferte Sammlung bekannter Figuren mit ihren Lösungen, die vor der
+# Suche (und vor dem Cache) geprüft wird.
+#
+# Jede Figur hat einen billigen Fingerabdruck aus den Merkmalen, die auch
+# cv.shadows für jeden Shadow ausgibt: Anzahl der Ecken, sortierte Innenwinkel,
+# Längenklassen der Kanten (exakt als a + b·√2/2) und Fläche, dazu die Steine.
+# Der Fingerabdruck bestimmt den Bucket einer Hashtabelle, erst bei gleichem
+# Fingerabdruck wird der teurere kanonische Schlüssel (siehe cache.get_key)
+# berechnet und verglichen. Die Lösungen liegen wie im Cache in kanonischen
+# Koordinaten und werden bei einem Treffer auf die Shadows zurückgerechnet.
+#
+# Die Sammlung besteht aus drei NumPy-Dateien, die mit mmap_mode='r' geöffnet
+# werden. Beim Start wird also nichts gelesen, sondern nur die Seiten der
+# Buckets und Figuren, die ein Lookup tatsächlich anfasst:
+#
+# - buckets.npy: Startindex jedes Buckets in figures.npy (Präfixsummen)
+# - figures.npy: Fingerabdruck, Schlüssel, Name und Bereich in placements.npy
+# - placements.npy: Form, Shadow (Reihenfolge des Schlüssels) und Eckpunkte
+LIBRARY_DIR = 'resources/library'
+
+# Untergrenze für die Anzahl der Buckets (immer eine Zweierpotenz)
+MIN_BUCKETS = 64
+
+# Eckpunkte je Lage: (x.a, x.b, y.a, y.b), höchstens vier Eckpunkte pro Stein
+MAX_POINTS = 4
+
+FIGURE_DTYPE = np.dtype([
+    ('fingerprint', '<u8'),
+    ('key', 'S40'),
+    ('name', 'U32'),
+    ('shadows', '<i2'),
+    ('start', '<i4'),
+    ('count', '<i4'),
+])
+
+PLACEMENT_DTYPE = np.dtype([
+    ('shadow', '<i2'),
+    ('shape', 'U2'),
+    ('size', '<i2'),
+    ('points', '<i4', (MAX_POINTS, 4)),
+])
+
+# Vollständiger Satz Steine, mit dem die Figuren der Bibliothek gelöst werden
+TANGRAM = {'LT': 2, 'MT': 1, 'ST': 2, 'SQ': 1, 'PA': 1}
+
+# Eintrag vor dem Speichern: (Name, Schlüssel, Fingerabdruck, Pläne je Shadow)
+Figure = Tuple[str, str, int, List[List[CachedPlacement]]]
+
+
+class FigureLibrary:
+    path: str
+    buckets: np.ndarray
+    figures: np.ndarray
+    placements: np.ndarray
+
+    def __init__(self, path: str = LIBRARY_DIR) -> None:
+        self.path = path
+        self.buckets = np.zeros(1, dtype='<i4')
+        self.figures = np.zeros(0, dtype=FIGURE_DTYPE)
+        self.placements = np.zeros(0, dtype=PLACEMENT_DTYPE)
+
+        if not os.path.exists(os.path.join(path, 'figures.npy')):
+            return
+
+        try:
+            self.buckets = np.load(os.path.join(path, 'buckets.npy'), mmap_mode='r')
+            self.figures = np.load(os.path.join(path, 'figures.npy'), mmap_mode='r')
+            self.placements = np.load(os.path.join(path, 'placements.npy'), mmap_mode='r')
+        except (OSError, ValueError) as e:
+            L.warning('Bibliothek %s konnte nicht gelesen werden: %s' % (path, e))
+            self.buckets = np.zeros(1, dtype='<i4')
+            self.figures = np.zeros(0, dtype=FIGURE_DTYPE)
+            self.placements = np.zeros(0, dtype=PLACEMENT_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.figures)
+
+    def lookup(self, shadows: List[LatticeShadow], counts: Dict[str, int]) -> Tuple[str, List[Tuple[int, LatticePlacement]]] | None:
+        if len(self.figures) == 0:
+            return None
+
+        fp = fingerprint(shadows, counts)
+        bucket = fp & (len(self.buckets) - 2)
+        start, end = int(self.buckets[bucket]), int(self.buckets[bucket + 1])
+
+        candidates = [i for i in range(start, end) if int(self.figures[i]['fingerprint']) == fp]
+        if len(candidates) == 0:
+            return None
+
+        key, canonicals, order = get_key(shadows, counts)
+
+        for i in candidates:
+            figure = self.figures[i]
+
+            if figure['key'].decode() != key:
+                continue
+
+            solution = from_plans(canonicals, order, self.plans(i))
+
+            if solution is not None:
+                return str(figure['name']), solution
+
+        return None
+
+    # Pläne der Figur `idx` in kanonischen Koordinaten (wie im Cache)
+    def plans(self, idx: int) -> List[List[CachedPlacement]]:
+        figure = self.figures[idx]
+        start, count = int(figure['start']), int(figure['count'])
+        plans: List[List[CachedPlacement]] = [[] for _ in range(int(figure['shadows']))]
+
+        for row in self.placements[start:start + count]:
+            points = [(Exact(int(p[0]), int(p[1])), Exact(int(p[2]), int(p[3]))) for p in row['points'][:row['size']]]
+            plans[int(row['shadow'])].append((str(row['shape']), points))
+
+        return plans
+
+    def __str__(self) -> str:
+        return 'FigureLibrary(path=%s, figures=%d)' % (self.path, len(self.figures))
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class LibraryBuilder:
+    """
+    Sammelt gelöste Figuren und schreibt sie als Bibliothek. Mit `library`
+    werden die Figuren einer bestehenden Bibliothek übernommen.
+    """
+    figures: Dict[str, Figure]
+
+    def __init__(self, library: FigureLibrary | None = None) -> None:
+        self.figures = {}
+
+        if library is None:
+            return
+
+        for i, figure in enumerate(library.figures):
+            key = figure['key'].decode()
+            self.figures[key] = (str(figure['name']), key, int(figure['fingerprint']), library.plans(i))
+
+    def add(self, name: str, shadows: List[LatticeShadow], counts: Dict[str, int], solution: List[Tuple[int, LatticePlacement]]) -> bool:
+        key, canonicals, order = get_key(shadows, counts)
+        plans = to_plans(canonicals, order, solution)
+
+        if plans is None:
+            L.warning('Lösung von %s liegt in kanonischer Lage nicht im Gitter' % name)
+            return False
+
+        if key in self.figures:
+            L.info('%s ist schon als %s in der Bibliothek' % (name, self.figures[key][0]))
+            return False
+
+        self.figures[key] = (name, key, fingerprint(shadows, counts), plans)
+        return True
+
+    def save(self, path: str = LIBRARY_DIR) -> None:
+        n_buckets = MIN_BUCKETS
+        while n_buckets < len(self.figures):
+            n_buckets *= 2
+
+        entries = sorted(self.figures.values(), key=lambda f: (f[2] & (n_buckets - 1), f[2], f[1]))
+        n_placements = sum(len(plan) for f in entries for plan in f[3])
+
+        figures = np.zeros(len(entries), dtype=FIGURE_DTYPE)
+        placements = np.zeros(n_placements, dtype=PLACEMENT_DTYPE)
+        buckets = np.zeros(n_buckets + 1, dtype='<i4')
+
+        row = 0
+        for i, (name, key, fp, plans) in enumerate(entries):
+            figures[i] = (fp, key.encode(), name, len(plans), row, sum(len(plan) for plan in plans))
+            buckets[(fp & (n_buckets - 1)) + 1] += 1
+
+            for shadow_idx, plan in enumerate(plans):
+                for shape, points in plan:
+                    placements['shadow'][row] = shadow_idx
+                    placements['shape'][row] = shape
+                    placements['size'][row] = len(points)
+                    placements['points'][row, :len(points)] = [(x.a, x.b, y.a, y.b) for x, y in points]
+                    row += 1
+
+        np.cumsum(buckets, out=buckets)
+
+        os.makedirs(path, exist_ok=True)
+        for file, array in (('buckets', buckets), ('figures', figures), ('placements', placements)):
+            tmp_path = os.path.join(path, file + '.tmp.npy')
+            np.save(tmp_path, array)
+            os.replace(tmp_path, os.path.join(path, file + '.npy'))
+
+        L.info('%d Figuren in %s gespeichert' % (len(entries), path))
+
+    def __str__(self) -> str:
+        return 'LibraryBuilder(figures=%d)' % len(self.figures)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+
+#=============#
+# FINGERPRINT #
+#=============#
+
+# Fingerabdruck als 64-Bit-Zahl, unabhängig von Lage, Drehung, Spiegelung und
+# Reihenfolge der Shadows
+def fingerprint(shadows: List[LatticeShadow], counts: Dict[str, int]) -> int:
+    features = sorted(shadow_features(shadow) for shadow in shadows)
+    pieces = ','.join('%s=%d' % (name, counts[name]) for name in sorted(counts) if counts[name] > 0)
+
+    text = '|'.join('%d;%s;%s;%d' % (n, angles, lengths, area) for n, angles, lengths, area in features) + '#' + pieces
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+
+    return int.from_bytes(digest, 'little')
+
+
+# (Anzahl Ecken, sortierte Innenwinkel, sortierte Kantenlängen, Fläche in halben Einheiten)
+def shadow_features(shadow: LatticeShadow) -> Tuple[int, Tuple[int, ...], Tuple[Tuple[int, int], ...], int]:
+    points = shadow.points
+    lengths = sorted((length.a, length.b) for length in (edge_length(points[i-1], points[i]) for i in range(len(points))))
+
+    return (len(points), tuple(sorted(polygon_angles(shadow.vertices))), tuple(lengths), round(shadow.area * 2))
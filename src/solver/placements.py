@@ -0,0 +1,160 @@
+import logging
+from typing import Dict, List, Tuple
+from model import SHAPES, Shape
+from solver.exact import ExactPoint, from_ints, rotate_exact, to_vertex, translate
+from solver.lattice import EPSILON, Vertex, direction, point_in_polygon, polygon_area, LatticeShadow
+
+
+L = logging.getLogger('Solver-Placements')
+
+
+# Jeder Stein ist konvex und hat nur Kanten in den acht Gitterrichtungen.
+# Er ist damit genau der Schnitt seiner Ausdehnung entlang der vier Achsen
+# x, y, x+y und x-y. Mit diesen acht Werten lassen sich Überlappungen und
+# Punkt-in-Stein-Tests mit wenigen Vergleichen prüfen.
+Bounds = Tuple[float, float, float, float, float, float, float, float]
+
+
+class Orientation:
+    shape: Shape
+    rotation: int
+    points: List[ExactPoint]
+    vertices: List[Vertex]
+
+    def __init__(self, shape: Shape, rotation: int, points: List[ExactPoint]) -> None:
+        self.shape = shape
+        self.rotation = rotation
+        self.points = points
+        self.vertices = [to_vertex(p) for p in points]
+
+    def __str__(self) -> str:
+        return 'Orientation(shape=%s, rotation=%d)' % (self.shape.name, self.rotation)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class LatticePlacement:
+    shape: Shape
+    rotation: int
+    # Exakte Eckpunkte, die Gleitkomma-Eckpunkte und Ausdehnungen werden daraus abgeleitet
+    points: List[ExactPoint]
+    vertices: List[Vertex]
+    bounds: Bounds
+    # Belegte Zellen im Gitter des Shadows (siehe bitset), None außerhalb des Gitters
+    mask: int | None
+
+    def __init__(self, shape: Shape, rotation: int, points: List[ExactPoint], mask: int | None = None) -> None:
+        self.shape = shape
+        self.rotation = rotation
+        self.points = points
+        self.vertices = [to_vertex(p) for p in points]
+        self.bounds = get_bounds(self.vertices)
+        self.mask = mask
+
+    # Zwei Lagen sind gleich, wenn dieselbe Form auf denselben Eckpunkten liegt
+    def key(self) -> Tuple[str, frozenset]:
+        return (self.shape.name, frozenset(self.points))
+
+    def __str__(self) -> str:
+        return 'LatticePlacement(shape=%s, rotation=%d, vertices=%s)' % (self.shape.name, self.rotation, self.vertices)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+def get_orientations(shape: Shape) -> List[Orientation]:
+    orientations: List[Orientation] = []
+
+    points = [from_ints(x, y) for x, y in shape.vertices]
+
+    # Eckpunkte in positiver Drehrichtung sortieren
+    if polygon_area([to_vertex(p) for p in points]) < 0:
+        points = points[::-1]
+
+    # Die Eckpunkte der Steine sind ganzzahlig, jede Drehung um 45° liegt im
+    # Gitter. Drehungen, die den Stein auf sich selbst abbilden (Quadrat,
+    # Parallelogramm), würden dieselben Lagen mehrfach liefern und werden
+    # ausgelassen (siehe Shape.orientations).
+    for rotation in shape.orientations:
+        orientations.append(Orientation(shape, rotation, [rotate_exact(p, rotation) for p in points]))
+
+    return orientations
+
+
+# Liefert für jede Ecke eines Polygons mit positiver Drehrichtung den Index
+# des Eckpunkts, die Richtung der ausgehenden Kante (0-7) und den Innenwinkel
+def get_corners(vertices: List[Vertex]) -> List[Tuple[int, int, int]]:
+    corners: List[Tuple[int, int, int]] = []
+
+    for i in range(len(vertices)):
+        out = direction(vertices[i], vertices[(i+1) % len(vertices)])
+        back = direction(vertices[i], vertices[i-1])
+
+        corners.append((i, out, ((back - out) % 8) * 45))
+
+    return corners
+
+
+# Index aller Lagen der Steine, sortiert nach der Ecke, mit der sie an einen
+# Eckpunkt angelegt werden: (Richtung der ausgehenden Kante, Innenwinkel)
+# -> [(Orientierung, Index des Eckpunkts)]
+CORNER_INDEX: Dict[Tuple[int, int], List[Tuple[Orientation, int]]] = {}
+
+for shape in SHAPES.values():
+    for orientation in get_orientations(shape):
+        for vertex_idx, out, angle in get_corners(orientation.vertices):
+            CORNER_INDEX.setdefault((out, angle), []).append((orientation, vertex_idx))
+
+
+def place(orientation: Orientation, vertex_idx: int, anchor: ExactPoint) -> LatticePlacement:
+    ox, oy = orientation.points[vertex_idx]
+    points = translate(orientation.points, anchor[0] - ox, anchor[1] - oy)
+
+    return LatticePlacement(orientation.shape, orientation.rotation, points)
+
+
+
+#=================#
+# BOUNDS GEOMETRY #
+#=================#
+
+def get_bounds(vertices: List[Vertex]) -> Bounds:
+    xs = [v[0] for v in vertices]
+    ys = [v[1] for v in vertices]
+    sums = [v[0] + v[1] for v in vertices]
+    diffs = [v[0] - v[1] for v in vertices]
+
+    return (min(xs), max(xs), min(ys), max(ys), min(sums), max(sums), min(diffs), max(diffs))
+
+
+# Zwei Steine überlappen, wenn sich ihre Ausdehnungen auf allen vier Achsen
+# echt überschneiden (Trennungssatz für konvexe Polygone)
+def overlaps(a: Bounds, b: Bounds) -> bool:
+    for i in range(0, 8, 2):
+        if a[i+1] <= b[i] + EPSILON or b[i+1] <= a[i] + EPSILON:
+            return False
+
+    return True
+
+
+def contains_point(bounds: Bounds, point: Tuple[float, float]) -> bool:
+    x, y = point
+
+    return bounds[0] < x < bounds[1] and bounds[2] < y < bounds[3] and bounds[4] < x + y < bounds[5] and bounds[6] < x - y < bounds[7]
+
+
+# Ein Stein liegt in einem Shadow, wenn sein Schwerpunkt im Shadow liegt und
+# keine Kante des Shadows durch das Innere des Steins verläuft
+def inside_shadow(placement: LatticePlacement, shadow: LatticeShadow) -> bool:
+    x = sum(v[0] for v in placement.vertices) / len(placement.vertices)
+    y = sum(v[1] for v in placement.vertices) / len(placement.vertices)
+
+    if not point_in_polygon((x, y), shadow.vertices):
+        return False
+
+    for i in range(len(shadow.vertices)):
+        if overlaps(placement.bounds, get_bounds([shadow.vertices[i-1], shadow.vertices[i]])):
+            return False
+
+    return True
@@ -0,0 +1,238 @@
+import functools
+import logging
+import math
+from typing import Dict, List, Tuple
+from model import SHAPES, Shape
+from solver.bitset import STRIDE
+from solver.exact import ExactPoint, edge_length, from_ints
+from solver.lattice import LatticeShadow, direction, polygon_area
+
+
+L = logging.getLogger('Solver-Pruning')
+
+
+# Notwendige Bedingungen, die eine Figur bzw. ein Zwischenstand der Suche
+# erfüllen muss, damit er sich mit den (verbleibenden) Steinen füllen lässt:
+#
+# - Fläche: Die Fläche der Shadows entspricht der Fläche der Steine
+# - Umfang: Jedes Stück des Umrisses wird von Kanten der Steine abgedeckt,
+#   der Umfang (in Einheiten von 1 und √2) ist also höchstens so groß wie der
+#   aller Steine zusammen
+# - Winkel: Jede konvexe Ecke (< 180°) wird von Ecken der Steine ausgefüllt,
+#   deren Winkel sich genau zum Winkel der Ecke summieren
+# - Regionen: Jede zusammenhängende freie Fläche wird von einer Teilmenge der
+#   verbleibenden Steine genau ausgefüllt
+#
+# Flächen werden in halben Einheiten gerechnet (Fläche des kleinen Dreiecks).
+
+
+class PruneStats:
+    area: int
+    perimeter: int
+    corners: int
+    dead_corners: int
+    regions: int
+
+    def __init__(self) -> None:
+        self.area = 0
+        self.perimeter = 0
+        self.corners = 0
+        self.dead_corners = 0
+        self.regions = 0
+
+    def add(self, other: 'PruneStats') -> None:
+        self.area += other.area
+        self.perimeter += other.perimeter
+        self.corners += other.corners
+        self.dead_corners += other.dead_corners
+        self.regions += other.regions
+
+    def total(self) -> int:
+        return self.area + self.perimeter + self.corners + self.dead_corners + self.regions
+
+    def __str__(self) -> str:
+        return 'PruneStats(area=%d, perimeter=%d, corners=%d, dead_corners=%d, regions=%d)' % (self.area, self.perimeter, self.corners, self.dead_corners, self.regions)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+
+#=================#
+# FIGURE CHECKS #
+#=================#
+
+# Prüft die Figur vor der Suche. Liefert den Grund, falls sie sich mit den
+# Steinen sicher nicht legen lässt, sonst None.
+def check_figure(shadows: List[LatticeShadow], counts: Dict[str, int], stats: PruneStats) -> str | None:
+    shadow_area = sum(shadow.area for shadow in shadows)
+    block_area = sum(SHAPES[name].area * count for name, count in counts.items())
+
+    if abs(shadow_area - block_area) > 0.01:
+        stats.area += 1
+        return 'Fläche der Shadows (%.1f) passt nicht zur Fläche der Steine (%.1f)' % (shadow_area, block_area)
+
+    shadow_ones, shadow_roots = 0, 0
+    for shadow in shadows:
+        ones, roots = polygon_perimeter(shadow.points)
+        shadow_ones += ones
+        shadow_roots += roots
+
+    block_ones, block_roots = 0, 0
+    for name, count in counts.items():
+        ones, roots = shape_perimeter(SHAPES[name])
+        block_ones += ones * count
+        block_roots += roots * count
+
+    if shadow_ones + shadow_roots * math.sqrt(2) > block_ones + block_roots * math.sqrt(2) + 0.01:
+        stats.perimeter += 1
+        return 'Umfang der Shadows (%g + %g·√2) ist größer als der der Steine (%g + %g·√2)' % (shadow_ones, shadow_roots, block_ones, block_roots)
+
+    angles = [angle for shadow in shadows for angle in polygon_angles(shadow.vertices) if angle < 180]
+
+    if not corners_fillable(angles, counts):
+        stats.corners += 1
+        return 'Die Ecken der Shadows lassen sich nicht mit den Ecken der Steine füllen'
+
+    return None
+
+
+# Umfang als (Anteil in Einheiten, Anteil in √2), aus den exakten Kantenlängen
+def polygon_perimeter(points: List[ExactPoint]) -> Tuple[float, float]:
+    ones, roots = 0.0, 0.0
+
+    for i in range(len(points)):
+        length = edge_length(points[i-1], points[i])
+        ones += length.a
+        roots += length.b / 2
+
+    return ones, roots
+
+
+def shape_perimeter(shape: Shape) -> Tuple[float, float]:
+    return polygon_perimeter([from_ints(x, y) for x, y in shape.vertices])
+
+
+def polygon_angles(vertices: List[Tuple[float, float]]) -> List[int]:
+    # Eckpunkte in positiver Drehrichtung sortieren
+    if polygon_area(vertices) < 0:
+        vertices = vertices[::-1]
+
+    angles: List[int] = []
+
+    for i in range(len(vertices)):
+        out = direction(vertices[i], vertices[(i+1) % len(vertices)])
+        back = direction(vertices[i], vertices[i-1])
+        angles.append(((back - out) % 8) * 45)
+
+    return angles
+
+
+
+#==============#
+# SEARCH CHECKS #
+#==============#
+
+# Jede konvexe Ecke wird von Ecken der Steine ausgefüllt: eine 45°-Ecke von
+# einer 45°-Ecke, eine 90°-Ecke von einer 90°- oder zwei 45°-Ecken, eine
+# 135°-Ecke von einer 135°-Ecke, 90° + 45° oder dreimal 45°.
+def corners_fillable(angles: List[int], counts: Dict[str, int]) -> bool:
+    supply = {45: 0, 90: 0, 135: 0}
+    for name, count in counts.items():
+        for angle in SHAPES[name].interior_angles:
+            supply[angle] += count
+
+    demand = {45: 0, 90: 0, 135: 0}
+    for angle in angles:
+        demand[angle] += 1
+
+    # 135°-Ecken ohne passende Ecke brauchen zusätzlich eine 90°- und eine 45°-Ecke
+    # (oder stattdessen zwei weitere 45°-Ecken)
+    open_135 = max(0, demand[135] - supply[135])
+    missing_90 = max(0, demand[90] + open_135 - supply[90])
+
+    return demand[45] + open_135 + 2 * missing_90 <= supply[45]
+
+
+# Prüft, ob sich die freien Regionen (Flächen in halben Einheiten) genau auf
+# die verbleibenden Steine aufteilen lassen
+def regions_fillable(regions: List[int], counts: Dict[str, int]) -> bool:
+    if any(region < 0 for region in regions):
+        return False
+
+    pieces = tuple((round(SHAPES[name].area * 2), count) for name, count in sorted(counts.items()) if count > 0)
+
+    return __partition(tuple(sorted(regions, reverse=True)), pieces)
+
+
+@functools.lru_cache(maxsize=4096)
+def __partition(regions: Tuple[int, ...], pieces: Tuple[Tuple[int, int], ...]) -> bool:
+    if len(regions) == 0:
+        return True
+
+    # Die erste Region mit einer Teilmenge der Steine füllen, den Rest rekursiv
+    for used in __subsets(pieces, regions[0]):
+        rest = tuple((size, count - n) for (size, count), n in zip(pieces, used))
+
+        if __partition(regions[1:], rest):
+            return True
+
+    return False
+
+
+def __subsets(pieces: Tuple[Tuple[int, int], ...], area: int) -> List[Tuple[int, ...]]:
+    if len(pieces) == 0:
+        return [()] if area == 0 else []
+
+    (size, count), rest = pieces[0], pieces[1:]
+    subsets: List[Tuple[int, ...]] = []
+
+    for n in range(min(count, area // size) + 1):
+        subsets.extend((n,) + s for s in __subsets(rest, area - n * size))
+
+    return subsets
+
+
+# Zerlegt die freien Zellen eines Gitters in zusammenhängende Regionen und
+# liefert ihre Flächen in halben Einheiten (zwei Zellen). Regionen mit einer
+# ungeraden Anzahl Zellen lassen sich nie füllen und werden als -1 gemeldet.
+def free_regions(free: int) -> List[int]:
+    masks = __quarter_masks(free.bit_length())
+    regions: List[int] = []
+
+    while free:
+        region = free & -free
+
+        while True:
+            grown = (region | __neighbours(region, masks)) & free
+            if grown == region:
+                break
+            region = grown
+
+        free &= ~region
+        cells = region.bit_count()
+        regions.append(cells // 2 if cells % 2 == 0 else -1)
+
+    return regions
+
+
+# Bitmasken aller Zellen mit q = 0, 1, 2, 3
+@functools.lru_cache(maxsize=64)
+def __quarter_masks(bits: int) -> Tuple[int, int, int, int]:
+    pattern = int('0001' * ((bits + 3) // 4 + 1), 2)
+
+    return (pattern, pattern << 1, pattern << 2, pattern << 3)
+
+
+# Alle Zellen, die eine Kante mit einer Zelle der Maske teilen
+def __neighbours(mask: int, masks: Tuple[int, int, int, int]) -> int:
+    q0, q1, q2, q3 = (mask & m for m in masks)
+    row = 4 * STRIDE
+
+    return (
+        # Nachbarn im selben Quadrat
+        (q0 << 1) | (q1 << 1) | (q2 << 1) | (q3 >> 3) |
+        (q1 >> 1) | (q2 >> 1) | (q3 >> 1) | (q0 << 3) |
+        # Nachbarn in den angrenzenden Quadraten
+        (q0 >> (row - 2)) | (q2 << (row - 2)) | (q1 << 6) | (q3 >> 6)
+    )
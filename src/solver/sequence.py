@@ -0,0 +1,114 @@
+import logging
+import math
+from typing import List, Tuple
+
+
+L = logging.getLogger('Solver-Sequence')
+
+
+# Reihenfolge, in der die Steine gegriffen und abgelegt werden. Der Weg vom
+# Greifen zum Ablegen desselben Steins ist fest, von der Reihenfolge hängen nur
+# die Wege vom Ablegen eines Steins zum Greifen des nächsten ab (und der Weg von
+# der Startposition zum ersten Stein). Gesucht ist die Reihenfolge mit dem
+# kürzesten Gesamtweg, ein offenes Rundreiseproblem, das für die sieben Steine
+# exakt mit dynamischer Programmierung über Teilmengen gelöst wird (Held-Karp).
+#
+# Größere Steine werden immer vor kleineren gelegt: Sie brauchen den meisten
+# Platz, und der Greifer soll beim Ablegen keine bereits liegenden kleinen
+# Steine verschieben. Nur Steine gleicher Fläche werden also umsortiert.
+
+# Bis zu dieser Anzahl Steine exakt, darüber Nächster-Nachbar
+MAX_EXACT = 12
+
+# Flächen, die sich um weniger unterscheiden, gelten als gleich groß
+AREA_TOLERANCE = 0.01
+
+Position = Tuple[float, float]
+
+
+# Liefert die Indizes der Steine in der Reihenfolge, in der sie bewegt werden
+def plan_sequence(picks: List[Position], places: List[Position], areas: List[float], start: Position) -> List[int]:
+    n = len(picks)
+
+    if n == 0:
+        return []
+
+    # Vorgänger jedes Steins als Bitmaske: alle größeren Steine
+    before = [sum(1 << i for i in range(n) if areas[i] > areas[j] + AREA_TOLERANCE) for j in range(n)]
+
+    if n > MAX_EXACT:
+        order = __nearest_neighbour(picks, places, before, start)
+    else:
+        order = __held_karp(picks, places, before, start)
+
+    L.debug('Weg zwischen den Steinen: %.3f m (in erkannter Reihenfolge %.3f m)' % (travel(order, picks, places, start), travel(list(range(n)), picks, places, start)))
+
+    return order
+
+
+# Summe der Wege von der Startposition zum ersten Stein und vom Ablegen jedes
+# Steins zum Greifen des nächsten
+def travel(order: List[int], picks: List[Position], places: List[Position], start: Position) -> float:
+    total = 0.0
+    position = start
+
+    for i in order:
+        total += math.dist(position, picks[i])
+        position = places[i]
+
+    return total
+
+
+def __held_karp(picks: List[Position], places: List[Position], before: List[int], start: Position) -> List[int]:
+    n = len(picks)
+    full = (1 << n) - 1
+
+    # cost[mask][j]: kürzester Weg, der genau die Steine in mask bewegt und mit j endet
+    cost = [[math.inf] * n for _ in range(full + 1)]
+    previous = [[-1] * n for _ in range(full + 1)]
+
+    for j in range(n):
+        if before[j] == 0:
+            cost[1 << j][j] = math.dist(start, picks[j])
+
+    for mask in range(1, full + 1):
+        for last in range(n):
+            if cost[mask][last] == math.inf:
+                continue
+
+            for j in range(n):
+                if mask & (1 << j) or before[j] & ~mask:
+                    continue
+
+                new_cost = cost[mask][last] + math.dist(places[last], picks[j])
+                new_mask = mask | (1 << j)
+
+                if new_cost < cost[new_mask][j]:
+                    cost[new_mask][j] = new_cost
+                    previous[new_mask][j] = last
+
+    last = min(range(n), key=lambda j: cost[full][j])
+    order: List[int] = []
+    mask = full
+
+    while last != -1:
+        order.append(last)
+        last, mask = previous[mask][last], mask & ~(1 << last)
+
+    return order[::-1]
+
+
+def __nearest_neighbour(picks: List[Position], places: List[Position], before: List[int], start: Position) -> List[int]:
+    order: List[int] = []
+    mask = 0
+    position = start
+
+    while len(order) < len(picks):
+        candidates = [j for j in range(len(picks)) if not mask & (1 << j) and not before[j] & ~mask]
+        j = min(candidates, key=lambda j: math.dist(position, picks[j]))
+
+        order.append(j)
+        mask |= 1 << j
+        position = places[j]
+
+    return order
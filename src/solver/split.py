@@ -0,0 +1,223 @@
+import logging
+import os
+from concurrent.futures import Future, as_completed
+from multiprocessing.synchronize import Event
+from typing import Dict, List, Set, Tuple
+from model import SHAPES
+from solver.anytime import Anytime
+from solver.cache import get_canonical
+from solver.lattice import LatticeShadow
+from solver.placements import LatticePlacement
+from solver.pruning import PruneStats, check_figure
+from solver import dlx, geometric
+
+
+L = logging.getLogger('Solver-Split')
+
+
+# Besteht eine Figur aus mehreren Shadows (getrennte Teile oder an Eckpunkten
+# geteilte Figuren, siehe cv.shadows), kann kein Stein in zwei Shadows
+# liegen. Die Steine werden dann zuerst nach Fläche auf die Shadows verteilt,
+# jede Verteilung wird mit check_figure geprüft. Für die übrigen Verteilungen
+# wird jeder Shadow als eigenes Teilproblem gelöst, mehrere Teilprobleme
+# gleichzeitig im Pool der parallelen Suche (siehe geometric).
+#
+# Ergebnisse der Teilprobleme werden über alle Verteilungen hinweg gemerkt,
+# ein Shadow mit denselben Steinen wird also nur einmal gesucht. Hat ein
+# Teilproblem keine Lösung, gilt das auch für alle deckungsgleichen Shadows
+# (gleiche kanonische Form, siehe cache) mit denselben Steinen.
+
+# Verteilung: Steine (Form -> Anzahl) für jeden Shadow
+Assignment = List[Dict[str, int]]
+
+# Teilproblem: (Shadow, Steine als sortiertes Tupel)
+Subproblem = Tuple[int, Tuple[Tuple[str, int], ...]]
+
+# Deckungsgleiche Teilprobleme: (Signatur, gespiegelt, Steine als sortiertes Tupel)
+Congruent = Tuple[str, bool, Tuple[Tuple[str, int], ...]]
+
+
+class SubResult:
+    solution: List[LatticePlacement] | None
+    best: List[LatticePlacement]
+    best_area: float
+    # True, wenn der Suchraum vollständig durchsucht wurde (keine Lösung ist dann endgültig)
+    exhausted: bool
+    stats: PruneStats
+
+    def __init__(self, solution: List[LatticePlacement] | None, best: List[LatticePlacement], best_area: float, exhausted: bool, stats: PruneStats) -> None:
+        self.solution = solution
+        self.best = best
+        self.best_area = best_area
+        self.exhausted = exhausted
+        self.stats = stats
+
+    def __str__(self) -> str:
+        return 'SubResult(solved=%s, best_area=%f, exhausted=%s)' % (self.solution is not None, self.best_area, self.exhausted)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+def search(shadows: List[LatticeShadow], counts: Dict[str, int], anytime: Anytime, stats: PruneStats, method: str = 'geometric', workers: int | None = None) -> List[Tuple[int, LatticePlacement]] | None:
+    workers = workers or os.cpu_count() or 1
+
+    assignments = get_assignments(shadows, counts, stats)
+    L.debug('%d Shadows, %d mögliche Verteilungen der Steine' % (len(shadows), len(assignments)))
+
+    results: Dict[Subproblem, SubResult] = {}
+    unsolvable: Set[Congruent] = set()
+    canonicals = [get_canonical(shadow) for shadow in shadows]
+
+    for assignment in assignments:
+        if anytime.expired():
+            break
+
+        subproblems = [to_subproblem(shadow_idx, pieces) for shadow_idx, pieces in enumerate(assignment)]
+        congruent = [(canonicals[idx].signature, canonicals[idx].mirrored, pieces) for idx, pieces in subproblems]
+
+        if any(c in unsolvable for c in congruent):
+            continue
+
+        __solve_all(shadows, [s for s in subproblems if s not in results], results, method, workers, anytime.deadline, stats)
+
+        for subproblem, c in zip(subproblems, congruent):
+            result = results.get(subproblem)
+
+            if result is not None and result.solution is None and result.exhausted:
+                unsolvable.add(c)
+
+        solved = [results.get(s) for s in subproblems]
+
+        if all(r is not None and r.solution is not None for r in solved):
+            return [(shadow_idx, p) for shadow_idx, r in enumerate(solved) for p in r.solution]
+
+        # Teilbelegung: gelöste Teilprobleme ganz, die anderen mit ihrer besten Teilbelegung
+        partial = [(shadow_idx, p) for shadow_idx, r in enumerate(solved) if r is not None for p in (r.solution or r.best)]
+        anytime.offer(sum(p.shape.area for _, p in partial), lambda: partial)
+
+    return None
+
+
+# Alle Verteilungen der Steine, bei denen jeder Shadow genau die Fläche
+# seiner Steine hat und die Prüfung der Figur besteht
+def get_assignments(shadows: List[LatticeShadow], counts: Dict[str, int], stats: PruneStats) -> List[Assignment]:
+    names = sorted(name for name, count in counts.items() if count > 0)
+    assignments: List[Assignment] = []
+
+    __assign(shadows, names, {name: counts[name] for name in names}, [], assignments, stats)
+
+    return assignments
+
+
+def to_subproblem(shadow_idx: int, pieces: Dict[str, int]) -> Subproblem:
+    return (shadow_idx, tuple(sorted((name, count) for name, count in pieces.items() if count > 0)))
+
+
+def __assign(shadows: List[LatticeShadow], names: List[str], remaining: Dict[str, int], assignment: Assignment, assignments: List[Assignment], stats: PruneStats) -> None:
+    shadow_idx = len(assignment)
+
+    if shadow_idx == len(shadows):
+        if sum(remaining.values()) == 0:
+            assignments.append(assignment)
+        return
+
+    area = round(shadows[shadow_idx].area * 2)
+
+    for pieces in __subsets(names, remaining, area):
+        if check_figure([shadows[shadow_idx]], pieces, stats) is not None:
+            continue
+
+        rest = {name: remaining[name] - pieces.get(name, 0) for name in names}
+        __assign(shadows, names, rest, assignment + [pieces], assignments, stats)
+
+
+# Alle Auswahlen aus den Steinen mit genau der Fläche `area` (in halben Einheiten)
+def __subsets(names: List[str], remaining: Dict[str, int], area: int) -> List[Dict[str, int]]:
+    if len(names) == 0:
+        return [{}] if area == 0 else []
+
+    name, rest = names[0], names[1:]
+    size = round(SHAPES[name].area * 2)
+    subsets: List[Dict[str, int]] = []
+
+    for n in range(min(remaining[name], area // size) + 1):
+        for subset in __subsets(rest, remaining, area - n * size):
+            if n > 0:
+                subset = {name: n, **subset}
+            subsets.append(subset)
+
+    return subsets
+
+
+
+#=============#
+# SUBPROBLEMS #
+#=============#
+
+# Löst die Teilprobleme gleichzeitig im Pool, ein einzelnes Teilproblem (oder
+# ohne mehrere Prozesse) direkt in diesem Prozess. Sobald ein Teilproblem
+# sicher keine Lösung hat, ist die Verteilung verloren: die übrigen werden nicht
+# mehr gestartet und die laufenden über das Event des Pools abgebrochen, damit
+# sie den Pool nicht bis zur Frist belegen.
+def __solve_all(shadows: List[LatticeShadow], subproblems: List[Subproblem], results: Dict[Subproblem, SubResult], method: str, workers: int, deadline: float | None, stats: PruneStats) -> None:
+    if workers == 1 or len(subproblems) < 2:
+        for subproblem in subproblems:
+            results[subproblem] = solve_subproblem(shadows[subproblem[0]], dict(subproblem[1]), method, deadline)
+            stats.add(results[subproblem].stats)
+
+            if results[subproblem].solution is None:
+                return
+        return
+
+    pool, stop = geometric.get_pool(workers)
+    stop.clear()
+
+    futures: Dict[Future, Subproblem] = {
+        pool.submit(__solve_in_pool, shadows[s[0]], dict(s[1]), method, deadline): s for s in subproblems
+    }
+    stopped = False
+
+    for future in as_completed(futures):
+        if future.cancelled():
+            continue
+
+        result = future.result()
+        stats.add(result.stats)
+
+        # Abgebrochen: ohne Aussage, das Teilproblem wird bei Bedarf neu gesucht
+        if stopped and result.solution is None and not result.exhausted:
+            continue
+
+        # Formen kommen als Kopien aus den Prozessen zurück
+        for placement in (result.solution or []) + result.best:
+            placement.shape = SHAPES[placement.shape.name]
+
+        results[futures[future]] = result
+
+        if result.solution is None and result.exhausted and not stopped:
+            stopped = True
+            stop.set()
+
+            for other in futures:
+                other.cancel()
+
+
+def __solve_in_pool(shadow: LatticeShadow, pieces: Dict[str, int], method: str, deadline: float | None) -> SubResult:
+    return solve_subproblem(shadow, pieces, method, deadline, geometric.get_worker_stop())
+
+
+def solve_subproblem(shadow: LatticeShadow, pieces: Dict[str, int], method: str, deadline: float | None, stop: Event | None = None) -> SubResult:
+    anytime = Anytime(deadline, None, shadow.area)
+    anytime.stop = stop
+    stats = PruneStats()
+
+    if method == 'dlx':
+        solution = dlx.search([shadow], pieces, anytime)
+    else:
+        solution = geometric.search([shadow], pieces, anytime, stats)
+
+    if solution is not None:
+        return SubResult([p for _, p in solution], [], 0, True, stats)
+
+    return SubResult(None, [p for _, p in anytime.best], anytime.best_area, not anytime.stopped, stats)
@@ -0,0 +1,50 @@
+import logging
+from typing import List, Sequence, Tuple
+from model import Placement, Shadow, Verification
+from solver.clipping import Region, areas, difference, intersection_areas, pack, region_area, union
+
+
+L = logging.getLogger('Solver-Verify')
+
+
+# Prüft einen fertigen Plan in Bildkoordinaten gegen die erkannten Shadows.
+# Die Steine werden vereinigt (disjunkte konvexe Teile, siehe clipping) und
+# mit allen Shadows geschnitten:
+#
+# - nicht abgedeckt: Fläche der Shadows ohne die Steine
+# - überstehend: Fläche der Steine außerhalb der Shadows
+# - überlappend: Fläche, auf der Steine übereinander liegen
+#
+# Alle Werte sind Anteile an der Fläche der Shadows.
+def verify_plan(shadows: List[Shadow], placements: List[Placement]) -> Verification:
+    outlines = [[(float(p.x), float(p.y)) for p in shadow.vertices] for shadow in shadows]
+    shadow_area = float(areas(*pack(outlines)).sum())
+
+    if shadow_area == 0:
+        return Verification(0, 0, 0)
+
+    pieces = [placement.vertices for placement in placements]
+    covered = union(pieces)
+    covered_area = region_area(covered)
+    piece_area = float(areas(*pack(pieces)).sum()) if len(pieces) > 0 else 0.0
+
+    inside = 0.0
+    if len(covered) > 0:
+        for outline in outlines:
+            inside += float(intersection_areas(outline, covered).sum())
+
+    uncovered = max(0.0, shadow_area - inside) / shadow_area
+    overflow = max(0.0, covered_area - inside) / shadow_area
+    overlap = max(0.0, piece_area - covered_area) / shadow_area
+
+    return Verification(uncovered, overflow, overlap)
+
+
+# Noch freie Fläche eines Polygons, nachdem die (konvexen) Steine gelegt wurden
+def remaining_region(polygon: Sequence[Tuple[float, float]], pieces: Sequence[Sequence[Tuple[float, float]]]) -> Region:
+    region: Region = [pack([polygon])[0][0]]
+
+    for piece in pieces:
+        region = difference(region, piece)
+
+    return region
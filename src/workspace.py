@@ -0,0 +1,142 @@
+import logging
+from math import pi, radians
+import numpy as np
+
+
+L = logging.getLogger('Workspace')
+
+# Orientation of the tool pointing straight down (roll, pitch), like the scan poses
+TOOL_ROLL = 0.0
+TOOL_PITCH = pi/2
+
+# Relative positions (x, y, yaw) compared with get_target_pose_from_rel when loading:
+# the corners and the centre, turned once
+CHECK_POSITIONS = [(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 0.0), (0.0, 1.0, 0.0), (0.5, 0.5, pi/2)]
+CHECK_HEIGHT = 0.1
+
+# Largest difference to the robot's poses before falling back to asking the robot
+MAX_POSITION_ERROR = 0.003
+MAX_ANGLE_ERROR = radians(2)
+
+
+class Workspace:
+    """
+    Local copy of a workspace saved on the robot: the positions of its four markers
+    (clockwise, starting at the origin of the relative coordinates) and its ratio.
+    Converts relative positions to robot poses like get_target_pose_from_rel, but
+    for many positions at once and without asking the robot. If the local poses
+    don't match the robot's (see load_workspace), `robot` is set and every pose is
+    asked from the robot instead.
+    """
+    name: str
+    corners: np.ndarray
+    ratio: float
+    robot: object | None
+
+    def __init__(self, name: str, corners: np.ndarray, ratio: float) -> None:
+        self.name = name
+        self.corners = np.asarray(corners, dtype=float).reshape(4, 3)
+        self.ratio = ratio
+        self.robot = None
+
+    # Positions (N, 3) of relative positions (N,) x (N,) on the workspace surface.
+    # Interpolated between the four markers, so slightly skewed workspaces work as well
+    def positions(self, x_rel: np.ndarray, y_rel: np.ndarray) -> np.ndarray:
+        u = np.asarray(x_rel, dtype=float)[:, None]
+        v = np.asarray(y_rel, dtype=float)[:, None]
+        p0, p1, p2, p3 = self.corners
+
+        return (1 - u) * (1 - v) * p0 + u * (1 - v) * p1 + u * v * p2 + (1 - u) * v * p3
+
+    # Yaw of the workspace x axis in the robot frame
+    def yaw(self) -> float:
+        p0, p1, p2, p3 = self.corners
+        x_axis = (p1 - p0) + (p2 - p3)
+
+        return float(np.arctan2(x_axis[1], x_axis[0]))
+
+    # Poses (N, 6) as [x, y, z, roll, pitch, yaw] for the tool `height` above the
+    # workspace, turned by `yaw_rel` relative to the workspace
+    def poses(self, x_rel: np.ndarray, y_rel: np.ndarray, height: float | np.ndarray, yaw_rel: float | np.ndarray) -> np.ndarray:
+        if self.robot is not None:
+            return self.robot_poses(x_rel, y_rel, height, yaw_rel)
+
+        positions = self.positions(x_rel, y_rel)
+        n = len(positions)
+
+        poses = np.empty((n, 6))
+        poses[:, :2] = positions[:, :2]
+        poses[:, 2] = positions[:, 2] + np.broadcast_to(height, n)
+        poses[:, 3] = TOOL_ROLL
+        poses[:, 4] = TOOL_PITCH
+        poses[:, 5] = wrap_angle(self.yaw() + np.broadcast_to(yaw_rel, n))
+
+        return poses
+
+    # Same as poses, but every pose is asked from the robot
+    def robot_poses(self, x_rel: np.ndarray, y_rel: np.ndarray, height: float | np.ndarray, yaw_rel: float | np.ndarray) -> np.ndarray:
+        x_rel, y_rel = np.asarray(x_rel, dtype=float), np.asarray(y_rel, dtype=float)
+        n = len(x_rel)
+        heights, yaws = np.broadcast_to(height, n), np.broadcast_to(yaw_rel, n)
+
+        return np.array([self.robot.vision.get_target_pose_from_rel(self.name, float(heights[i]), float(x_rel[i]), float(y_rel[i]), float(yaws[i])).to_list() for i in range(n)]).reshape(-1, 6)
+
+    # Largest position (m) & orientation (rad) difference between the local poses and
+    # the robot's at CHECK_POSITIONS
+    def compare(self, bot) -> tuple[float, float]:
+        x, y, yaw = np.array(CHECK_POSITIONS).T
+        local = self.poses(x, y, CHECK_HEIGHT, yaw)
+        remote = np.array([bot.vision.get_target_pose_from_rel(self.name, CHECK_HEIGHT, *position).to_list() for position in CHECK_POSITIONS])
+
+        position_error = np.linalg.norm(local[:, :3] - remote[:, :3], axis=1).max()
+        angle_error = max(rotation_angle(a[3:], b[3:]) for a, b in zip(local, remote))
+
+        return float(position_error), float(angle_error)
+
+    def __str__(self) -> str:
+        return 'Workspace(name=%s, corners=%s, ratio=%f, robot=%s)' % (self.name, self.corners.round(3).tolist(), self.ratio, self.robot is not None)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+# Fetches the markers & ratio of a workspace once. The local poses are checked
+# against the robot's, which also apply the tool offset & orientation convention;
+# if they differ, the poses are asked from the robot as before
+def load_workspace(bot, name: str) -> Workspace:
+    poses = bot.vision.get_workspace_poses(name)
+    ratio = bot.vision.get_workspace_ratio(name)
+
+    workspace = Workspace(name, [[pose.x, pose.y, pose.z] for pose in poses], ratio)
+    position_error, angle_error = workspace.compare(bot)
+
+    if position_error > MAX_POSITION_ERROR or angle_error > MAX_ANGLE_ERROR:
+        L.warning('Local poses of workspace %s differ from the robot by %.1f mm / %.1f°, asking the robot instead' % (name, position_error * 1000, np.degrees(angle_error)))
+        workspace.robot = bot
+
+    L.debug(workspace)
+
+    return workspace
+
+
+def wrap_angle(angles: np.ndarray) -> np.ndarray:
+    return (angles + pi) % (2 * pi) - pi
+
+
+# Rotation matrix of [roll, pitch, yaw] (fixed axes x, y, z like ROS)
+def rotation_matrix(rpy) -> np.ndarray:
+    (cr, cp, cy), (sr, sp, sy) = np.cos(rpy), np.sin(rpy)
+
+    return np.array([
+        [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr],
+        [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr],
+        [-sp, cp * sr, cp * cr],
+    ])
+
+
+# Angle (rad) of the rotation between two orientations [roll, pitch, yaw]. Compared as
+# matrices, because roll & yaw are ambiguous with the tool pointing down (pitch = pi/2)
+def rotation_angle(a, b) -> float:
+    cos = (np.trace(rotation_matrix(a).T @ rotation_matrix(b)) - 1) / 2
+
+    return float(np.arccos(np.clip(cos, -1, 1)))